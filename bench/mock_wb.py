@@ -0,0 +1,213 @@
+"""
+Локальная заглушка Wildberries для бенчмарков и отладки без бана.
+
+Все запросы приходят в виде /{host}/{path} (см. WBApi._rewrite_url и WB_MOCK_URL),
+каталог синтетический и детерминированный: одинаковый seed дает одинаковую выдачу.
+
+Запуск отдельно:
+    python -m bench.mock_wb --port 8081 --latency 0.05 0.2 --rate-429 0.02
+    WB_MOCK_URL=http://127.0.0.1:8081 python main.py
+"""
+import argparse
+import asyncio
+import random
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+from services.wb_api import endpoint_key
+
+SUPPLIER_ID_MAX = 3_000_000   # Самые новые продавцы - с самыми большими id
+NM_ID_MAX = 300_000_000
+
+
+class MockConfig:
+    """Параметры заглушки: задержки, доля ошибок и размер синтетического каталога."""
+
+    def __init__(self, latency=(0.02, 0.1), rate_429=0.0, rate_498=0.0, hidden_age_rate=0.5,
+                 feedback_rate=0.7, pages_per_query=12, page_size=100, suppliers=2000, seed=42):
+        self.latency = latency                  # (min, max) задержка ответа в секундах
+        self.rate_429 = rate_429                # Доля случайных 429 на любом эндпоинте
+        self.rate_498 = rate_498                # Доля случайных 498 на любом эндпоинте
+        self.hidden_age_rate = hidden_age_rate  # Доля продавцов, для которых sellers/info всегда 498
+        self.feedback_rate = feedback_rate      # Доля товаров с отзывами
+        self.pages_per_query = pages_per_query  # Полных страниц выдачи, дальше - неполная
+        self.page_size = page_size
+        self.suppliers = suppliers              # Размер пула продавцов каталога
+        self.seed = seed
+
+
+class MockWB:
+    """Синтетический каталог и обработчики эндпоинтов WB."""
+
+    def __init__(self, config: MockConfig = None):
+        self.config = config or MockConfig()
+        self.requests = Counter()   # Эндпоинт -> запросов
+        self.statuses = Counter()   # Код ответа -> количество
+        self._rng = random.Random(self.config.seed)
+        seed_rng = random.Random(self.config.seed)
+        self.supplier_ids = sorted(seed_rng.sample(range(100_000, SUPPLIER_ID_MAX), self.config.suppliers))
+        self.now = datetime(2026, 1, 1)
+
+    def _rand(self, *key) -> random.Random:
+        """Детерминированный генератор для сущности (товар, продавец, страница)."""
+        return random.Random(zlib.crc32(repr((self.config.seed,) + key).encode()))
+
+    # --- Модель продавцов и товаров ---
+
+    def supplier_age(self, supplier_id: int) -> int:
+        """Стаж в месяцах: чем больше id, тем моложе продавец (как у настоящего WB)."""
+        base = (SUPPLIER_ID_MAX - supplier_id) / SUPPLIER_ID_MAX * 96
+        return max(1, int(base + self._rand("age", supplier_id).uniform(-6, 6)))
+
+    def legal_form(self, supplier_id: int) -> str:
+        return "ИП" if self._rand("form", supplier_id).random() < 0.6 else "ООО"
+
+    def product(self, nm_id: int) -> dict:
+        rng = self._rand("nm", nm_id)
+        supplier_id = rng.choice(self.supplier_ids)
+        price = rng.randint(100, 20_000) * 100
+        return {
+            "id": nm_id,
+            "supplierId": supplier_id,
+            "name": f"Товар {nm_id}",
+            "brand": f"Бренд {supplier_id % 500}",
+            "supplier": f"Продавец {supplier_id}",
+            "priceU": price,
+            "salePriceU": price * 7 // 10,
+            "rating": rng.randint(0, 5),
+            "feedbacks": rng.randint(0, 300),
+            "colors": [{"name": "черный", "id": 0}],
+            "sizes": [{"name": "", "origName": "0", "stocks": [{"wh": 507, "qty": rng.randint(0, 50)}],
+                       "price": {"basic": price, "total": price * 7 // 10}}],
+        }
+
+    def search_page(self, query: str, sort: str, page: int) -> list:
+        if page > self.config.pages_per_query + 1:
+            return []
+        size = self.config.page_size if page <= self.config.pages_per_query else self.config.page_size // 3
+        rng = self._rand("search", query.lower(), sort, page)
+        return [self.product(rng.randint(10_000_000, NM_ID_MAX)) for _ in range(size)]
+
+    def feedbacks(self, nm_id: int):
+        rng = self._rand("fb", nm_id)
+        if rng.random() > self.config.feedback_rate:
+            return None
+        supplier_age = self.supplier_age(self.product(nm_id)["supplierId"])
+        oldest = self.now - timedelta(days=supplier_age * 30 - rng.randint(0, 60))
+        return [
+            {"createdDate": (oldest + timedelta(days=rng.randint(0, 60))).strftime("%Y-%m-%dT%H:%M:%SZ")}
+            for _ in range(rng.randint(1, 40))
+        ] + [{"createdDate": oldest.strftime("%Y-%m-%dT%H:%M:%SZ")}]
+
+    # --- HTTP ---
+
+    async def handle(self, request: web.Request) -> web.Response:
+        host = request.match_info["host"]
+        path = request.match_info["tail"]
+        self.requests[endpoint_key(f"https://{host}/{path}")] += 1
+
+        lo, hi = self.config.latency
+        if hi > 0:
+            await asyncio.sleep(self._rng.uniform(lo, hi))
+
+        roll = self._rng.random()
+        if roll < self.config.rate_429:
+            return self._status(429, "Too Many Requests")
+        if roll < self.config.rate_429 + self.config.rate_498:
+            return self._status(498, "")
+
+        q = request.query
+        if host == "search.wb.ru":
+            products = self.search_page(q.get("query", ""), q.get("sort", "popular"), int(q.get("page", 1)))
+            return self._json({"metadata": {"name": q.get("query")}, "data": {"products": products}})
+
+        if host == "catalog.wb.ru" and path == "sellers/info":
+            sid = int(q.get("supplierId", 0))
+            if self._rand("hidden", sid).random() < self.config.hidden_age_rate:
+                return self._status(498, "")
+            age = self.supplier_age(sid)
+            return self._json({
+                "id": sid,
+                "name": f"{self.legal_form(sid)} Продавец {sid}",
+                "age": age,
+                "registrationDate": (self.now - timedelta(days=age * 30)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            })
+
+        if host == "www.wildberries.ru" and path == "webapi/seller/info/legal":
+            sid = int(q.get("supplierId", 0))
+            rng = self._rand("legal", sid)
+            return self._json({
+                "supplierName": f"{self.legal_form(sid)} Продавец {sid}",
+                "inn": str(rng.randint(10 ** 11, 10 ** 12 - 1)),
+                "ogrn": str(rng.randint(10 ** 14, 10 ** 15 - 1)),
+                "legalAddress": "г. Москва",
+            })
+
+        if host == "card.wb.ru" and path == "cards/v1/detail":
+            ids = [int(x) for x in q.get("nm", "").split(";") if x.isdigit()]
+            return self._json({"data": {"products": [self.product(i) for i in ids]}})
+
+        if host.startswith("feedbacks") and path.startswith("feedbacks/v1/"):
+            nm_id = int(path.rsplit("/", 1)[-1])
+            return self._json({"feedbacks": self.feedbacks(nm_id), "feedbackCount": 0})
+
+        return self._status(404, "Not Found")
+
+    def _json(self, data) -> web.Response:
+        self.statuses[200] += 1
+        # WB отдает JSON как text/plain - повторяем, чтобы проверять разбор независимо от Content-Type
+        return web.json_response(data, content_type="text/plain")
+
+    def _status(self, status: int, text: str) -> web.Response:
+        self.statuses[status] += 1
+        return web.Response(status=status, text=text)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": dict(self.requests),
+            "statuses": {str(k): v for k, v in self.statuses.items()},
+            "total": sum(self.requests.values()),
+        })
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.requests.clear()
+        self.statuses.clear()
+        return web.json_response({"ok": True})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/_stats", self.handle_stats)
+        app.router.add_post("/_reset", self.handle_reset)
+        app.router.add_get("/{host}/{tail:.*}", self.handle)
+        return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Локальная заглушка Wildberries")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.02, 0.1), metavar=("MIN", "MAX"))
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-498", type=float, default=0.0)
+    parser.add_argument("--hidden-age-rate", type=float, default=0.5)
+    parser.add_argument("--feedback-rate", type=float, default=0.7)
+    parser.add_argument("--pages", type=int, default=12, help="Полных страниц выдачи на запрос")
+    parser.add_argument("--suppliers", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        latency=tuple(args.latency), rate_429=args.rate_429, rate_498=args.rate_498,
+        hidden_age_rate=args.hidden_age_rate, feedback_rate=args.feedback_rate,
+        pages_per_query=args.pages, suppliers=args.suppliers, seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    web.run_app(MockWB(config_from_args(args)).make_app(), host=args.host, port=args.port, print=None)
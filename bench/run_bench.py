@@ -0,0 +1,288 @@
+"""
+Сквозной бенчмарк конвейера поиска на локальной заглушке WB (bench/mock_wb.py).
+
+Гоняет тот же SearchEngine, что и бот: сбор страниц -> дедупликация и группировка по продавцам ->
+проверка продавцов -> фильтр по стажу -> HTML-отчет. Заглушка запускается отдельным процессом,
+чтобы ее CPU и память не попадали в замеры.
+
+    python -m bench.run_bench --queries платье,кроссовки,чехол --latency 0.02 0.1 --rate-498 0.02
+    python -m bench.run_bench --scenario filter --json
+    python -m bench.run_bench --record /tmp/wb.jsonl && python -m bench.run_bench --replay /tmp/wb.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import aiohttp
+
+from config import VERIFY_CONCURRENCY, SELLER_FILTERS
+from services.age_index import AgeIndex
+from services.cassette import Cassette
+from services.core import ProductFilter
+from services.engine import SearchEngine, PROGRESS_VERIFY_START, PROGRESS_REPORT
+from services.filters import FilterPipeline, parse_criteria
+from services.metrics import Metrics
+from services.proxy_pool import ProxyPool
+from services.rate_limiter import AIMDLimiter
+from services.search_progress import SearchProgress
+from services.seller_cache import SellerCache
+from services.wb_api import WBApi
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class UnlimitedLimiter:
+    """Заглушка AIMDLimiter без ограничений - меряем сам конвейер, а не выученные скорости."""
+
+    async def acquire(self, endpoint, proxy=None):
+        pass
+
+    def on_response(self, endpoint, proxy, status):
+        pass
+
+    def rates(self):
+        return {"endpoints": {}, "proxies": {}}
+
+    def save(self):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_mock(args) -> tuple:
+    """Запускает заглушку WB отдельным процессом и ждет, пока она начнет отвечать."""
+    port = free_port()
+    cmd = [
+        sys.executable, "-m", "bench.mock_wb", "--port", str(port),
+        "--latency", str(args.latency[0]), str(args.latency[1]),
+        "--rate-429", str(args.rate_429), "--rate-498", str(args.rate_498),
+        "--hidden-age-rate", str(args.hidden_age_rate), "--pages", str(args.mock_pages),
+        "--suppliers", str(args.suppliers), "--seed", str(args.seed),
+    ]
+    proc = subprocess.Popen(cmd, cwd=ROOT)
+    url = f"http://127.0.0.1:{port}"
+    async with aiohttp.ClientSession() as session:
+        for _ in range(100):
+            try:
+                async with session.get(f"{url}/_stats") as resp:
+                    if resp.status == 200:
+                        return proc, url
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("Заглушка WB не запустилась")
+
+
+async def mock_stats(url: str) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/_stats") as resp:
+            return await resp.json()
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q * 100) - 1]
+
+
+async def run_pipeline(api: WBApi, queries: list, pages: int, concurrency: int, workdir: str,
+                       criteria: dict = SELLER_FILTERS) -> dict:
+    """Тот же SearchEngine, что у бота, с чистыми курсорами и постоянной сортировкой (для кассет)."""
+    progress = SearchProgress(os.path.join(workdir, "search_progress.db"), None)
+    engine = SearchEngine(api, progress, verify_concurrency=concurrency, pages=pages, sort="popular")
+    stages = {}
+    marks = {"collect": time.perf_counter()}
+
+    async def on_progress(event, **info):
+        if event == PROGRESS_VERIFY_START:
+            marks["verify"] = time.perf_counter()
+        elif event == PROGRESS_REPORT:
+            marks["report"] = time.perf_counter()
+
+    result = await engine.run(queries, FilterPipeline(criteria), on_progress=on_progress,
+                              report_dir=os.path.join(workdir, "reports"))
+    finished = time.perf_counter()
+    verify_end = marks.get("report", finished)
+    stages["collect"] = marks.get("verify", finished) - marks["collect"]
+    if "verify" in marks:
+        stages["verify"] = verify_end - marks["verify"]
+        stages["report"] = finished - verify_end
+    progress.close()
+    return {"products": result.scanned, "sellers": result.sellers, "results": len(result.results), "stages": stages}
+
+
+async def run_filter(api: WBApi, queries: list, limit: int) -> dict:
+    """Сценарий ProductFilter.filter_sellers (карточка + sellers/info на каждый товар)."""
+    started = time.perf_counter()
+    pf = ProductFilter(api)
+    checked = 0
+    found = 0
+    for q in queries:
+        found += len(await pf.filter_sellers(q, limit=limit))
+        checked += limit
+    return {"products": checked, "sellers": checked, "results": found,
+            "stages": {"filter": time.perf_counter() - started}}
+
+
+def metrics_stats(metrics: Metrics) -> dict:
+    """Те же счетчики, что отдает /_stats заглушки, но по метрикам WBApi (для replay)."""
+    statuses = Counter()
+    for counter in metrics.endpoints.statuses.values():
+        statuses.update(counter)
+    return {
+        "requests": {k: h.count for k, h in metrics.endpoints.latency.items()},
+        "statuses": dict(statuses),
+        "total": metrics.total_requests,
+    }
+
+
+async def bench(args) -> dict:
+    # При воспроизведении кассеты сеть и заглушка не нужны
+    proc, url = (None, None) if args.replay else await start_mock(args)
+    cassette = None
+    if args.replay:
+        cassette = Cassette(args.replay, "replay")
+    elif args.record:
+        cassette = Cassette(args.record, "record")
+    workdir = tempfile.mkdtemp(prefix="wb_bench_")
+    cache = SellerCache(os.path.join(workdir, "seller_cache.db")) if args.cache else None
+    age_index = AgeIndex(os.path.join(workdir, "age_index.db")) if args.age_index else None
+    limiter = AIMDLimiter(os.path.join(workdir, "rate_limits.json")) if args.limits == "aimd" else UnlimitedLimiter()
+    api = WBApi(use_proxy=False, proxy_pool=ProxyPool(), cache=cache, metrics=Metrics(),
+                limiter=limiter, mock_url=url, cassette=cassette, age_index=age_index)
+    if args.limits == "off":
+        api.rate_limit.set_rate(0)
+
+    # Задержка каждого вызова _request с точки зрения конвейера (с ретраями и ожиданием лимитов)
+    latencies = []
+    request = api._request
+
+    async def timed_request(*a, **kw):
+        started = time.perf_counter()
+        try:
+            return await request(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    api._request = timed_request
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        if args.scenario == "pipeline":
+            result = await run_pipeline(api, args.queries, args.pages, args.concurrency, workdir,
+                                        {**SELLER_FILTERS, **parse_criteria(args.filters)})
+        else:
+            result = await run_filter(api, args.queries, args.limit)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = metrics_stats(api.metrics) if args.replay else await mock_stats(url)
+    finally:
+        await api.close()
+        if cache:
+            cache.close()
+        if age_index:
+            age_index.close()
+        if proc:
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    requests_total = stats["total"]
+    return {
+        "scenario": args.scenario,
+        "limits": args.limits,
+        "elapsed_sec": round(elapsed, 3),
+        **{k: v for k, v in result.items() if k != "stages"},
+        "stages_sec": {k: round(v, 3) for k, v in result["stages"].items()},
+        "sellers_per_sec": round(result["sellers"] / elapsed, 2) if elapsed else 0.0,
+        "requests": requests_total,
+        "requests_per_seller": round(requests_total / result["sellers"], 2) if result["sellers"] else None,
+        "requests_per_result": round(requests_total / result["results"], 2) if result["results"] else None,
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "peak_traced_mb": round(peak / 2 ** 20, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "mock_requests": stats["requests"],
+        "mock_statuses": stats["statuses"],
+        "final_rates": api.limiter.rates(),
+    }
+
+
+def format_report(r: dict) -> str:
+    lines = [
+        f"Сценарий: {r['scenario']} (лимиты: {r['limits']}), {r['elapsed_sec']} с "
+        f"({', '.join(f'{k} {v} с' for k, v in r['stages_sec'].items())})",
+        f"Товаров: {r['products']}, продавцов: {r['sellers']}, найдено: {r['results']}",
+        f"Продавцов проверено в секунду: {r['sellers_per_sec']}",
+        f"Запросов к WB: {r['requests']} (на продавца {r['requests_per_seller']}, на результат {r['requests_per_result']})",
+        f"Задержка вызова: p50 {r['latency_p50_ms']} мс, p99 {r['latency_p99_ms']} мс",
+        f"Пиковая память: {r['peak_traced_mb']} МБ (tracemalloc), RSS {r['max_rss_mb']} МБ",
+        "Запросы по эндпоинтам:",
+    ]
+    lines += [f"  {k}: {v}" for k, v in sorted(r["mock_requests"].items(), key=lambda kv: -kv[1])]
+    lines.append("Коды ответов: " + ", ".join(f"{k}: {v}" for k, v in sorted(r["mock_statuses"].items())))
+    for kind, rates in r["final_rates"].items():
+        if rates:
+            lines.append(f"Скорости в конце ({kind}): " + ", ".join(f"{k} {v}" for k, v in sorted(rates.items())))
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера поиска на заглушке WB")
+    parser.add_argument("--scenario", choices=("pipeline", "filter"), default="pipeline")
+    parser.add_argument("--queries", type=lambda s: [q.strip() for q in s.split(",") if q.strip()],
+                        default=["платье", "кроссовки", "чехол для телефона"])
+    parser.add_argument("--pages", type=int, default=10, help="Страниц на запрос (как окно run_search)")
+    parser.add_argument("--limit", type=int, default=20, help="Товаров на запрос в сценарии filter")
+    parser.add_argument("--concurrency", type=int, default=VERIFY_CONCURRENCY)
+    parser.add_argument("--limits", choices=("aimd", "off"), default="aimd",
+                        help="aimd - лимиты как в боте (с чистым файлом скоростей), off - только сам конвейер без лимитов")
+    parser.add_argument("--filters", default="", help="Фильтры как в /filters, например 'age_max=12 legal=ИП'")
+    parser.add_argument("--cache", action="store_true", help="Использовать SellerCache (во временном файле)")
+    parser.add_argument("--age-index", action="store_true", help="Учить AgeIndex по ходу прогона (во временном файле)")
+    parser.add_argument("--json", action="store_true", help="Вывести результат одной строкой JSON")
+    parser.add_argument("--record", metavar="PATH", help="Записать ответы заглушки в кассету JSONL")
+    parser.add_argument("--replay", metavar="PATH", help="Воспроизвести кассету без сети (и без заглушки)")
+    parser.add_argument("--verbose", action="store_true", help="Показывать логи WBApi (баны, ретраи)")
+    # Параметры заглушки
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.02, 0.1), metavar=("MIN", "MAX"))
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-498", type=float, default=0.0)
+    parser.add_argument("--hidden-age-rate", type=float, default=0.5)
+    parser.add_argument("--mock-pages", type=int, default=12)
+    parser.add_argument("--suppliers", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Логи банов на каждом запросе искажают замер и засоряют вывод
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    result = asyncio.run(bench(args))
+    print(json.dumps(result, ensure_ascii=False) if args.json else format_report(result))
+
+
+if __name__ == "__main__":
+    main()
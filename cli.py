@@ -0,0 +1,174 @@
+"""
+Пакетный поиск без Telegram: тот же конвейер, что у бота (services/engine.py), для длинных
+списков запросов на сервере. Результаты - HTML-отчет и, по желанию, JSONL/CSV.
+
+    python cli.py --queries-file queries.txt --jsonl out.jsonl --csv out.csv
+    python cli.py --category gadgets --concurrency 16 --no-html --jsonl gadgets.jsonl
+    python cli.py --query "платье, кроссовки" --filters "age_max=12 legal=ИП" --direct
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from config import (
+    VERIFY_CONCURRENCY, QUERY_CONCURRENCY, SEARCH_PAGES_PER_RUN, SELLER_FILTERS, REPORT_DIR, AGE_INDEX_ENABLED
+)
+from categories import CATEGORIES
+from services.age_index import AgeIndex
+from services.engine import SearchEngine, PROGRESS_COLLECT, PROGRESS_VERIFY_START, PROGRESS_VERIFY
+from services.filters import FilterPipeline, parse_criteria
+from services.paginator import SEARCH_SORTS
+from services.report import JsonlWriter, CsvWriter
+from services.search_progress import SearchProgress
+from services.seller_cache import SellerCache
+from services.verify_workers import VerifyWorkerPool
+from services.wb_api import WBApi
+
+
+class FoundSellers:
+    """Найденные за прогон продавцы: между пачками запросов один продавец попадает в выгрузку один раз."""
+
+    def __init__(self):
+        self.ids = set()
+
+    def contains(self, chat_id, supplier_id) -> bool:
+        return supplier_id in self.ids
+
+    def add_many(self, chat_id, supplier_ids):
+        self.ids.update(supplier_ids)
+
+
+def load_queries(args) -> list:
+    if args.category:
+        if args.category not in CATEGORIES:
+            sys.exit(f"Нет категории {args.category}. Доступны: {', '.join(CATEGORIES)}")
+        return list(CATEGORIES[args.category]["queries"])
+    if args.queries_file:
+        with open(args.queries_file, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        return [q for q in lines if q and not q.startswith("#")]
+    return [q.strip() for q in args.query.replace("\n", ",").split(",") if q.strip()]
+
+
+def log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+async def run(args) -> dict:
+    queries = load_queries(args)
+    if not queries:
+        sys.exit("Нет запросов")
+    criteria = {**SELLER_FILTERS, **parse_criteria(args.filters)}
+    pipeline = FilterPipeline(criteria)
+
+    cache = SellerCache()
+    age_index = AgeIndex(seed_cache=cache) if AGE_INDEX_ENABLED else None
+    api = WBApi(use_proxy=not args.direct, cache=cache, age_index=age_index)
+    verify_pool = VerifyWorkerPool(args.workers, use_proxy=not args.direct) if args.workers else None
+    if verify_pool:
+        await verify_pool.start(api)
+    found = FoundSellers()
+    engine = SearchEngine(
+        api, SearchProgress(), seen_store=found, verify_pool=verify_pool,
+        verify_concurrency=args.concurrency, query_concurrency=args.query_concurrency,
+        pages=args.pages, sort=args.sort
+    )
+    sinks = []
+    if args.jsonl:
+        sinks.append(JsonlWriter(args.jsonl))
+    if args.csv:
+        sinks.append(CsvWriter(args.csv))
+
+    batch_size = args.batch_size or len(queries)
+    batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+    summary = {"queries": len(queries), "batches": len(batches), "products": 0, "sellers": 0,
+               "results": 0, "reports": [], "exports": [s.path for s in sinks]}
+    started = time.perf_counter()
+    try:
+        for number, batch in enumerate(batches, 1):
+            prefix = f"[{number}/{len(batches)}]"
+
+            async def on_progress(event, **info):
+                if event == PROGRESS_COLLECT:
+                    log(f"{prefix} Сбор товаров: {len(batch)} запросов")
+                elif event == PROGRESS_VERIFY_START:
+                    log(f"{prefix} Собрано {info['scanned']} товаров, проверяю {info['sellers']} продавцов")
+                elif event == PROGRESS_VERIFY and (info["done"] % args.progress_every == 0 or info["done"] == info["total"]):
+                    log(f"{prefix} Проверено {info['done']}/{info['total']}, найдено {info['found']}")
+
+            result = await engine.run(
+                batch, pipeline, chat_id=0, title=args.title or None, html=not args.no_html,
+                sinks=sinks, on_progress=on_progress, report_dir=args.report_dir
+            )
+            for line in result.page_info:
+                log(f"{prefix} {line}")
+            summary["products"] += result.scanned
+            summary["sellers"] += result.sellers
+            summary["results"] += len(result.results)
+            if result.filename:
+                summary["reports"].append(result.filename)
+                log(f"{prefix} Отчет: {result.filename}")
+    finally:
+        for sink in sinks:
+            sink.close()
+        await api.close()
+        if verify_pool:
+            await verify_pool.close()
+        cache.close()
+        if age_index:
+            age_index.close()
+    summary["elapsed_sec"] = round(time.perf_counter() - started, 1)
+    # Запросы процесса и воркеров проверки (их счетчики приходят в ответах и при остановке)
+    summary["requests"] = api.metrics.total_requests + (verify_pool.requests if verify_pool else 0)
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный поиск новых продавцов WB без Telegram")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--queries-file", help="Файл с запросами, по одному на строку (# - комментарий)")
+    source.add_argument("--category", help=f"Ключ категории из categories.py ({', '.join(CATEGORIES)})")
+    source.add_argument("--query", help="Запросы через запятую")
+    parser.add_argument("--concurrency", type=int, default=VERIFY_CONCURRENCY, help="Продавцов проверяется одновременно")
+    parser.add_argument("--query-concurrency", type=int, default=QUERY_CONCURRENCY, help="Запросов собирается одновременно")
+    parser.add_argument("--workers", type=int, default=0, help="Процессов-воркеров проверки (0 - в этом процессе)")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="Запросов на пачку (у каждой пачки свой HTML-отчет), 0 - все сразу")
+    parser.add_argument("--pages", type=int, default=SEARCH_PAGES_PER_RUN, help="Страниц на запрос за проход")
+    parser.add_argument("--sort", choices=SEARCH_SORTS, help="Сортировка выдачи (по умолчанию случайная)")
+    parser.add_argument("--filters", default="", help='Критерии как в /filters: "age_max=12 legal=ИП inn=1"')
+    parser.add_argument("--jsonl", help="Выгрузка результатов в JSONL")
+    parser.add_argument("--csv", help="Выгрузка результатов в CSV")
+    parser.add_argument("--no-html", action="store_true", help="Не собирать HTML-отчет")
+    parser.add_argument("--report-dir", default=REPORT_DIR)
+    parser.add_argument("--title", default="", help="Заголовок HTML-отчета")
+    parser.add_argument("--direct", action="store_true", help="Без прокси")
+    parser.add_argument("--progress-every", type=int, default=50, help="Как часто печатать ход проверки (продавцов)")
+    parser.add_argument("--json", action="store_true", help="Итог в JSON")
+    parser.add_argument("--verbose", action="store_true", help="Логи WBApi")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    try:
+        parse_criteria(args.filters)
+    except ValueError as e:
+        sys.exit(f"Фильтры: {e}")
+    summary = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(f"Запросов: {summary['queries']} (пачек: {summary['batches']}), товаров: {summary['products']}, "
+              f"продавцов: {summary['sellers']}, найдено: {summary['results']}, "
+              f"запросов к WB: {summary['requests']}, {summary['elapsed_sec']} с")
+        for path in summary["reports"] + summary["exports"]:
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
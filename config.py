@@ -8,6 +8,39 @@ SEARCH_URL = "https://search.wb.ru/exactmatch/ru/common/v18/search"
 SELLER_INFO_URL = "https://catalog.wb.ru/sellers/info"
 PRODUCT_DETAIL_URL = "https://card.wb.ru/cards/v1/detail"
 
+# Курсоры страниц по запросам (SQLite); search_history.json переносится туда один раз
+SEARCH_PROGRESS_FILE = "search_progress.db"
+LEGACY_SEARCH_HISTORY_FILE = "search_history.json"
+SEARCH_PAGES_PER_RUN = 10               # Страниц за один поиск по запросу
+SEARCH_MAX_PAGE = 100                   # Дальше этой страницы WB не отдает - выдача считается пройденной
+EXHAUSTED_RESCAN_INTERVAL = 24 * 3600   # Пройденную до конца выдачу не сканируем заново раньше (сек) - до тех пор только дельта
+WATERMARK_IDS = 5000                    # Сколько последних nmId помнить по запросу для дельта-обхода
+
+# Контрольные точки поисков (SQLite): прерванный перезапуском поиск продолжается при старте бота
+JOB_STORE_FILE = "search_jobs.db"
+JOB_RESUME_MAX_AGE = 24 * 3600          # Поиски старше не продолжаем (сек)
+
+# Фоновый обход запросов из CATEGORIES: прогрев кэшей и уведомления подписанным чатам (/subscribe)
+CRAWLER_ENABLED = True
+CRAWLER_INTERVAL = 3600                 # Пауза между циклами обхода (сек)
+CRAWLER_START_DELAY = 60                # Первый цикл - через столько секунд после запуска
+CRAWLER_REQUEST_BUDGET = 2000           # Запросов к WB за один цикл
+CRAWLER_CONCURRENCY = 4                 # Продавцов проверяем одновременно (меньше, чем в интерактивном поиске)
+CRAWLER_IDLE_POLL = 5                   # Как часто проверять, закончились ли интерактивные поиски (сек)
+CRAWLER_ALERT_LIMIT = 15                # Продавцов в одном уведомлении
+SUBSCRIPTIONS_FILE = "subscriptions.json"
+CRAWLER_PROGRESS_FILE = "crawler_progress.db"   # Свои курсоры страниц и отметки новинок - интерактивные не сдвигаются
+
+# Сколько товаров запрашивать одним запросом cards/v1/detail (nm=id1;id2;...)
+PRODUCT_DETAIL_BATCH = 50
+
+# Адрес локальной заглушки WB (bench/mock_wb.py). Если задан, все запросы идут туда
+WB_MOCK_URL = os.getenv("WB_MOCK_URL")
+
+# Кассета запросов к WB (JSONL): "record" - записывать ответы, "replay" - отвечать из файла без сети
+CASSETTE_MODE = os.getenv("WB_CASSETTE")
+CASSETTE_FILE = os.getenv("WB_CASSETTE_FILE", "wb_cassette.jsonl")
+
 # Заголовки для имитации браузера
 HEADERS = {
     "Accept": "*/*",
@@ -16,6 +49,9 @@ HEADERS = {
     "Referer": "https://www.wildberries.ru/",
 }
 
+# Сколько байт тела ответа сохранять в логах ошибок
+ERROR_BODY_LIMIT = 500
+
 # Параметры поиска
 DEFAULT_PARAMS = {
     "appType": "1",
@@ -28,9 +64,112 @@ DEFAULT_PARAMS = {
     "resultset": "catalog",
 }
 
-# Настройки задержки (в секундах)
-DELAY_MIN = 20
-DELAY_MAX = 30
+# Адаптивный лимит запросов (AIMD): скорости в запросах/сек на эндпоинт и на прокси
+RATE_LIMITS_FILE = "rate_limits.json"   # Выученные скорости между перезапусками
+RATE_ENDPOINT_INITIAL = 5.0
+RATE_PROXY_INITIAL = 1.0
+RATE_ENDPOINT_MAX = 50.0
+RATE_PROXY_MAX = 10.0
+RATE_MIN = 0.1
+AIMD_INCREASE = 0.05        # Прибавка к скорости за каждый ответ 200
+AIMD_DECREASE = 0.5         # Множитель скорости при 429/498
+AIMD_DECREASE_WINDOW = 2.0  # Не чаще одного снижения скорости бакета за столько секунд
+RATE_SAVE_INTERVAL = 60     # Как часто сохранять скорости (сек)
+
+# Очередь поисков от всех чатов
+MAX_CONCURRENT_SEARCHES = 2     # Сколько поисков выполняется одновременно
+QUEUE_POSITION_REFRESH = 5      # Как часто обновлять позицию в очереди (сек)
+
+# Общий бюджет запросов к WB на весь процесс
+GLOBAL_RPS = 20
+GLOBAL_BURST = 40
+
+# Сколько страниц поиска одного запроса загружаем параллельно
+PAGE_FETCH_CONCURRENCY = 4
+
+# Сколько запросов одного поиска собираем одновременно (для длинных списков запросов в CLI)
+QUERY_CONCURRENCY = 8
+
+# Параллельная проверка продавцов (сколько продавцов проверяем одновременно)
+VERIFY_CONCURRENCY = 8
+
+# Процессы-воркеры проверки продавцов (0 - проверять в процессе бота). Каждый берет свою часть
+# proxies.txt (proxies[i::VERIFY_WORKERS]) и проверяет до VERIFY_CONCURRENCY продавцов одновременно
+VERIFY_WORKERS = 0
+# Доля GLOBAL_RPS/GLOBAL_BURST, которая остается процессу бота (поиск, карточки) при VERIFY_WORKERS > 0;
+# остальное воркеры делят поровну - вместе процессы не превышают общий бюджет
+VERIFY_PARENT_RPS_SHARE = 0.25
+VERIFY_WORKER_MAX_RESTARTS = 3  # Сколько раз перезапускать упавший воркер; дальше его продавцов берут живые
+VERIFY_WORKER_TIMEOUT = 300     # Без ответов от воркеров столько секунд - оставшиеся продавцы считаются ошибкой
+
+# Через сколько секунд без ответа запрашивать следующее зеркало отзывов / следующий товар выборки
+# (0 - опрашивать все сразу: быстрее на одного продавца, но больше запросов)
+FEEDBACK_HEDGE_DELAY = 0.5
+
+# Лимиты одновременных запросов на хост (ключи поддерживают шаблоны fnmatch)
+HOST_CONCURRENCY = {
+    "catalog.wb.ru": 6,
+    "feedbacks*.wb.ru": 8,
+    "www.wildberries.ru": 4,
+}
+
+# Критерии отбора продавцов по умолчанию (в чате меняются командой /filters, None/пусто - без ограничения)
+SELLER_FILTERS = {
+    "age_min_months": None,
+    "age_max_months": 24,       # Стаж на WB в месяцах
+    "legal_forms": [],          # Например ["ИП"] - только ИП
+    "require_inn": False,
+    "price_min": None,          # Цена товара в рублях
+    "price_max": None,
+    "brands": [],
+    "exclude_brands": [],
+}
+CHAT_FILTERS_FILE = "chat_filters.json"
+
+# Постоянный кэш данных о продавцах (SQLite), TTL в секундах
+SELLER_CACHE_FILE = "seller_cache.db"
+SELLER_CACHE_TTL_EXACT = 7 * 24 * 3600      # Точный стаж из sellers/info
+SELLER_CACHE_TTL_ESTIMATED = 24 * 3600      # Оценка по эвристикам
+SELLER_CACHE_TTL_LEGAL = 30 * 24 * 3600     # Юр. информация (ИНН)
+SELLER_CACHE_LRU_SIZE = 5000                # Записей в памяти
+
+# Выученный индекс supplierId/nmId -> дата регистрации (SQLite): точный стаж из sellers/info и даты
+# самых старых отзывов. Если стаж скрыт, уверенная оценка по индексу заменяет запросы к отзывам
+AGE_INDEX_ENABLED = True
+AGE_INDEX_FILE = "age_index.db"
+AGE_INDEX_MIN_POINTS = 200          # Точек в ряду, с которых индекс начинает отвечать
+AGE_INDEX_MAX_ERROR_DAYS = 30       # Оценка с погрешностью больше не заменяет запросы к отзывам
+AGE_INDEX_REBUILD_INTERVAL = 300    # Как часто перестраивать массивы с новыми точками (сек)
+
+# Просмотренные продавцы (черный список): журнал на диске и старый текстовый файл для миграции
+SEEN_STORE_FILE = "seen_sellers.bin"
+LEGACY_BLACKLIST_FILE = "seen_sellers.txt"
+SEEN_BITMAP_MAX_ID = 1 << 26    # supplierId выше - в запасной set (битовая карта до 8 МБ)
+SEEN_COMPACT_SLACK = 10000      # Лишних записей в журнале до сжатия
+
+# HTML-отчеты: папка, продавцов на страницу, упаковывать ли многостраничный отчет в zip
+REPORT_DIR = "reports"
+REPORT_PAGE_SIZE = 200
+REPORT_COMPRESS = True
+REPORT_KEEP_SECONDS = 7 * 24 * 3600    # Неотправленные отчеты (ошибка отправки) удаляются через столько секунд
 
 # Файл с прокси (одна строка - один прокси: http://user:pass@ip:port)
 PROXY_FILE = "proxies.txt"
+
+# Пул прокси: кулдаун после бана/ошибок (сек), растет экспоненциально до максимума
+PROXY_COOLDOWN_BASE = 60
+PROXY_COOLDOWN_MAX = 900
+PROXY_FAIL_THRESHOLD = 3        # Ошибок подряд до кулдауна (для банов - сразу)
+PROXY_EWMA_ALPHA = 0.3          # Вес нового замера в EWMA задержки
+PROXY_BAN_PENALTY_WINDOW = 600  # Сколько секунд после бана прокси получает пониженный вес
+
+# Пул HTTP-сессий (по одной на прокси)
+SESSION_LIMIT = 100             # Всего соединений на сессию
+SESSION_LIMIT_PER_HOST = 10     # Соединений на один хост
+SESSION_DNS_TTL = 300           # Кэш DNS (сек)
+SESSION_KEEPALIVE = 30          # Keep-alive простаивающего соединения (сек)
+SESSION_IDLE_TTL = 300          # Через сколько секунд простоя закрывать сессию прокси
+
+# Метрики запросов: файл в формате Prometheus и период его обновления (сек)
+METRICS_FILE = "metrics.prom"
+METRICS_DUMP_INTERVAL = 60
@@ -1,16 +1,28 @@
 import logging
 import asyncio
-import os
-import random
-import json
 from contextlib import suppress
 from aiogram.exceptions import TelegramBadRequest
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
-from config import BOT_TOKEN, PROXY_FILE
+from config import (
+    BOT_TOKEN, PROXY_FILE, METRICS_FILE, METRICS_DUMP_INTERVAL, CRAWLER_ENABLED, VERIFY_WORKERS, AGE_INDEX_ENABLED,
+    CRAWLER_PROGRESS_FILE
+)
 from services.wb_api import WBApi
 from services.core import ProductFilter
+from services.engine import SearchEngine, PROGRESS_COLLECT, PROGRESS_VERIFY_START, PROGRESS_VERIFY, PROGRESS_REPORT
+from services.verify_workers import VerifyWorkerPool
+from services.scheduler import JobScheduler
+from services.seller_cache import SellerCache
+from services.age_index import AgeIndex
+from services.proxy_pool import ProxyPool
+from services.seen_store import SeenSellersStore
+from services.filters import FilterSettings, parse_criteria, describe_criteria
+from services.search_progress import SearchProgress
+from services.crawler import CategoryCrawler, Subscriptions
+from services.job_store import JobStore, SearchJob, STAGE_VERIFYING
+from services.report import remove_report, rotate_reports
 from categories import CATEGORIES
 
 # Настройка логирования
@@ -23,32 +35,31 @@ dp = Dispatcher()
 # Глобальные настройки
 USE_PROXY = True
 USE_BLACKLIST = True
-BLACKLIST_FILE = "seen_sellers.txt"
-SEARCH_HISTORY_FILE = "search_history.json"
-
-def load_blacklist():
-    if not os.path.exists(BLACKLIST_FILE):
-        return set()
-    with open(BLACKLIST_FILE, "r") as f:
-        return set(line.strip() for line in f if line.strip())
-
-def save_to_blacklist(supplier_ids):
-    with open(BLACKLIST_FILE, "a") as f:
-        for sid in supplier_ids:
-            f.write(f"{sid}\n")
-
-def load_search_history():
-    if not os.path.exists(SEARCH_HISTORY_FILE):
-        return {}
-    try:
-        with open(SEARCH_HISTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {}
 
-def save_search_history(history):
-    with open(SEARCH_HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+# Кэш продавцов, пул прокси и черный список, общие для всех поисков
+seller_cache = SellerCache()
+age_index = AgeIndex(seed_cache=seller_cache) if AGE_INDEX_ENABLED else None
+proxy_pool = ProxyPool.from_file(PROXY_FILE)
+seen_store = SeenSellersStore()
+search_progress = SearchProgress()
+crawler_progress = SearchProgress(CRAWLER_PROGRESS_FILE, None)
+job_store = JobStore()
+
+# Один долгоживущий клиент WB на весь бот и общая очередь поисков всех чатов
+filter_settings = FilterSettings()
+api = WBApi(use_proxy=USE_PROXY, cache=seller_cache, proxy_pool=proxy_pool, age_index=age_index)
+scheduler = JobScheduler()
+# Проверка продавцов в отдельных процессах (запускаются в main)
+verify_pool = VerifyWorkerPool(VERIFY_WORKERS, use_proxy=USE_PROXY) if VERIFY_WORKERS else None
+engine = SearchEngine(api, search_progress, seen_store=seen_store, job_store=job_store, verify_pool=verify_pool)
+
+# Фоновый обход категорий: работает, только пока нет интерактивных поисков
+subscriptions = Subscriptions()
+crawler = CategoryCrawler(
+    api, crawler_progress, seen_store, filter_settings, subscriptions,
+    notify=lambda chat_id, text: bot.send_message(chat_id, text, disable_web_page_preview=True),
+    is_busy=lambda: scheduler.running or scheduler.waiting
+)
 
 def get_main_menu():
     kb = [
@@ -65,6 +76,7 @@ def get_settings_menu():
         [InlineKeyboardButton(text=f"Прокси: {proxy_status}", callback_data="toggle_proxy")],
         [InlineKeyboardButton(text=f"Черный список: {black_status}", callback_data="toggle_blacklist")],
         [InlineKeyboardButton(text="� Очистить историю", callback_data="clear_blacklist")],
+        [InlineKeyboardButton(text="🗑 Сбросить кэш продавцов", callback_data="clear_seller_cache")],
         [InlineKeyboardButton(text="�🔙 Назад", callback_data="main_menu")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=kb)
@@ -86,139 +98,6 @@ def get_items_menu(cat_key):
     kb.append([InlineKeyboardButton(text="🔙 Назад к категориям", callback_data="categories")])
     return InlineKeyboardMarkup(inline_keyboard=kb)
 
-def format_age(months):
-    """Превращает месяцы в читаемую строку."""
-    if not months: return "Новичок"
-    years = months // 12
-    m = months % 12
-    res = []
-    if years > 0:
-        res.append(f"{years}г.")
-    if m > 0:
-        res.append(f"{m} мес.")
-    return " ".join(res) if res else "Менее месяца"
-
-def generate_html_report(query, products):
-    """Генерирует красивый HTML-отчет с упором на новых продавцов."""
-    items_html = ""
-    for i, p in enumerate(products, 1):
-        nm_id = p['id']
-        vol = nm_id // 100000
-        part = nm_id // 1000
-        basket = (nm_id // 1000000) % 15 + 1
-        basket_str = f"{basket:02d}"
-        
-        img_url = f"https://basket-{basket_str}.wbbasket.ru/vol{vol}/part{part}/{nm_id}/images/big/1.webp"
-        seller_url = f"https://www.wildberries.ru/seller/{p['supplierId']}"
-        product_url = f"https://www.wildberries.ru/catalog/{nm_id}/detail.aspx"
-        
-        # Получаем данные из словаря
-        legal = p.get('legal_info', {})
-        seller_name = p.get('seller_name', 'Имя не определено')
-        age_val = p.get('age_months', -1)
-        age_type = p.get('age_type', 'unknown')
-        
-        # Бейдж возраста и описание
-        if age_val != -1:
-            age_text = format_age(age_val)
-            if age_type == 'exact':
-                age_class = "age-new" if age_val <= 12 else "age-young"
-                badge_html = f'<span class="badge {age_class}">{age_text} на WB</span>'
-                meta_age = f"Стаж: {age_text} (точно)"
-            else:
-                # Для эвристики используем другой стиль
-                badge_html = f'<span class="badge age-young" style="background:#6c757d">~{age_text} на WB</span>'
-                meta_age = f"Стаж: ~{age_text} (оценка по NM/отзывам)"
-        else:
-            badge_html = "" 
-            meta_age = "Стаж: <span style='color:red'>Неизвестен</span>"
-
-        inn = legal.get('inn', '-')
-        
-        items_html += f"""
-        <div class="card">
-            <div class="img-container">
-                {badge_html}
-                <img src="{img_url}" onerror="this.src='https://via.placeholder.com/200x300?text=No+Image'" alt="product">
-            </div>
-            <div class="content">
-                <div class="price">{p['price']:.0f} ₽</div>
-                <div class="name">{p['name']}</div>
-                <div class="brand">Бренд: <span>{p['brand']}</span></div>
-                
-                <div class="legal-info">
-                    <div class="seller-name">{seller_name}</div>
-                    <div class="meta">
-                        <span>ИНН: {inn}</span>
-                        <span>{meta_age}</span>
-                    </div>
-                </div>
-
-                <div class="links">
-                    <a href="{product_url}" target="_blank" class="btn">Карточка товара</a>
-                    <a href="{seller_url}" target="_blank" class="btn seller">Профиль продавца</a>
-                </div>
-            </div>
-        </div>
-        """
-
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="ru">
-    <head>
-        <meta charset="UTF-8">
-        <title>WB Scraper - Новые продавцы ({query})</title>
-        <style>
-            :root {{ --main-purp: #7212b3; --accent: #2ecc71; --bg: #f8f9fa; --card-bg: #fff; }}
-            body {{ font-family: 'Segoe UI', Roboto, sans-serif; background: var(--bg); margin: 0; padding: 40px 20px; color: #333; }}
-            .container {{ max-width: 1400px; margin: 0 auto; }}
-            h1 {{ text-align: center; color: var(--main-purp); margin-bottom: 10px; font-weight: 800; }}
-            .subtitle {{ text-align: center; color: #666; margin-bottom: 40px; font-size: 1.1em; }}
-            
-            .grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); gap: 25px; }}
-            .card {{ background: var(--card-bg); border-radius: 20px; overflow: hidden; box-shadow: 0 4px 20px rgba(0,0,0,0.05); transition: 0.3s; display: flex; flex-direction: column; border: 1px solid #eee; }}
-            .card:hover {{ transform: translateY(-8px); box-shadow: 0 15px 35px rgba(114, 18, 179, 0.12); }}
-            
-            .img-container {{ position: relative; width: 100%; height: 380px; background: #f0f0f0; }}
-            .card img {{ width: 100%; height: 100%; object-fit: cover; }}
-            
-            .badge {{ position: absolute; top: 15px; left: 15px; padding: 6px 12px; border-radius: 8px; font-size: 0.8em; font-weight: 700; color: #fff; z-index: 10; box-shadow: 0 4px 10px rgba(0,0,0,0.2); }}
-            .age-new {{ background: #2ecc71; }}
-            .age-young {{ background: #3498db; }}
-            
-            .content {{ padding: 20px; display: flex; flex-direction: column; flex-grow: 1; }}
-            .price {{ font-size: 1.7em; color: var(--main-purp); font-weight: 800; margin-bottom: 5px; }}
-            .name {{ font-weight: 600; font-size: 1em; margin-bottom: 10px; height: 2.8em; overflow: hidden; display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical; line-height: 1.4; }}
-            .brand {{ font-size: 0.9em; color: #888; margin-bottom: 15px; }}
-            .brand span {{ color: #333; font-weight: 600; }}
-            
-            .legal-info {{ background: #fbf8ff; padding: 15px; border-radius: 12px; margin-bottom: 20px; border: 1px dashed #dcb8ff; }}
-            .seller-name {{ font-weight: 700; font-size: 0.9em; margin-bottom: 5px; color: #444; }}
-            .meta {{ display: flex; justify-content: space-between; font-size: 0.75em; color: #777; }}
-            
-            .links {{ margin-top: auto; display: flex; flex-direction: column; gap: 8px; }}
-            .btn {{ text-align: center; padding: 12px; border-radius: 12px; text-decoration: none; font-size: 0.9em; font-weight: 700; transition: 0.2s; }}
-            .btn {{ background: #f0f0f5; color: #333; }}
-            .btn.seller {{ background: var(--main-purp); color: #fff; }}
-            .btn:hover {{ opacity: 0.9; transform: scale(1.02); }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🔍 Результаты для: {query}</h1>
-            <p class="subtitle">Фильтр: продавцы со стажем до 2 лет</p>
-            <div class="grid">
-                {items_html}
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    filename = f"results_{query.replace(' ', '_')}.html"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
-    return filename
-
 from aiogram.exceptions import TelegramBadRequest
 from contextlib import suppress
 
@@ -232,6 +111,63 @@ async def cmd_start(message: Message):
         reply_markup=get_main_menu()
     )
 
+@dp.message(Command("stats"))
+async def cmd_stats(message: Message):
+    api.metrics.dump(METRICS_FILE)
+    flight = api.flight.stats()
+    text = (
+        f"{api.metrics.summary()}\n\n"
+        f"{proxy_pool.summary()}\n"
+        f"Объединено запросов: {flight['hits']} из {flight['hits'] + flight['misses']}\n"
+        f"Поисков: выполняется {scheduler.running}, в очереди {scheduler.waiting}\n"
+        f"{crawler.summary()}"
+        + (f"\n{age_index.summary()}" if age_index else "")
+    )
+    # Без Markdown: в именах эндпоинтов и прокси встречаются спецсимволы
+    await message.answer(text.replace("`", "")[:4000])
+
+@dp.message(Command("filters"))
+async def cmd_filters(message: Message):
+    chat_id = message.chat.id
+    args = (message.text or "").split(maxsplit=1)[1:]
+    if args and args[0].strip() == "reset":
+        filter_settings.reset(chat_id)
+    elif args:
+        try:
+            filter_settings.update(chat_id, parse_criteria(args[0]))
+        except ValueError as e:
+            await message.answer(f"❌ {e}")
+            return
+    await message.answer(
+        f"🎯 Фильтры продавцов:\n{describe_criteria(filter_settings.criteria(chat_id))}\n\n"
+        f"Изменить: /filters age_max=12 legal=ИП inn=1 price_min=500 price_max=5000 brands=A,B exclude_brands=C\n"
+        f"Значение «-» сбрасывает фильтр, /filters reset - все фильтры по умолчанию."
+    )
+
+@dp.message(Command("subscribe"))
+async def cmd_subscribe(message: Message):
+    args = (message.text or "").split(maxsplit=1)[1:]
+    cat_key = args[0].strip() if args else None
+    if cat_key and cat_key not in CATEGORIES:
+        await message.answer(f"❌ Нет такой категории. Доступны: {', '.join(CATEGORIES)}")
+        return
+    subscriptions.subscribe(message.chat.id, cat_key)
+    names = [CATEGORIES[k]["name"] for k in subscriptions.categories_of(message.chat.id)]
+    await message.answer(
+        f"🔔 Пришлю новых продавцов из фонового обхода категорий:\n{chr(10).join(names)}\n\n"
+        f"Отписаться: /unsubscribe или /unsubscribe <категория>"
+    )
+
+@dp.message(Command("unsubscribe"))
+async def cmd_unsubscribe(message: Message):
+    args = (message.text or "").split(maxsplit=1)[1:]
+    subscriptions.unsubscribe(message.chat.id, args[0].strip() if args else None)
+    keys = subscriptions.categories_of(message.chat.id)
+    if keys:
+        await message.answer("🔕 Осталась подписка на:\n" + "\n".join(CATEGORIES[k]["name"] for k in keys if k in CATEGORIES))
+    else:
+        await message.answer(f"🔕 Подписок нет. Подписаться: /subscribe или /subscribe <категория> ({', '.join(CATEGORIES)})")
+
 @dp.callback_query(F.data == "main_menu")
 async def cb_main_menu(callback: CallbackQuery):
     with suppress(TelegramBadRequest):
@@ -246,12 +182,16 @@ async def toggle_blacklist(callback: CallbackQuery):
 
 @dp.callback_query(F.data == "clear_blacklist")
 async def clear_blacklist(callback: CallbackQuery):
-    if os.path.exists(BLACKLIST_FILE):
-        os.remove(BLACKLIST_FILE)
-    if os.path.exists(SEARCH_HISTORY_FILE):
-        os.remove(SEARCH_HISTORY_FILE)
+    seen_store.clear(callback.message.chat.id)
+    search_progress.clear()
+    crawler_progress.clear()
     await callback.answer("✅ История просмотров и прогресс страниц очищены!")
 
+@dp.callback_query(F.data == "clear_seller_cache")
+async def clear_seller_cache(callback: CallbackQuery):
+    seller_cache.invalidate()
+    await callback.answer("✅ Кэш продавцов очищен!")
+
 @dp.callback_query(F.data == "categories")
 async def cb_categories(callback: CallbackQuery):
     with suppress(TelegramBadRequest):
@@ -271,16 +211,16 @@ async def cb_manual_search(callback: CallbackQuery):
 
 @dp.callback_query(F.data == "settings")
 async def cb_settings(callback: CallbackQuery):
-    proxy_count = 0
-    if os.path.exists(PROXY_FILE):
-        with open(PROXY_FILE, "r") as f:
-            proxy_count = len([l for l in f if l.strip()])
-    
     status_text = "используются" if USE_PROXY else "НЕ используются (прямое соединение)"
     text = (
         f"⚙️ **Настройки**\n"
         f"Режим: Прокси {status_text}\n"
-        f"Загружено прокси: {proxy_count}\n\n"
+        f"{proxy_pool.summary()}\n"
+        f"Продавцов в кэше: {seller_cache.count()}\n"
+        f"Запросов с курсором страниц: {search_progress.count()}\n"
+        f"Объединено запросов: {api.flight.hits} из {api.flight.hits + api.flight.misses}\n"
+        f"Поисков: выполняется {scheduler.running}, в очереди {scheduler.waiting}\n"
+        f"Фильтры продавцов: /filters\n\n"
         f"Чтобы добавить прокси, отправьте файл `proxies.txt` или сообщение, начинающееся с `proxy:`\n"
         f"Формат: `http://user:pass@ip:port` или `socks5://...`"
     )
@@ -291,6 +231,9 @@ async def cb_settings(callback: CallbackQuery):
 async def cb_toggle_proxy(callback: CallbackQuery):
     global USE_PROXY
     USE_PROXY = not USE_PROXY
+    api.use_proxy = USE_PROXY
+    if verify_pool:
+        verify_pool.set_use_proxy(USE_PROXY)
     await cb_settings(callback)
 
 @dp.message(F.text & F.text.startswith("proxy:"))
@@ -302,6 +245,9 @@ async def add_proxy_text(message: Message):
         with open(PROXY_FILE, "a", encoding="utf-8") as f:
             for p in valid_proxies:
                 f.write(f"{p}\n")
+        proxy_pool.reload_file(PROXY_FILE)
+        if verify_pool:
+            verify_pool.reload_proxies(proxy_pool.proxies)
         await message.answer(f"✅ Добавлено {len(valid_proxies)} прокси.")
     else:
         await message.answer("❌ Неверный формат.")
@@ -316,6 +262,9 @@ async def handle_docs(message: Message):
         # Перезаписываем файл
         with open(PROXY_FILE, "wb") as f:
             f.write(proxies_content.read())
+        proxy_pool.reload_file(PROXY_FILE)
+        if verify_pool:
+            verify_pool.reload_proxies(proxy_pool.proxies)
             
         await message.answer("✅ Файл с прокси обновлен!")
 
@@ -342,158 +291,71 @@ async def run_search(message: Message, query_input: str, is_callback: bool = Fal
     
     if not msg_to_edit:
         msg_to_edit = await message.answer(status_text, parse_mode="Markdown")
-    
-    api = WBApi(use_proxy=USE_PROXY)
 
-    try:
-        all_raw_products = []
-        blacklist = load_blacklist() if USE_BLACKLIST else set()
-        search_history = load_search_history()
-        updated_history = search_history.copy()
-        
-        # 1. СБОР ТОВАРОВ (Асинхронно по всем запросам)
-        async def fetch_query_products(q):
-            clean_q = q.lower().strip()
-            # Определяем стартовую страницу. Если нет в истории - 1.
-            start_page = search_history.get(clean_q, 1)
-            # Если дошли до 100 страницы, сбрасываем на 1
-            if start_page > 100: start_page = 1
-            
-            end_page = start_page + 10
-            updated_history[clean_q] = end_page # Запоминаем, откуда начать в следующий раз
-            
-            q_products = []
-            sort = random.choice(['popular', 'newly', 'priceup', 'pricedown', 'rate'])
-            
-            # Сканируем диапазон 10 страниц (например 1-11, 11-21 и т.д.)
-            for p_idx in range(start_page, end_page):
-                res = await api.search_products(q, limit=100, page=p_idx, sort=sort)
-                if not res: break
-                
-                q_products.extend(res)
-                # Если страница явно неполная, значит товары кончились раньше времени
-                if len(res) < 10: break 
-                
-                await asyncio.sleep(0.15)
-            return q_products, start_page, end_page
-
-        await msg_to_edit.edit_text(f"⏳ Собираю товары...", parse_mode="Markdown")
-        
-        # Запускаем сбор
-        tasks = [fetch_query_products(q) for q in queries]
-        results_list = await asyncio.gather(*tasks)
-        
-        page_info_str = []
-        for i, (res_products, s_page, e_page) in enumerate(results_list):
-            all_raw_products.extend(res_products)
-            q_name = queries[i]
-            page_info_str.append(f"• {q_name}: стр. {s_page}-{e_page-1}")
+    async def on_queue_position(pos):
+        with suppress(TelegramBadRequest):
+            await msg_to_edit.edit_text(
+                f"🕒 Поиск в очереди: позиция {pos}\n"
+                f"Сейчас выполняется поисков: {scheduler.running}"
+            )
 
-        # Сохраняем новую историю страниц
-        save_search_history(updated_history)
+    # Ждем своей очереди среди поисков всех чатов
+    async with scheduler.slot(message.chat.id, on_position=on_queue_position):
+        await process_search(message.chat.id, msg_to_edit, queries)
 
-        if not all_raw_products:
-            info = "\n".join(page_info_str)
+async def process_search(chat_id: int, msg_to_edit: Message, queries: list, job: SearchJob = None):
+    async def on_progress(event, **info):
+        with suppress(TelegramBadRequest):
+            if event == PROGRESS_COLLECT:
+                await msg_to_edit.edit_text(f"⏳ Собираю товары...", parse_mode="Markdown")
+            elif event == PROGRESS_VERIFY_START:
+                await msg_to_edit.edit_text(f"✅ Собрано {info['scanned']} товаров.\n🧐 Проверяю {info['sellers']} уникальных продавцов...", parse_mode="Markdown")
+            elif event == PROGRESS_VERIFY and (info["done"] % 5 == 0 or info["done"] == info["total"]):
+                await msg_to_edit.edit_text(
+                    f"⏳ Проверка продавцов: {info['done']}/{info['total']}\n"
+                    f"✅ Подходящих новичков: {info['found']}", 
+                    parse_mode="Markdown"
+                )
+            elif event == PROGRESS_REPORT:
+                await msg_to_edit.edit_text("⏳ Собираю общий HTML-отчет...")
+
+    # Заодно убираем старые отчеты, которые не удалось отправить
+    rotate_reports()
+    try:
+        # Фильтры чата; черный список и контрольные точки ведет движок
+        result = await engine.run(
+            queries, filter_settings.pipeline(chat_id), chat_id=chat_id, job=job,
+            on_progress=on_progress, use_blacklist=USE_BLACKLIST
+        )
+
+        if not result.collected:
+            info = "\n".join(result.page_info)
             await msg_to_edit.edit_text(f"😔 Ничего не найдено в диапазонах:\n{info}\n\nПопробуйте повторить запрос, чтобы проверить следующие страницы.")
             return
 
-        # Убираем дубликаты товаров и фильтруем по черному списку
-        seen_ids = set()
-        unique_products = []
-        for p in all_raw_products:
-            pid = p.get('id')
-            sid = str(p.get("supplierId"))
-            if pid not in seen_ids and sid not in blacklist:
-                unique_products.append(p)
-                seen_ids.add(pid)
-
-        # Группируем по продавцам
-        sellers_products = {}
-        for p in unique_products:
-            sid = p.get("supplierId")
-            if sid:
-                if sid not in sellers_products:
-                    sellers_products[sid] = []
-                sellers_products[sid].append(p)
-
-        total_scanned = len(unique_products)
-        results_data = [] 
-        seller_cache = {} 
-        new_seen_sellers = set()
-        
-        await msg_to_edit.edit_text(f"✅ Собрано {total_scanned} товаров.\n🧐 Проверяю {len(sellers_products)} уникальных продавцов...", parse_mode="Markdown")
-
-        # 2. ПРОВЕРКА ПРОДАВЦОВ (Последовательно для безопасности)
-        for i, (supp_id, p_list) in enumerate(sellers_products.items(), 1):
-            if supp_id not in seller_cache:
-                try:
-                    age_res = await asyncio.wait_for(api.get_approx_seller_age(supp_id, p_list), timeout=20.0)
-                    l_info = await api.get_seller_legal_info(supp_id)
-                    seller_cache[supp_id] = {"age_data": age_res, "legal": l_info}
-                except Exception as e:
-                    logging.error(f"Error fetching info for seller {supp_id}: {e}")
-                    seller_cache[supp_id] = {"age_data": {"age": None, "type": "error"}, "legal": {}}
-                
-                await asyncio.sleep(0.05)
-
-            seller_data = seller_cache[supp_id]
-            age_data = seller_data["age_data"]
-            age = age_data.get("age") or 100
-
-            if age <= 24:
-                p = p_list[0]
-                price_raw = p.get("salePriceU") or p.get("priceU") or p.get("sizes", [{}])[0].get("price", {}).get("total")
-                price = (price_raw / 100) if price_raw else 0
-                
-                results_data.append({
-                    "id": p.get("id"),
-                    "name": p.get("name", "Без названия"),
-                    "brand": p.get("brand", "Без бренда"),
-                    "price": price,
-                    "supplierId": supp_id,
-                    "seller_name": p.get('supplier') or age_data.get("name") or "Имя скрыто",
-                    "age_months": age,
-                    "age_type": age_data.get("type", "unknown"),
-                    "legal_info": seller_data["legal"]
-                })
-                new_seen_sellers.add(supp_id)
-            
-            if i % 5 == 0 or i == len(sellers_products):
-                with suppress(TelegramBadRequest):
-                    await msg_to_edit.edit_text(
-                        f"⏳ Проверка продавцов: {i}/{len(sellers_products)}\n"
-                        f"✅ Подходящих новичков: {len(results_data)}", 
-                        parse_mode="Markdown"
-                    )
-
-        if not results_data:
+        if not result.results:
             await msg_to_edit.edit_text(f"😕 После фильтрации {len(queries)} запросов ничего нового не найдено.")
             return
 
-        await msg_to_edit.edit_text("⏳ Генерирую общий HTML-отчет...")
-        
-        # Генерируем в отдельном потоке, чтобы не блокировать бот
-        filename = await asyncio.to_thread(
-            generate_html_report, 
-            ", ".join(queries[:3]) + ("..." if len(queries)>3 else ""), 
-            results_data
-        )
-        
-        if USE_BLACKLIST and new_seen_sellers:
-            save_to_blacklist(new_seen_sellers)
-        
+        filename = result.filename
         await msg_to_edit.edit_text("📤 Отправляю файл в Telegram...")
 
         # Отправляем с большим таймаутом (5 минут для тяжелых файлов)
         try:
-            await message.answer_document(
+            await bot.send_document(
+                chat_id,
                 FSInputFile(filename),
-                caption=f"✅ Мульти-поиск завершен!\nЗапросы: {', '.join(queries)}\nНайдено новых продавцов: {len(results_data)}",
+                caption=(
+                    f"✅ Мульти-поиск завершен!\nЗапросы: {', '.join(queries)}\nНайдено новых продавцов: {len(result.results)}"
+                    + (f"\nСтраниц в отчете: {result.report_pages}" if result.report_pages > 1 else "")
+                ),
                 parse_mode="Markdown",
                 request_timeout=300 
             )
             with suppress(Exception):
                 await msg_to_edit.delete()
+            # Отправленный отчет на сервере больше не нужен
+            remove_report(filename)
         except Exception as send_error:
             logging.error(f"Error sending document: {send_error}")
             await msg_to_edit.edit_text(f"⚠️ Файл создан ({filename}), но не удалось отправить его в Telegram из-за таймаута. Он сохранен на сервере.")
@@ -503,17 +365,63 @@ async def run_search(message: Message, query_input: str, is_callback: bool = Fal
         error_msg = f"⚠️ Произошла ошибка: {str(e)[:100]}"
         with suppress(Exception):
             await msg_to_edit.edit_text(error_msg)
-    finally:
-        await api.close()
 
-async def main():
-    print("Бот запущен...")
+resumed_tasks = set()
+
+async def resume_jobs():
+    """Продолжает поиски, прерванные перезапуском бота, с последней контрольной точки."""
+    for job in job_store.unfinished():
+        checked = job_store.seller_count(job) - len(job_store.pending_sellers(job)) if job.stage == STAGE_VERIFYING else 0
+        try:
+            msg_to_edit = await bot.send_message(
+                job.chat_id,
+                f"♻️ Бот был перезапущен. Продолжаю поиск: {', '.join(job.queries)}"
+                + (f"\nУже проверено продавцов: {checked}" if checked else "")
+            )
+        except Exception as e:
+            logging.error(f"Cannot resume job {job.job_id}: {e}")
+            job_store.delete(job.job_id)
+            continue
+        task = asyncio.create_task(run_resumed_job(job, msg_to_edit))
+        resumed_tasks.add(task) # Держим ссылку, иначе задачу может собрать GC
+        task.add_done_callback(resumed_tasks.discard)
+
+async def run_resumed_job(job: SearchJob, msg_to_edit: Message):
+    async with scheduler.slot(job.chat_id):
+        await process_search(job.chat_id, msg_to_edit, job.queries, job)
+
+async def dump_metrics_periodically():
+    """Периодически выгружает метрики запросов в файл формата Prometheus."""
     while True:
+        await asyncio.sleep(METRICS_DUMP_INTERVAL)
         try:
-            await dp.start_polling(bot)
+            api.metrics.dump(METRICS_FILE)
         except Exception as e:
-            logging.error(f"Polling error: {e}")
-            await asyncio.sleep(5) # Ждем перед рестартом
+            logging.error(f"Metrics dump error: {e}")
+
+async def main():
+    print("Бот запущен...")
+    if verify_pool:
+        await verify_pool.start(api)
+    metrics_task = asyncio.create_task(dump_metrics_periodically())
+    crawler_task = asyncio.create_task(crawler.run()) if CRAWLER_ENABLED else None
+    await resume_jobs()
+    try:
+        while True:
+            try:
+                await dp.start_polling(bot)
+                break # Штатная остановка
+            except Exception as e:
+                logging.error(f"Polling error: {e}")
+                await asyncio.sleep(5) # Ждем перед рестартом
+    finally:
+        metrics_task.cancel()
+        if crawler_task:
+            crawler_task.cancel()
+        api.metrics.dump(METRICS_FILE)
+        await api.close()
+        if verify_pool:
+            await verify_pool.close()
 
 if __name__ == "__main__":
     try:
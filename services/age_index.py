@@ -0,0 +1,174 @@
+import sqlite3
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+
+from config import AGE_INDEX_FILE, AGE_INDEX_MIN_POINTS, AGE_INDEX_MAX_ERROR_DAYS, AGE_INDEX_REBUILD_INTERVAL
+
+# Ряды индекса
+SERIES_SUPPLIER = "supplier"    # supplierId -> дата регистрации (точный стаж из sellers/info)
+SERIES_NM = "nm"                # nmId -> дата самого старого отзыва
+
+MONTH = 30 * 24 * 3600          # Месяц стажа, как в эвристиках WBApi (diff.days // 30)
+
+
+class _Series:
+    """
+    Неубывающая ступенчатая аппроксимация id -> дата (изотоническая регрессия, PAV) в сортированных массивах.
+    Блок - подряд идущие по id точки с общей оценкой: first/last id, средняя дата и разброс сырых дат [lo, hi].
+    """
+
+    __slots__ = ("first", "last", "mean", "lo", "hi", "points", "built_at")
+
+    def __init__(self, rows=(), built_at: float = 0.0):
+        blocks = []     # [first_id, last_id, сумма дат, точек, lo, hi]
+        points = 0
+        for nid, lo, hi in rows:
+            points += 1
+            b = [nid, nid, (lo + hi) / 2, 1, lo, hi]
+            # Сливаем с предыдущими блоками, пока нарушается монотонность
+            while blocks and blocks[-1][2] * b[3] > b[2] * blocks[-1][3]:
+                p = blocks.pop()
+                b = [p[0], b[1], p[2] + b[2], p[3] + b[3], min(p[4], b[4]), max(p[5], b[5])]
+            blocks.append(b)
+        self.first = array("q", (b[0] for b in blocks))
+        self.last = array("q", (b[1] for b in blocks))
+        self.mean = array("d", (b[2] / b[3] for b in blocks))
+        self.lo = array("d", (b[4] for b in blocks))
+        self.hi = array("d", (b[5] for b in blocks))
+        self.points = points
+        self.built_at = built_at
+
+    def estimate(self, nid: int):
+        """(дата, погрешность в секундах) или None, если id вне выученного диапазона."""
+        i = bisect_right(self.first, nid) - 1
+        if i < 0 or nid > self.last[-1]:
+            return None
+        if nid <= self.last[i]:
+            ts, lo, hi = self.mean[i], self.lo[i], self.hi[i]
+        else:
+            # Между блоками - линейная интерполяция; по монотонности дата не раньше сырых дат
+            # левого блока и не позже сырых дат правого
+            j = i + 1
+            frac = (nid - self.last[i]) / (self.first[j] - self.last[i])
+            ts = self.mean[i] + (self.mean[j] - self.mean[i]) * frac
+            lo, hi = self.lo[i], self.hi[j]
+        return ts, max(ts - lo, hi - ts)
+
+
+class AgeIndex:
+    """
+    Выученный индекс supplierId/nmId -> дата регистрации: id на WB выдаются по порядку, поэтому дата
+    почти монотонна по id. Точки - каждый точный стаж из sellers/info и каждая дата самого старого отзыва
+    (хранятся в SQLite, переживают перезапуски и общие для процессов-воркеров). Запрос - бинарный поиск
+    с интерполяцией по сортированным массивам и оценкой погрешности. Спрашивают индекс, только когда
+    sellers/info не отдал точный стаж: уверенный ответ заменяет запросы к отзывам, а точные ответы
+    по-прежнему приходят из WB и продолжают пополнять индекс.
+    """
+
+    def __init__(self, path: str = AGE_INDEX_FILE, seed_cache=None, min_points: int = AGE_INDEX_MIN_POINTS,
+                 rebuild_interval: float = AGE_INDEX_REBUILD_INTERVAL):
+        self.path = path
+        self.min_points = min_points
+        self.rebuild_interval = rebuild_interval
+        self._series = {}           # Ряд -> _Series
+        self._added = {}            # Ряд -> точек добавлено этим процессом после перестройки
+        self.hits = 0               # Оценок вместо запросов к отзывам
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS points (
+                series TEXT,
+                id INTEGER,
+                lo REAL,
+                hi REAL,
+                PRIMARY KEY (series, id)
+            )"""
+        )
+        self.conn.commit()
+        if seed_cache is not None and not self.count():
+            self._seed(seed_cache)
+
+    def _seed(self, cache):
+        """Первый запуск: точки из уже накопленного SellerCache."""
+        rows = [(SERIES_SUPPLIER, sid, *self._exact_range(age, observed)) for sid, age, observed in cache.exact_ages()]
+        for nm_id, oldest in cache.feedback_dates():
+            ts = self._timestamp(oldest)
+            rows.append((SERIES_NM, nm_id, ts, ts))
+        self.conn.executemany("INSERT OR REPLACE INTO points (series, id, lo, hi) VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    @staticmethod
+    def _exact_range(age: int, observed: float) -> tuple:
+        # Стаж в целых месяцах: регистрация - в течение месяца до observed - age месяцев
+        return observed - (age + 1) * MONTH, observed - age * MONTH
+
+    @staticmethod
+    def _timestamp(dt: datetime) -> float:
+        # Как в эвристике по отзывам: часовой пояс отбрасывается
+        return dt.replace(tzinfo=None).timestamp()
+
+    def _add(self, series: str, nid: int, lo: float, hi: float):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO points (series, id, lo, hi) VALUES (?, ?, ?, ?)",
+            (series, int(nid), lo, hi)
+        )
+        self.conn.commit()
+        self._added[series] = self._added.get(series, 0) + 1
+
+    def add_exact_age(self, supplier_id: int, age: int, observed: float = None):
+        """Точный стаж (месяцев) из sellers/info."""
+        if age is None:
+            return
+        self._add(SERIES_SUPPLIER, supplier_id, *self._exact_range(age, observed or time.time()))
+
+    def add_feedback_date(self, nm_id: int, oldest: datetime):
+        """Дата самого старого отзыва товара."""
+        if oldest is None:
+            return
+        ts = self._timestamp(oldest)
+        self._add(SERIES_NM, nm_id, ts, ts)
+
+    def _get_series(self, series: str) -> _Series:
+        """
+        Массивы ряда. Перестраиваются из базы раз в rebuild_interval (подхватить точки других процессов)
+        или когда свои новые точки увеличили ряд на 10% (но не меньше min_points) - перестройка в среднем O(1) на точку.
+        """
+        current = self._series.get(series)
+        now = time.time()
+        if (current is None or now - current.built_at >= self.rebuild_interval
+                or self._added.get(series, 0) >= max(self.min_points, current.points // 10)):
+            rows = self.conn.execute("SELECT id, lo, hi FROM points WHERE series = ? ORDER BY id", (series,))
+            current = self._series[series] = _Series(rows, built_at=now)
+            self._added[series] = 0
+        return current
+
+    def estimate(self, series: str, nid: int):
+        """(дата регистрации, погрешность в секундах) или None, если точек мало или id вне диапазона."""
+        data = self._get_series(series)
+        if data.points < self.min_points:
+            return None
+        return data.estimate(int(nid))
+
+    def age_months(self, series: str, nid: int, max_error_days: float = AGE_INDEX_MAX_ERROR_DAYS) -> int:
+        """Стаж в месяцах по индексу, если погрешность не больше max_error_days (None - любая), иначе None."""
+        found = self.estimate(series, nid)
+        if found is None:
+            return None
+        ts, error = found
+        if max_error_days is not None and error > max_error_days * 24 * 3600:
+            return None
+        return max(0, int((time.time() - ts) // MONTH))
+
+    def count(self, series: str = None) -> int:
+        if series is None:
+            return self.conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM points WHERE series = ?", (series,)).fetchone()[0]
+
+    def summary(self) -> str:
+        return (f"Индекс стажа: {self.count(SERIES_SUPPLIER)} продавцов, {self.count(SERIES_NM)} товаров, "
+                f"оценок вместо отзывов {self.hits}")
+
+    def close(self):
+        self.conn.close()
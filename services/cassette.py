@@ -0,0 +1,117 @@
+import base64
+import json
+import logging
+import time
+from urllib.parse import urlencode
+
+from config import CASSETTE_FILE
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(method: str, url: str, params: dict = None) -> str:
+    """Ключ запроса: метод и URL с отсортированными параметрами."""
+    if params:
+        sep = "&" if "?" in url else "?"
+        url = f"{url}{sep}{urlencode(sorted((str(k), str(v)) for k, v in params.items()))}"
+    return f"{method.upper()} {url}"
+
+
+class CassetteResponse:
+    """Ответ из кассеты: то немногое от aiohttp-ответа, что нужно вызывающему коду."""
+    __slots__ = ("status", "headers")
+
+    def __init__(self, status: int, headers: dict):
+        self.status = status
+        self.headers = headers
+
+
+class CassetteEntry:
+    """Одна попытка запроса: статус (или "error"), заголовок Content-Type и тело."""
+    __slots__ = ("status", "content_type", "body")
+
+    def __init__(self, status, content_type: str, body: bytes):
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+    @property
+    def response(self) -> CassetteResponse:
+        return CassetteResponse(self.status, {"Content-Type": self.content_type} if self.content_type else {})
+
+
+class Cassette:
+    """
+    Кассета запросов к WB в формате JSONL: по строке на каждую попытку запроса.
+    record - дописывает ответы (и ошибки соединения) в файл, replay - отдает их без сети
+    в том же порядке для одинаковых запросов, а по исчерпании повторяет последний.
+    """
+
+    def __init__(self, path: str = CASSETTE_FILE, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Неизвестный режим кассеты: {mode}")
+        self.path = path
+        self.mode = mode
+        self.misses = 0
+        self._entries = {}   # ключ -> [CassetteEntry, ...]
+        self._cursor = {}    # ключ -> индекс следующей записи
+        self._file = None
+        if mode == "replay":
+            self._load()
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self):
+        count = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # Обрезанная последняя строка после падения
+                if "body_b64" in rec:
+                    body = base64.b64decode(rec["body_b64"])
+                else:
+                    body = rec.get("body", "").encode("utf-8")
+                entry = CassetteEntry(rec["status"], rec.get("content_type"), body)
+                self._entries.setdefault(rec["key"], []).append(entry)
+                count += 1
+        logger.info("Кассета %s: %d записей, %d запросов", self.path, count, len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def next(self, method: str, url: str, params: dict = None):
+        """Следующая записанная попытка для запроса или None, если такого запроса не было."""
+        key = request_key(method, url, params)
+        entries = self._entries.get(key)
+        if not entries:
+            self.misses += 1
+            return None
+        idx = self._cursor.get(key, 0)
+        self._cursor[key] = idx + 1
+        return entries[min(idx, len(entries) - 1)]
+
+    def record(self, method: str, url: str, params: dict, status, content_type: str = None, body: bytes = b""):
+        """Дописывает попытку в кассету (status="error" - ошибка соединения)."""
+        rec = {"key": request_key(method, url, params), "ts": round(time.time(), 3),
+               "status": status, "content_type": content_type}
+        try:
+            rec["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            rec["body_b64"] = base64.b64encode(body).decode("ascii")
+        self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self.misses:
+            logger.warning("Кассета %s: %d запросов не найдено", self.path, self.misses)
@@ -1,6 +1,10 @@
+import logging
+
 from services.wb_api import WBApi
 from services.filters import is_valid_seller
 
+logger = logging.getLogger(__name__)
+
 class ProductFilter:
     def __init__(self, api: WBApi):
         self.api = api
@@ -17,7 +21,10 @@ class ProductFilter:
         if not products:
             return []
 
-        print(f"[Filter] Найдено {len(products)} товаров. Начинаем проверку...")
+        logger.info("Найдено %d товаров. Начинаем проверку...", len(products))
+
+        # 1. Заходим в карточки товаров (сигнал WB, что мы смотрим) - пачками, а не по одной
+        await self.api.get_products_details(item.get('id') for item in products)
 
         for item in products:
             product_id = item.get('id')
@@ -26,22 +33,17 @@ class ProductFilter:
             if not supplier_id:
                 continue
 
-            # Имитируем действия пользователя
-            await self.api.random_sleep()
-
-            # 1. Заходим в карточку товара (сигнал WB, что мы смотрим)
-            await self.api.get_product_details(product_id)
-
+            # Темп запросов задает адаптивный лимит внутри WBApi
             # 2. Получаем инфо о продавце
             seller_info = await self.api.get_seller_info(supplier_id)
             if not seller_info:
-                print(f"[-] Пропуск {product_id}: нет данных продавца")
+                logger.info("[-] Пропуск %s: нет данных продавца", product_id)
                 continue
 
             # 3. Применяем фильтры
             is_valid, message = is_valid_seller(seller_info)
             if is_valid:
-                print(f"[+] {message}")
+                logger.info("[+] %s", message)
                 results.append({
                     "product_id": product_id,
                     "supplier_id": supplier_id,
@@ -51,6 +53,6 @@ class ProductFilter:
                     "reg_date": seller_info.get('registrationDate')
                 })
             else:
-                print(f"[-] {message}")
+                logger.info("[-] %s", message)
 
         return results
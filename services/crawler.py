@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import os
+
+from config import (
+    SUBSCRIPTIONS_FILE, SELLER_FILTERS, CRAWLER_INTERVAL, CRAWLER_START_DELAY, CRAWLER_REQUEST_BUDGET,
+    CRAWLER_CONCURRENCY, CRAWLER_IDLE_POLL, CRAWLER_ALERT_LIMIT
+)
+from categories import CATEGORIES
+from services.engine import SearchEngine
+from services.filters import FilterPipeline, STAGE_PRODUCT
+from services.metrics import counting_requests
+from services.report import format_age
+from services.verifier import verify_sellers
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriptions:
+    """Подписки чатов на категории: chat_id -> [ключи категорий], пустой список - все категории."""
+
+    def __init__(self, path: str = SUBSCRIPTIONS_FILE):
+        self.path = path
+        self._chats = self._load()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return {int(k): v for k, v in json.load(f).items()}
+        except Exception:
+            return {}
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._chats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def subscribe(self, chat_id: int, cat_key: str = None):
+        keys = self._chats.get(chat_id)
+        if cat_key is None:
+            self._chats[chat_id] = []
+        elif keys != [] and cat_key not in (keys or []):
+            self._chats[chat_id] = (keys or []) + [cat_key]
+        self._save()
+
+    def unsubscribe(self, chat_id: int, cat_key: str = None):
+        keys = [k for k in self.categories_of(chat_id) if k != cat_key] if cat_key else []
+        if keys:
+            self._chats[chat_id] = keys
+        else:
+            self._chats.pop(chat_id, None)
+        self._save()
+
+    def categories_of(self, chat_id: int) -> list:
+        """Ключи категорий чата (все - если подписан на все), пустой список - подписок нет."""
+        keys = self._chats.get(chat_id)
+        if keys is None:
+            return []
+        return keys or list(CATEGORIES)
+
+    def chats_for(self, cat_key: str) -> list:
+        return [chat_id for chat_id, keys in self._chats.items() if not keys or cat_key in keys]
+
+
+class _BudgetedApi:
+    """WBApi для обхода: когда бюджет цикла исчерпан, поиск отвечает как при сетевой ошибке (None)."""
+
+    def __init__(self, api, over_budget):
+        self._api = api
+        self._over_budget = over_budget
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+    async def search_products(self, *args, **kwargs):
+        # Страница не загружена - курсор остановится на ней, следующий цикл начнет с нее же
+        if self._over_budget():
+            return None
+        return await self._api.search_products(*args, **kwargs)
+
+
+class CategoryCrawler:
+    """
+    Фоновый обход запросов из CATEGORIES по расписанию, пока нет интерактивных поисков.
+    Заполняет кэш стажа и юр. информации продавцов, чтобы нажатие на кнопку категории обслуживалось
+    в основном из готовых данных, и присылает подписанным чатам новых продавцов.
+    progress - свой SearchProgress: курсоры страниц и отметки новинок интерактивных поисков обход не сдвигает.
+    За цикл тратит не больше CRAWLER_REQUEST_BUDGET своих запросов к WB (интерактивные поиски в бюджет не входят):
+    бюджет проверяется перед каждой страницей выдачи и каждой проверкой продавца, а перед каждым продавцом
+    обход еще и ждет окончания интерактивных поисков. Следующий цикл продолжает с того запроса,
+    на котором остановился предыдущий.
+    """
+
+    def __init__(self, api, progress, seen_store, filter_settings, subscriptions: Subscriptions,
+                 notify, is_busy=None, categories: dict = CATEGORIES, budget: int = CRAWLER_REQUEST_BUDGET):
+        self.api = api
+        self.progress = progress
+        self.seen_store = seen_store
+        self.filter_settings = filter_settings
+        self.subscriptions = subscriptions
+        self.notify = notify            # async notify(chat_id, text)
+        self.is_busy = is_busy          # () -> True, пока идут интерактивные поиски
+        self.budget = budget
+        self.categories = categories
+        self.pipeline = FilterPipeline(SELLER_FILTERS)
+        self.engine = SearchEngine(_BudgetedApi(api, self.over_budget), progress, verify_concurrency=CRAWLER_CONCURRENCY)
+        self._targets = [(key, q) for key, data in categories.items() for q in data.get("queries", [])]
+        self._next = 0                  # Индекс запроса, с которого начнется следующий цикл
+        self.cycles = 0
+        self.last_requests = 0          # Запросов за последний цикл
+        self.alerts = 0
+        self._counter = None            # Запросы текущего цикла (только запросы обхода)
+
+    async def run(self):
+        await asyncio.sleep(CRAWLER_START_DELAY)
+        while True:
+            try:
+                await self.crawl_once()
+            except Exception as e:
+                logger.error(f"Crawler error: {e}")
+            await asyncio.sleep(CRAWLER_INTERVAL)
+
+    def over_budget(self) -> bool:
+        return self._counter is not None and self._counter.count >= self.budget
+
+    async def wait_idle(self):
+        """Интерактивные поиски важнее - ждем, пока очередь освободится."""
+        while self.is_busy and self.is_busy():
+            await asyncio.sleep(CRAWLER_IDLE_POLL)
+
+    async def crawl_once(self) -> int:
+        """Один цикл обхода в пределах бюджета; возвращает число обойденных запросов."""
+        # Счетчик видит запросы этой задачи и ее подзадач, но не одновременных интерактивных поисков
+        self._counter = counting_requests()
+        done = 0
+        while done < len(self._targets):
+            if self.over_budget():
+                break
+            await self.wait_idle()
+            cat_key, query = self._targets[self._next]
+            self._next = (self._next + 1) % len(self._targets)
+            done += 1
+            try:
+                await self._crawl_query(cat_key, query)
+            except Exception as e:
+                logger.error(f"Crawler error on '{query}': {e}")
+        self.cycles += 1
+        self.last_requests = self._counter.count
+        logger.info("Фоновый обход: %d запросов категорий, %d запросов к WB", done, self.last_requests)
+        return done
+
+    async def _crawl_query(self, cat_key: str, query: str):
+        ctx = self.pipeline.context()
+        collector, _ = await self.engine.collect([query], self.pipeline, ctx)
+        if not collector.sellers:
+            return
+        # Проверка по критериям по умолчанию заполняет кэш стажа и юр. информации
+        checked = await verify_sellers(self.api, collector.sellers, CRAWLER_CONCURRENCY,
+                                       pipeline=self.pipeline, ctx=ctx, stop=self.over_budget, pause=self.wait_idle)
+        # Уведомляем только о проверенных: их данные уже в кэше, проверка по фильтрам чата почти не ходит в сеть
+        sellers = {sid: products for sid, products, _ in checked}
+        if not sellers:
+            return
+        for chat_id in self.subscriptions.chats_for(cat_key):
+            await self._alert(chat_id, cat_key, query, sellers)
+
+    async def _alert(self, chat_id: int, cat_key: str, query: str, sellers_products: dict):
+        """Проверяет продавцов по фильтрам чата (данные уже в кэше) и присылает тех, кого чат еще не видел."""
+        pipeline = self.filter_settings.pipeline(chat_id)
+        ctx = pipeline.context()
+        candidates = {}
+        for sid, products in sellers_products.items():
+            if self.seen_store.contains(chat_id, sid):
+                continue
+            products, _ = pipeline.filter(products, STAGE_PRODUCT, ctx)
+            if products:
+                candidates[sid] = products
+        if not candidates:
+            return
+        # Бюджет и интерактивные поиски учитываем и здесь: данных в кэше может не оказаться
+        checked = await verify_sellers(self.api, candidates, CRAWLER_CONCURRENCY, pipeline=pipeline, ctx=ctx,
+                                       stop=self.over_budget, pause=self.wait_idle)
+        found = [(sid, products, data) for sid, products, data in checked if not data["rejected"]]
+        if not found:
+            return
+
+        self.seen_store.add_many(chat_id, {sid for sid, _, _ in found})
+        lines = []
+        for sid, products, data in found[:CRAWLER_ALERT_LIMIT]:
+            name = products[0].supplier or data["age_data"].get("name") or "Имя скрыто"
+            age = data["age_data"].get("age")
+            age_str = format_age(age) if age is not None else "стаж неизвестен"
+            lines.append(f"• {name} — {age_str} — https://www.wildberries.ru/seller/{sid}")
+        if len(found) > CRAWLER_ALERT_LIMIT:
+            lines.append(f"...и еще {len(found) - CRAWLER_ALERT_LIMIT}")
+        cat_name = self.categories.get(cat_key, {}).get("name", cat_key)
+        try:
+            await self.notify(chat_id, f"🆕 Новые продавцы: {cat_name}, «{query}»\n" + "\n".join(lines))
+            self.alerts += 1
+        except Exception as e:
+            logger.error(f"Cannot send alert to {chat_id}: {e}")
+
+    def summary(self) -> str:
+        return (f"Фоновый обход: циклов {self.cycles}, запросов к WB за последний {self.last_requests} "
+                f"из {self.budget}, уведомлений {self.alerts}")
@@ -0,0 +1,230 @@
+import asyncio
+
+from config import VERIFY_CONCURRENCY, PRODUCT_DETAIL_BATCH, SEARCH_PAGES_PER_RUN, QUERY_CONCURRENCY, REPORT_DIR
+from services.job_store import STAGE_COLLECTING
+from services.paginator import scan_query, describe_scan
+from services.products import ProductCollector
+from services.report import ReportWriter
+from services.verifier import verify_sellers
+from services.wb_api import detail_summary
+
+# События on_progress(event, **info)
+PROGRESS_COLLECT = "collect"            # Начат сбор товаров
+PROGRESS_VERIFY_START = "verify_start"  # scanned, sellers
+PROGRESS_VERIFY = "verify"              # done, total, found
+PROGRESS_REPORT = "report"              # Собирается HTML-отчет
+
+
+class SearchResult:
+    """Итог поиска: что собрано, кто найден и где отчет."""
+
+    def __init__(self, queries: list):
+        self.queries = queries
+        self.page_info = []     # Строки "• запрос: стр. N-M"
+        self.collected = False  # Пришел ли хоть один товар
+        self.scanned = 0        # Уникальных товаров после черного списка
+        self.sellers = 0        # Продавцов на проверке
+        self.results = []       # Найденные карточки (dict) в порядке проверки
+        self.filename = None    # HTML-отчет (или zip), если он собирался и что-то нашлось
+        self.report_pages = 0
+
+
+class SearchEngine:
+    """
+    Конвейер поиска без привязки к Telegram: сбор страниц -> дедупликация и группировка по продавцам ->
+    проверка продавцов -> дозагрузка карточек -> отчет. Используется ботом, фоновым обходом, CLI и бенчмарком.
+    Необязательные части: seen_store (черный список чата), job_store (контрольные точки),
+    verify_pool (проверка в процессах-воркерах).
+    """
+
+    def __init__(self, api, progress, seen_store=None, job_store=None, verify_pool=None,
+                 verify_concurrency: int = VERIFY_CONCURRENCY, query_concurrency: int = QUERY_CONCURRENCY,
+                 pages: int = SEARCH_PAGES_PER_RUN, sort: str = None):
+        self.api = api
+        self.progress = progress            # SearchProgress: курсоры страниц и отметки новинок
+        self.seen_store = seen_store
+        self.job_store = job_store
+        self.verify_pool = verify_pool
+        self.verify_concurrency = verify_concurrency
+        self.query_concurrency = query_concurrency
+        self.pages = pages
+        self.sort = sort                    # None - случайная сортировка на каждый проход
+
+    async def collect(self, queries: list, pipeline=None, ctx=None, skip_supplier=None, job=None) -> tuple:
+        """
+        Собирает товары по запросам (не больше query_concurrency запросов одновременно).
+        С job сохраняет контрольную точку; отметки новинок сдвигаются только после нее.
+        Возвращает (ProductCollector, строки о страницах).
+        """
+        collector = ProductCollector(skip_supplier=skip_supplier, pipeline=pipeline, ctx=ctx)
+        seen_ids = {q: set() for q in queries}  # nmId по запросам - для отметок после контрольной точки
+        semaphore = asyncio.Semaphore(self.query_concurrency)
+
+        def on_page_for(q):
+            def on_page(products):
+                seen_ids[q].update(p.get("id") for p in products)
+                collector.add_page(products)
+            return on_page
+
+        async def scan(q):
+            async with semaphore:
+                # После перезапуска - те же страницы, что были выделены до него
+                return await scan_query(
+                    self.api, self.progress, q, on_page_for(q),
+                    page_range=job.ranges.get(q) if job else None,
+                    on_claim=(lambda start, end: self.job_store.set_range(job, q, start, end)) if job else None,
+                    pages=self.pages, sort=self.sort
+                )
+
+        scans = await asyncio.gather(*(scan(q) for q in queries))
+        page_info = [describe_scan(q, s) for q, s in zip(queries, scans)]
+        if job and collector.raw:
+            self.job_store.save_sellers(job, collector.sellers, collector.unique, page_info)
+        # Отметки сдвигаем только после контрольной точки: иначе при перезапуске новинки потерялись бы
+        for q, ids in seen_ids.items():
+            await self.progress.update_watermark(q, ids)
+        return collector, page_info
+
+    async def run(self, queries: list, pipeline, chat_id: int = None, job=None, title: str = None,
+                  html: bool = True, sinks: list = (), on_progress=None, use_blacklist: bool = True,
+                  report_dir: str = None) -> SearchResult:
+        """
+        Полный поиск. С job_store создает контрольную точку (или продолжает job).
+        sinks - дополнительные выгрузки с методом add(result) (JSONL/CSV); открывает и закрывает их вызывающий,
+        on_progress(event, **info) - async-колбэк о ходе поиска (события PROGRESS_*).
+        Черный список чата (seen_store + chat_id) пропускает уже показанных продавцов и пополняется найденными.
+        При ошибке контрольная точка удаляется и исключение пробрасывается дальше.
+        """
+        if self.job_store and job is None:
+            job = self.job_store.create(chat_id, queries)
+        try:
+            return await self._run(queries, pipeline, chat_id, job, title, html, sinks, on_progress,
+                                   use_blacklist, report_dir)
+        except Exception:
+            # Ошибка не из-за перезапуска - продолжать такой поиск бессмысленно
+            if job:
+                self.job_store.delete(job.job_id)
+            raise
+
+    async def _run(self, queries, pipeline, chat_id, job, title, html, sinks, on_progress, use_blacklist, report_dir):
+        async def notify(event, **info):
+            if on_progress:
+                await on_progress(event, **info)
+
+        result = SearchResult(queries)
+        ctx = pipeline.context() # Общий момент отсчета на весь поиск
+        blacklist = self.seen_store is not None and chat_id is not None and use_blacklist
+
+        # 1. СБОР ТОВАРОВ (Асинхронно по всем запросам)
+        if job is None or job.stage == STAGE_COLLECTING:
+            await notify(PROGRESS_COLLECT)
+            collector, result.page_info = await self.collect(
+                queries, pipeline, ctx,
+                skip_supplier=(lambda sid: self.seen_store.contains(chat_id, sid)) if blacklist else None,
+                job=job
+            )
+            if not collector.raw:
+                if job:
+                    self.job_store.delete(job.job_id)
+                return result
+            sellers_products = collector.sellers
+            result.scanned = collector.unique
+        else:
+            sellers_products = self.job_store.pending_sellers(job)
+            result.page_info = job.page_info
+            result.scanned = job.scanned
+        result.collected = True
+        result.sellers = len(sellers_products)
+
+        results_data = self.job_store.results(job) if job else [] # Найденные до перезапуска
+        result.results = results_data
+        new_seen_sellers = {r["supplierId"] for r in results_data}
+        # Отчет пишется на диск по мере проверки продавцов
+        report = None
+        if html:
+            report_title = title or ", ".join(queries[:3]) + ("..." if len(queries) > 3 else "")
+            report = ReportWriter(report_title, out_dir=report_dir or REPORT_DIR, criteria=pipeline.criteria)
+        writers = ([report] if report else []) + list(sinks)
+        pending_results = list(results_data) # Ждут дозагрузки карточек (цена, рейтинг, остаток) одной пачкой
+
+        async def flush_pending():
+            details = await self.api.get_products_details(r["id"] for r in pending_results)
+            for r in pending_results:
+                detail = details.get(r["id"])
+                if detail:
+                    summary = detail_summary(detail)
+                    r.update({k: v for k, v in summary.items() if v is not None})
+                for w in writers:
+                    w.add(r)
+            pending_results.clear()
+
+        if pending_results:
+            await flush_pending()
+
+        await notify(PROGRESS_VERIFY_START, scanned=result.scanned, sellers=result.sellers)
+
+        # 2. ПРОВЕРКА ПРОДАВЦОВ (Пулом воркеров с ограничением параллельности)
+        async def on_seller_checked(supp_id, p_list, seller_data):
+            age_data = seller_data["age_data"]
+            age = age_data.get("age") # 0 - новичок, None - стаж неизвестен
+
+            # Критерии (стаж, форма, ИНН) уже проверены в check_seller по фильтрам
+            found = None
+            if not seller_data["rejected"]:
+                p = p_list[0]
+                found = {
+                    "id": p.id,
+                    "name": p.name or "Без названия",
+                    "brand": p.brand or "Без бренда",
+                    "price": p.price,
+                    "supplierId": supp_id,
+                    "seller_name": p.supplier or age_data.get("name") or "Имя скрыто",
+                    "age_months": age,
+                    "age_type": age_data.get("type", "unknown"),
+                    "legal_info": seller_data["legal"]
+                }
+            # Отметка до добавления в отчет: после перезапуска проверенный продавец не проверяется снова
+            if job:
+                self.job_store.mark_checked(job, supp_id, found)
+            if found:
+                results_data.append(found)
+                pending_results.append(found)
+                new_seen_sellers.add(supp_id)
+                if len(pending_results) >= PRODUCT_DETAIL_BATCH:
+                    await flush_pending()
+
+        async def on_verify_progress(done, total):
+            await notify(PROGRESS_VERIFY, done=done, total=total, found=len(results_data))
+
+        if self.verify_pool:
+            await self.verify_pool.verify(
+                sellers_products, on_result=on_seller_checked, on_progress=on_verify_progress,
+                pipeline=pipeline, ctx=ctx
+            )
+        else:
+            await verify_sellers(
+                self.api, sellers_products, self.verify_concurrency,
+                on_result=on_seller_checked, on_progress=on_verify_progress,
+                pipeline=pipeline, ctx=ctx
+            )
+        if pending_results:
+            await flush_pending()
+
+        if not results_data:
+            if job:
+                self.job_store.delete(job.job_id)
+            if report:
+                report.discard()
+            return result
+
+        # 3. ОТЧЕТ: закрываем страницы и упаковываем архив в отдельном потоке, чтобы не блокировать цикл событий
+        await notify(PROGRESS_REPORT)
+        if report:
+            result.filename = await asyncio.to_thread(report.finish)
+            result.report_pages = len(report.pages)
+
+        if blacklist and new_seen_sellers:
+            self.seen_store.add_many(chat_id, new_seen_sellers)
+        if job:
+            self.job_store.delete(job.job_id) # Отчет готов - продолжать больше нечего
+        return result
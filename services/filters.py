@@ -1,5 +1,276 @@
+import json
+import os
+import re
 from datetime import datetime, timedelta
 
+from config import SELLER_FILTERS, CHAT_FILTERS_FILE
+
+# Этапы по стоимости данных: товары уже на руках, стаж и юр. информация требуют запросов к WB.
+# Правила этапа проверяются, как только его данные получены, - отсеянным продавцам следующие
+# (более дорогие) запросы уже не нужны.
+STAGE_PRODUCT = 0
+STAGE_AGE = 1
+STAGE_LEGAL = 2
+
+# Полные названия форм - в юр. информации WB встречаются оба варианта
+LEGAL_FORM_NAMES = {
+    "ИП": "ИНДИВИДУАЛЬНЫЙ ПРЕДПРИНИМАТЕЛЬ",
+    "ООО": "ОБЩЕСТВО С ОГРАНИЧЕННОЙ ОТВЕТСТВЕННОСТЬЮ",
+    "АО": "АКЦИОНЕРНОЕ ОБЩЕСТВО",
+}
+
+
+# Начало даты ISO: строки сравниваются только для корректных дат, иначе "мусор" прошел бы порог
+_ISO_DATE = re.compile(r"\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])")
+
+
+def _reg_date(record: dict):
+    """Дата регистрации YYYY-MM-DD или None, если ее нет или она в неожиданном формате."""
+    value = record.get("registrationDate")
+    return value[:10] if isinstance(value, str) and _ISO_DATE.match(value) else None
+
+
+def seller_name(record: dict) -> str:
+    """Наименование продавца: из юр. информации, если она есть, иначе из sellers/info или выдачи."""
+    legal = record.get("legal") or {}
+    return (legal.get("supplierFullName") or legal.get("supplierName") or record.get("name") or "").strip()
+
+
+class Rule:
+    """Одно правило фильтра: этап, стоимость, предикат test(record, ctx) и текст причины отказа."""
+    __slots__ = ("name", "stage", "cost", "test", "reason")
+
+    def __init__(self, name: str, stage: int, cost: int, test, reason):
+        self.name = name
+        self.stage = stage
+        self.cost = cost
+        self.test = test
+        self.reason = reason
+
+
+class FilterContext:
+    """Общие для всей пачки значения: момент отсчета и производные от него пороги."""
+    __slots__ = ("now", "reg_threshold")
+
+    def __init__(self, now: datetime, reg_max_days):
+        self.now = now
+        # Даты ISO сравниваются строками - порог считаем один раз, а не разбираем дату у каждого продавца
+        self.reg_threshold = (now - timedelta(days=reg_max_days)).strftime("%Y-%m-%d") if reg_max_days is not None else None
+
+
+def _compile_rules(c: dict) -> list:
+    rules = []
+
+    # Границы передаются в лямбды аргументами по умолчанию, иначе все замкнут последнее значение bound
+    # --- Товары (бесплатно: данные уже в выдаче), записи - ProductRecord ---
+    if c.get("price_min") is not None:
+        bound = c["price_min"]
+        rules.append(Rule("price_min", STAGE_PRODUCT, 1,
+                          lambda r, ctx, b=bound: r.price >= b,
+                          lambda r, b=bound: f"Пропуск: Цена ниже {b} ₽"))
+    if c.get("price_max") is not None:
+        bound = c["price_max"]
+        rules.append(Rule("price_max", STAGE_PRODUCT, 1,
+                          lambda r, ctx, b=bound: r.price <= b,
+                          lambda r, b=bound: f"Пропуск: Цена выше {b} ₽"))
+    if c.get("brands"):
+        allowed = {b.casefold() for b in c["brands"]}
+        rules.append(Rule("brands", STAGE_PRODUCT, 2,
+                          lambda r, ctx: str(r.brand or "").casefold() in allowed,
+                          lambda r: f"Пропуск: Бренд не из списка ({r.brand})"))
+    if c.get("exclude_brands"):
+        excluded = {b.casefold() for b in c["exclude_brands"]}
+        rules.append(Rule("exclude_brands", STAGE_PRODUCT, 2,
+                          lambda r, ctx: str(r.brand or "").casefold() not in excluded,
+                          lambda r: f"Пропуск: Исключенный бренд ({r.brand})"))
+
+    # --- Стаж (sellers/info или эвристика) ---
+    # Стаж 0 - новичок (ради них бот и нужен), а не "неизвестно". Неизвестный стаж (None: ошибка проверки)
+    # не проходит ни одну из границ: подтвердить, что продавец в диапазоне, нечем
+    if c.get("age_max_months") is not None:
+        bound = c["age_max_months"]
+        rules.append(Rule("age_max_months", STAGE_AGE, 1,
+                          lambda r, ctx, b=bound: r.get("age_months") is not None and r["age_months"] <= b,
+                          lambda r, b=bound: (f"Пропуск: Стаж больше {b} мес." if r.get("age_months") is not None
+                                              else "Пропуск: Стаж неизвестен")))
+    if c.get("age_min_months") is not None:
+        bound = c["age_min_months"]
+        rules.append(Rule("age_min_months", STAGE_AGE, 1,
+                          lambda r, ctx, b=bound: r.get("age_months") is not None and r["age_months"] >= b,
+                          lambda r, b=bound: (f"Пропуск: Стаж меньше {b} мес." if r.get("age_months") is not None
+                                              else "Пропуск: Стаж неизвестен")))
+    if c.get("reg_max_days") is not None:
+        rules.append(Rule("reg_max_days", STAGE_AGE, 2,
+                          lambda r, ctx: (_reg_date(r) or "") >= ctx.reg_threshold,
+                          lambda r: (f"Пропуск: Старый аккаунт (рег: {_reg_date(r)})" if _reg_date(r)
+                                     else f"Ошибка проверки даты: {r['registrationDate']}" if r.get("registrationDate")
+                                     else "Пропуск: Нет даты регистрации")))
+
+    # --- Юр. информация (webapi/seller/info/legal) ---
+    if c.get("legal_forms"):
+        forms = tuple(p + " " for f in c["legal_forms"] for p in (f.upper(), LEGAL_FORM_NAMES.get(f.upper())) if p)
+        label = "/".join(c["legal_forms"])
+        rules.append(Rule("legal_forms", STAGE_LEGAL, 1,
+                          lambda r, ctx: (seller_name(r).upper() + " ").startswith(forms),
+                          lambda r: f"Пропуск: Не {label} ({seller_name(r)})"))
+    if c.get("require_inn"):
+        rules.append(Rule("require_inn", STAGE_LEGAL, 1,
+                          lambda r, ctx: bool((r.get("legal") or {}).get("inn")),
+                          lambda r: "Пропуск: Нет ИНН"))
+    return rules
+
+
+class FilterPipeline:
+    """
+    Скомпилированный набор правил. filter() проверяет пачку записей правило за правилом в порядке стоимости,
+    так что каждое следующее правило получает только то, что прошло предыдущие. Пачкой идет только этап
+    товаров (вся выдача уже на руках); стаж и юр. информация приходят по одному продавцу, поэтому их этапы
+    проверяются check() для каждого продавца сразу по получении данных - до следующего, более дорогого запроса.
+    """
+
+    def __init__(self, criteria: dict):
+        self.criteria = dict(criteria)
+        self.rules = sorted(_compile_rules(self.criteria), key=lambda r: (r.stage, r.cost))
+
+    def context(self, now: datetime = None) -> FilterContext:
+        return FilterContext(now or datetime.now(), self.criteria.get("reg_max_days"))
+
+    def has_stage(self, stage: int) -> bool:
+        return any(r.stage == stage for r in self.rules)
+
+    def filter(self, records: list, stage: int = None, ctx: FilterContext = None) -> tuple:
+        """
+        Прогоняет пачку через правила этапа (или все правила, если stage=None).
+        Возвращает (прошедшие, [(запись, причина отказа), ...]).
+        """
+        ctx = ctx or self.context()
+        rules = self.rules if stage is None else [r for r in self.rules if r.stage == stage]
+        if stage is None:
+            rules = sorted(rules, key=lambda r: r.cost)
+        passed = list(records)
+        rejected = []
+        for rule in rules:
+            if not passed:
+                break
+            keep = []
+            for rec in passed:
+                if rule.test(rec, ctx):
+                    keep.append(rec)
+                else:
+                    rejected.append((rec, rule.reason(rec)))
+            passed = keep
+        return passed, rejected
+
+    def check(self, record: dict, stage: int = None, ctx: FilterContext = None) -> tuple:
+        """Проверка одной записи (этапы стажа и юр. информации в check_seller): (прошла, причина отказа или None)."""
+        passed, rejected = self.filter([record], stage, ctx)
+        return (True, None) if passed else (False, rejected[0][1])
+
+
+# --- Настройки фильтров по чатам ---
+
+# Ключ команды /filters -> (ключ критерия, тип значения)
+FILTER_KEYS = {
+    "age_min": ("age_min_months", int),
+    "age_max": ("age_max_months", int),
+    "price_min": ("price_min", float),
+    "price_max": ("price_max", float),
+    "legal": ("legal_forms", list),
+    "inn": ("require_inn", bool),
+    "brands": ("brands", list),
+    "exclude_brands": ("exclude_brands", list),
+}
+
+
+def parse_criteria(text: str) -> dict:
+    """
+    Разбирает аргументы /filters вида `age_max=12 legal=ИП,ООО inn=1 price_max=5000`.
+    Значение `-` сбрасывает критерий к значению из config. Бросает ValueError с понятным текстом.
+    """
+    updates = {}
+    for token in text.split():
+        if "=" not in token:
+            raise ValueError(f"Ожидается ключ=значение, получено: {token}")
+        key, value = token.split("=", 1)
+        if key not in FILTER_KEYS:
+            raise ValueError(f"Неизвестный фильтр: {key}. Доступны: {', '.join(FILTER_KEYS)}")
+        name, kind = FILTER_KEYS[key]
+        if value == "-":
+            updates[name] = SELLER_FILTERS.get(name)
+        elif kind is list:
+            updates[name] = [v.strip() for v in value.split(",") if v.strip()]
+        elif kind is bool:
+            updates[name] = value.lower() in ("1", "да", "yes", "true", "on")
+        else:
+            try:
+                updates[name] = kind(value)
+            except ValueError:
+                raise ValueError(f"Неверное значение для {key}: {value}")
+    return updates
+
+
+def describe_criteria(c: dict) -> str:
+    """Текущие критерии для ответа на /filters."""
+    parts = []
+    if c.get("age_min_months") is not None or c.get("age_max_months") is not None:
+        parts.append(f"Стаж: {c.get('age_min_months') or 0}-{c.get('age_max_months') or '∞'} мес.")
+    if c.get("reg_max_days") is not None:
+        parts.append(f"Регистрация: не старше {c['reg_max_days']} дн.")
+    if c.get("legal_forms"):
+        parts.append(f"Форма: {', '.join(c['legal_forms'])}")
+    if c.get("require_inn"):
+        parts.append("Только с ИНН")
+    if c.get("price_min") is not None or c.get("price_max") is not None:
+        parts.append(f"Цена: {c.get('price_min') or 0}-{c.get('price_max') or '∞'} ₽")
+    if c.get("brands"):
+        parts.append(f"Бренды: {', '.join(c['brands'])}")
+    if c.get("exclude_brands"):
+        parts.append(f"Кроме брендов: {', '.join(c['exclude_brands'])}")
+    return "\n".join(parts) if parts else "Без ограничений"
+
+
+class FilterSettings:
+    """Критерии фильтра по чатам поверх SELLER_FILTERS из config, с кэшем скомпилированных наборов."""
+
+    def __init__(self, path: str = CHAT_FILTERS_FILE):
+        self.path = path
+        self._overrides = self._load()   # chat_id -> {критерий: значение}
+        self._compiled = {}              # chat_id -> FilterPipeline
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return {int(k): v for k, v in json.load(f).items()}
+        except Exception:
+            return {}
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._overrides, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def criteria(self, chat_id: int) -> dict:
+        return {**SELLER_FILTERS, **self._overrides.get(chat_id, {})}
+
+    def pipeline(self, chat_id: int) -> FilterPipeline:
+        if chat_id not in self._compiled:
+            self._compiled[chat_id] = FilterPipeline(self.criteria(chat_id))
+        return self._compiled[chat_id]
+
+    def update(self, chat_id: int, updates: dict):
+        self._overrides.setdefault(chat_id, {}).update(updates)
+        self._compiled.pop(chat_id, None)
+        self._save()
+
+    def reset(self, chat_id: int):
+        self._overrides.pop(chat_id, None)
+        self._compiled.pop(chat_id, None)
+        self._save()
+
+
 def is_valid_seller(seller_info: dict) -> tuple[bool, str]:
     """
     Проверяет продавца на соответствие критериям.
@@ -8,12 +279,12 @@ def is_valid_seller(seller_info: dict) -> tuple[bool, str]:
     if not seller_info:
         return False, "Не удалось получить данные продавца"
 
-    seller_name = seller_info.get('name', '').strip()
+    name = seller_info.get('name', '').strip()
     reg_date_str = seller_info.get('registrationDate')
 
     # Проверка 1: ИП
-    if not seller_name.upper().startswith("ИП"):
-        return False, f"Пропуск: Не ИП ({seller_name})"
+    if not name.upper().startswith("ИП"):
+        return False, f"Пропуск: Не ИП ({name})"
 
     # Проверка 2: Дата регистрации < 1 года
     if not reg_date_str:
@@ -23,10 +294,10 @@ def is_valid_seller(seller_info: dict) -> tuple[bool, str]:
         # Пример даты: 2023-11-20T10:15:20Z
         reg_date = datetime.strptime(reg_date_str[:10], "%Y-%m-%d")
         one_year_ago = datetime.now() - timedelta(days=365)
-        
+
         if reg_date < one_year_ago:
             return False, f"Пропуск: Старый аккаунт (рег: {reg_date.date()})"
-        
-        return True, f"✅ Подходит! {seller_name} (рег: {reg_date.date()})"
+
+        return True, f"✅ Подходит! {name} (рег: {reg_date.date()})"
     except Exception as e:
         return False, f"Ошибка проверки даты: {e}"
@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import time
+
+from config import JOB_STORE_FILE, JOB_RESUME_MAX_AGE
+from services.products import ProductRecord
+
+# Этапы поиска: сбор товаров повторяется целиком (по сохраненным диапазонам страниц),
+# проверка продавцов продолжается с первого непроверенного
+STAGE_COLLECTING = "collecting"
+STAGE_VERIFYING = "verifying"
+
+
+class SearchJob:
+    """Состояние одного поиска, восстановленное из базы."""
+
+    def __init__(self, job_id: int, chat_id: int, queries: list, stage: str, ranges: dict,
+                 scanned: int, page_info: list, created_at: float):
+        self.job_id = job_id
+        self.chat_id = chat_id
+        self.queries = queries
+        self.stage = stage
+        self.ranges = ranges            # запрос -> [start, end] выделенных страниц
+        self.scanned = scanned          # Уникальных товаров после сбора
+        self.page_info = page_info      # Строки "• запрос: стр. N-M" для сообщений
+        self.created_at = created_at
+
+
+class JobStore:
+    """
+    Контрольные точки поисков в SQLite: после сбора сохраняются продавцы с товарами,
+    после проверки каждого продавца - отметка и найденный результат. После перезапуска
+    бота поиск продолжается с первого непроверенного продавца и все равно выдает отчет.
+    """
+
+    def __init__(self, path: str = JOB_STORE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER NOT NULL,
+                queries TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                ranges TEXT NOT NULL DEFAULT '{}',
+                scanned INTEGER NOT NULL DEFAULT 0,
+                page_info TEXT NOT NULL DEFAULT '[]',
+                created_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS job_sellers (
+                job_id INTEGER NOT NULL,
+                pos INTEGER NOT NULL,
+                supplier_id INTEGER NOT NULL,
+                products TEXT NOT NULL,
+                checked INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                PRIMARY KEY (job_id, pos)
+            )"""
+        )
+        self.conn.commit()
+
+    def create(self, chat_id: int, queries: list) -> SearchJob:
+        now = time.time()
+        cur = self.conn.execute(
+            "INSERT INTO jobs (chat_id, queries, stage, created_at) VALUES (?, ?, ?, ?)",
+            (chat_id, json.dumps(queries, ensure_ascii=False), STAGE_COLLECTING, now)
+        )
+        self.conn.commit()
+        return SearchJob(cur.lastrowid, chat_id, queries, STAGE_COLLECTING, {}, 0, [], now)
+
+    def set_range(self, job: SearchJob, query: str, start: int, end: int):
+        """Запоминает выделенные страницы, чтобы после перезапуска собрать те же, а не следующие."""
+        job.ranges[query] = [start, end]
+        self.conn.execute("UPDATE jobs SET ranges = ? WHERE job_id = ?",
+                          (json.dumps(job.ranges, ensure_ascii=False), job.job_id))
+        self.conn.commit()
+
+    def save_sellers(self, job: SearchJob, sellers_products: dict, scanned: int, page_info: list):
+        """Контрольная точка после сбора: продавцы с товарами в порядке проверки, переход к проверке."""
+        with self.conn:
+            self.conn.execute("DELETE FROM job_sellers WHERE job_id = ?", (job.job_id,))
+            self.conn.executemany(
+                "INSERT INTO job_sellers (job_id, pos, supplier_id, products) VALUES (?, ?, ?, ?)",
+                [(job.job_id, pos, sid, json.dumps([p.to_row() for p in products], ensure_ascii=False))
+                 for pos, (sid, products) in enumerate(sellers_products.items())]
+            )
+            self.conn.execute(
+                "UPDATE jobs SET stage = ?, scanned = ?, page_info = ? WHERE job_id = ?",
+                (STAGE_VERIFYING, scanned, json.dumps(page_info, ensure_ascii=False), job.job_id)
+            )
+        job.stage, job.scanned, job.page_info = STAGE_VERIFYING, scanned, page_info
+
+    def mark_checked(self, job: SearchJob, supplier_id: int, result: dict = None):
+        """Контрольная точка после проверки продавца; result - найденная карточка или None."""
+        self.conn.execute(
+            "UPDATE job_sellers SET checked = 1, result = ? WHERE job_id = ? AND supplier_id = ?",
+            (json.dumps(result, ensure_ascii=False) if result is not None else None, job.job_id, supplier_id)
+        )
+        self.conn.commit()
+
+    def pending_sellers(self, job: SearchJob) -> dict:
+        """Непроверенные продавцы: supplier_id -> [ProductRecord, ...] в исходном порядке."""
+        rows = self.conn.execute(
+            "SELECT supplier_id, products FROM job_sellers WHERE job_id = ? AND checked = 0 ORDER BY pos",
+            (job.job_id,)
+        )
+        return {sid: [ProductRecord.from_row(r) for r in json.loads(products)] for sid, products in rows}
+
+    def results(self, job: SearchJob) -> list:
+        """Уже найденные до перезапуска карточки в исходном порядке."""
+        rows = self.conn.execute(
+            "SELECT result FROM job_sellers WHERE job_id = ? AND result IS NOT NULL ORDER BY pos",
+            (job.job_id,)
+        )
+        return [json.loads(r) for (r,) in rows]
+
+    def seller_count(self, job: SearchJob) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM job_sellers WHERE job_id = ?", (job.job_id,)).fetchone()[0]
+
+    def unfinished(self) -> list:
+        """Незавершенные поиски для продолжения; слишком старые удаляются."""
+        stale = time.time() - JOB_RESUME_MAX_AGE
+        for (job_id,) in self.conn.execute("SELECT job_id FROM jobs WHERE created_at < ?", (stale,)).fetchall():
+            self.delete(job_id)
+        rows = self.conn.execute(
+            "SELECT job_id, chat_id, queries, stage, ranges, scanned, page_info, created_at FROM jobs ORDER BY job_id"
+        ).fetchall()
+        return [SearchJob(job_id, chat_id, json.loads(queries), stage, json.loads(ranges), scanned,
+                          json.loads(page_info), created_at)
+                for job_id, chat_id, queries, stage, ranges, scanned, page_info, created_at in rows]
+
+    def delete(self, job_id: int):
+        with self.conn:
+            self.conn.execute("DELETE FROM job_sellers WHERE job_id = ?", (job_id,))
+            self.conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,28 @@
+import json
+
+# orjson - необязательная зависимость: если установлен, разбор JSON в несколько раз быстрее
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(body: bytes):
+    """Разбирает JSON прямо из байтов ответа (ошибки - ValueError в обоих бэкендах)."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def preview(body: bytes, limit: int) -> str:
+    """Начало тела ответа для логов, не длиннее limit байт."""
+    return body[:limit].decode("utf-8", errors="replace")
+
+
+def dumps(obj) -> bytes:
+    """Сериализует в JSON-байты (UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,174 @@
+import contextvars
+import os
+from collections import Counter
+
+from config import METRICS_FILE
+
+# Границы корзин гистограммы задержек (сек)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как в Prometheus)."""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # Последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, cnt in enumerate(self.counts):
+            seen += cnt
+            if seen >= rank:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float("inf")
+        return float("inf")
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Series:
+    """Набор метрик по одному измерению (эндпоинт или прокси)."""
+
+    def __init__(self):
+        self.latency = {}           # key -> Histogram
+        self.statuses = {}          # key -> Counter(status)
+        self.bytes = Counter()      # key -> байт в ответах
+
+    def observe(self, key: str, status, latency: float, size: int):
+        self.latency.setdefault(key, Histogram()).observe(latency)
+        self.statuses.setdefault(key, Counter())[str(status)] += 1
+        self.bytes[key] += size
+
+
+class RequestCounter:
+    """Запросы к WB одной фоновой задачи и всех порожденных ею задач (см. counting_requests)."""
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+# Задачи asyncio наследуют контекст создавшей их задачи, поэтому счетчик видит только "свои" запросы,
+# а не одновременные интерактивные поиски того же WBApi
+_current_counter = contextvars.ContextVar("request_counter", default=None)
+
+
+def counting_requests() -> RequestCounter:
+    """Заводит счетчик запросов для текущей задачи (и задач, которые она создаст дальше)."""
+    counter = RequestCounter()
+    _current_counter.set(counter)
+    return counter
+
+
+class Metrics:
+    """
+    Метрики запросов к WB: гистограммы задержек, коды ответов, ретраи и объем данных
+    по эндпоинтам и по прокси. Читаются командой /stats и выгружаются в текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self.endpoints = _Series()
+        self.proxies = _Series()
+        self.retries = Counter()        # endpoint -> повторных попыток
+        self.parse_time = Counter()     # endpoint -> суммарное время разбора JSON (сек)
+        self.parsed = Counter()         # endpoint -> разобранных ответов
+
+    def observe_response(self, endpoint: str, proxy: str, status, latency: float, size: int = 0):
+        """Ответ (или ошибка соединения со status='error')."""
+        self.endpoints.observe(endpoint, status, latency, size)
+        self.proxies.observe(proxy or "direct", status, latency, size)
+        counter = _current_counter.get()
+        if counter is not None:
+            counter.count += 1
+
+    def observe_retry(self, endpoint: str):
+        self.retries[endpoint] += 1
+
+    def observe_decode(self, endpoint: str, parse_time: float):
+        self.parse_time[endpoint] += parse_time
+        self.parsed[endpoint] += 1
+
+    @property
+    def total_requests(self) -> int:
+        return sum(h.count for h in self.endpoints.latency.values())
+
+    def summary(self, top: int = 8) -> str:
+        """Короткая текстовая сводка для Telegram."""
+        if not self.endpoints.latency:
+            return "Запросов к WB еще не было"
+        lines = ["📊 Эндпоинты:"]
+        by_count = sorted(self.endpoints.latency.items(), key=lambda kv: -kv[1].count)
+        for endpoint, hist in by_count[:top]:
+            statuses = self.endpoints.statuses[endpoint]
+            codes = ", ".join(f"{code}: {cnt}" for code, cnt in statuses.most_common(4))
+            parse_ms = self.parse_time[endpoint] / self.parsed[endpoint] * 1000 if self.parsed[endpoint] else 0
+            lines.append(
+                f"• {endpoint}\n"
+                f"  {hist.count} запр., p50 ≤{hist.quantile(0.5)}с, p99 ≤{hist.quantile(0.99)}с, "
+                f"ретраев {self.retries[endpoint]}, {self.endpoints.bytes[endpoint] / 1024:.0f} КБ, "
+                f"разбор {parse_ms:.2f} мс\n"
+                f"  коды: {codes}"
+            )
+        lines.append("🌐 Прокси:")
+        by_count = sorted(self.proxies.latency.items(), key=lambda kv: -kv[1].count)
+        for proxy, hist in by_count[:top]:
+            statuses = self.proxies.statuses[proxy]
+            ok = statuses.get("200", 0)
+            lines.append(f"• {proxy}: {hist.count} запр., успех {ok / hist.count:.0%}, p50 ≤{hist.quantile(0.5)}с")
+        return "\n".join(lines)
+
+    def _histogram_lines(self, name: str, label: str, series: _Series) -> list:
+        lines = [f"# TYPE {name} histogram"]
+        for key, hist in series.latency.items():
+            lbl = f'{label}="{_label(key)}"'
+            cumulative = 0
+            for bound, cnt in zip(LATENCY_BUCKETS + ("+Inf",), hist.counts):
+                cumulative += cnt
+                lines.append(f'{name}_bucket{{{lbl},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{lbl}}} {hist.sum:.6f}")
+            lines.append(f"{name}_count{{{lbl}}} {hist.count}")
+        return lines
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for prefix, label, series in (("wb", "endpoint", self.endpoints), ("wb_proxy", "proxy", self.proxies)):
+            lines += self._histogram_lines(f"{prefix}_request_duration_seconds", label, series)
+            lines.append(f"# TYPE {prefix}_responses_total counter")
+            for key, statuses in series.statuses.items():
+                for status, cnt in statuses.items():
+                    lines.append(f'{prefix}_responses_total{{{label}="{_label(key)}",status="{status}"}} {cnt}')
+            lines.append(f"# TYPE {prefix}_response_bytes_total counter")
+            for key, size in series.bytes.items():
+                lines.append(f'{prefix}_response_bytes_total{{{label}="{_label(key)}"}} {size}')
+        lines.append("# TYPE wb_retries_total counter")
+        for endpoint, cnt in self.retries.items():
+            lines.append(f'wb_retries_total{{endpoint="{_label(endpoint)}"}} {cnt}')
+        lines.append("# TYPE wb_json_parse_seconds_total counter")
+        for endpoint, seconds in self.parse_time.items():
+            lines.append(f'wb_json_parse_seconds_total{{endpoint="{_label(endpoint)}"}} {seconds:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str = METRICS_FILE):
+        """Атомарно записывает метрики в файл (для node_exporter textfile collector и т.п.)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
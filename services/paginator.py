@@ -0,0 +1,146 @@
+import asyncio
+import random
+
+from config import PAGE_FETCH_CONCURRENCY, SEARCH_PAGES_PER_RUN
+
+SEARCH_SORTS = ['popular', 'newly', 'priceup', 'pricedown', 'rate']
+
+
+async def fetch_pages(fetch_page, start_page: int, end_page: int, window: int = PAGE_FETCH_CONCURRENCY,
+                      min_page_size: int = 10, on_page=None) -> tuple:
+    """
+    Загружает страницы [start_page, end_page) скользящим окном по window штук параллельно.
+    fetch_page(page) возвращает список товаров или None при сетевой ошибке.
+    Пустая или неполная страница означает конец выдачи - ожидающие страницы после нее отменяются.
+    Если задан on_page(products), страницы по порядку отдаются ему и не накапливаются (products будет пуст).
+
+    Возвращает (products, last_page, next_page, exhausted):
+    last_page - последняя учтенная страница, next_page - с какой начинать в следующий раз
+    (1, если выдача закончилась; страница с ошибкой, если запрос не удался).
+    """
+    tasks = {}
+    next_to_launch = start_page
+    products = []
+    last_page = start_page - 1
+    next_page = end_page
+    exhausted = False
+
+    def launch_upto(limit_page):
+        nonlocal next_to_launch
+        while next_to_launch < min(limit_page, end_page):
+            tasks[next_to_launch] = asyncio.create_task(fetch_page(next_to_launch))
+            next_to_launch += 1
+
+    try:
+        launch_upto(start_page + window)
+        for page in range(start_page, end_page):
+            res = await tasks.pop(page)
+            if res is None:
+                # Сетевая ошибка: дальше не идем, в следующий раз начнем с этой страницы
+                next_page = page
+                break
+
+            last_page = page
+            if on_page:
+                on_page(res)
+            else:
+                products.extend(res)
+            # Пустая или явно неполная страница - товары кончились раньше времени
+            if len(res) < min_page_size:
+                exhausted = True
+                next_page = 1
+                break
+
+            launch_upto(page + 1 + window)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    return products, last_page, next_page, exhausted
+
+
+async def fetch_new_pages(fetch_page, is_new, max_pages: int, min_page_size: int = 10, on_page=None) -> tuple:
+    """
+    Дельта-обход выдачи (sort=newly) с первой страницы: по одной странице, пока все товары на ней
+    новые (is_new(nm_id) истинно). Первый же известный товар означает, что дошли до уже
+    просмотренной части выдачи, - дальше не идем. on_page(products) получает только новые товары.
+
+    Возвращает (pages, new_count, caught_up): сколько страниц загружено, сколько новых товаров найдено
+    и дошли ли до известного товара или конца выдачи (False - за max_pages страниц или до ошибки сети
+    граница не найдена, новинок может быть больше).
+    """
+    pages = 0
+    new_count = 0
+    for page in range(1, max_pages + 1):
+        res = await fetch_page(page)
+        if res is None:
+            break
+        pages += 1
+        new = [p for p in res if is_new(p.get("id"))]
+        if new:
+            new_count += len(new)
+            if on_page:
+                on_page(new)
+        if len(new) < len(res) or len(res) < min_page_size:
+            return pages, new_count, True
+    return pages, new_count, False
+
+
+async def scan_query(api, progress, query: str, on_page, page_range: tuple = None, on_claim=None,
+                     pages: int = SEARCH_PAGES_PER_RUN, sort: str = None) -> tuple:
+    """
+    Один проход по запросу. Если по запросу уже есть отметки новинок, сначала читаются только новинки
+    (fetch_new_pages); курсор из SearchProgress (следующие SEARCH_PAGES_PER_RUN страниц со случайной
+    сортировкой) нужен, только если отметок нет или дельта не дошла до известных товаров.
+    page_range - заранее выделенные страницы (продолжение после перезапуска),
+    on_claim(start, end) вызывается, когда страницы выделены; sort - постоянная сортировка вместо случайной.
+
+    Возвращает None (выдача пройдена, отметок нет), ("delta", страниц, новых товаров)
+    или ("pages", первая страница, последняя учтенная).
+    """
+    if page_range:
+        start_page, end_page = page_range
+    else:
+        delta = None
+        watermark = progress.watermark(query)
+        if watermark:
+            # Запрос уже видели - читаем новинки до первого известного товара
+            async def fetch_newly(p_idx):
+                return await api.search_products(query, limit=100, page=p_idx, sort='newly')
+
+            fetched, new_count, caught_up = await fetch_new_pages(fetch_newly, watermark.is_new, pages, on_page=on_page)
+            delta = "delta", fetched, new_count
+            if caught_up:
+                await progress.mark_scanned(query)
+                return delta
+        # Диапазон страниц выделяется атомарно: параллельный поиск по тому же запросу возьмет следующий
+        claimed = await progress.claim(query, pages)
+        if claimed is None:
+            # Выдача пройдена до конца и недавно - остаются только новинки
+            if delta:
+                await progress.mark_scanned(query)
+            return delta
+        start_page, end_page = claimed
+        if on_claim:
+            on_claim(start_page, end_page)
+    sort = sort or random.choice(SEARCH_SORTS)
+
+    async def fetch_page(p_idx):
+        return await api.search_products(query, limit=100, page=p_idx, sort=sort)
+
+    # Сканируем диапазон 10 страниц (например 1-11, 11-21 и т.д.) окном параллельных запросов
+    _, last_page, next_page, exhausted = await fetch_pages(fetch_page, start_page, end_page, on_page=on_page)
+    # Запоминаем, откуда начать в следующий раз, и где кончилась выдача
+    await progress.complete(query, end_page, next_page, last_page, exhausted)
+    return "pages", start_page, last_page
+
+
+def describe_scan(query: str, scan: tuple) -> str:
+    """Строка про проход scan_query для сообщений о ходе поиска."""
+    if scan is None:
+        return f"• {query}: выдача закончилась, пропуск"
+    if scan[0] == "delta":
+        _, pages, new_count = scan
+        return f"• {query}: новинки, стр. 1-{max(1, pages)} (новых товаров: {new_count})"
+    _, start_page, last_page = scan
+    return f"• {query}: стр. {start_page}-{max(start_page, last_page)}"
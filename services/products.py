@@ -0,0 +1,73 @@
+from services.filters import STAGE_PRODUCT
+
+
+class ProductRecord:
+    """Компактная запись товара из выдачи: только поля, которые нужны дальше по конвейеру."""
+    __slots__ = ("id", "supplier_id", "name", "brand", "price", "supplier")
+
+    def __init__(self, id: int, supplier_id: int, name: str, brand: str, price: float, supplier: str):
+        self.id = id
+        self.supplier_id = supplier_id
+        self.name = name
+        self.brand = brand
+        self.price = price          # Рубли
+        self.supplier = supplier    # Имя продавца из выдачи
+
+    @classmethod
+    def from_raw(cls, p: dict) -> "ProductRecord":
+        """Проекция сырого товара WB (с sizes, colors и прочим) в запись."""
+        price_raw = p.get("salePriceU") or p.get("priceU") or (p.get("sizes") or [{}])[0].get("price", {}).get("total")
+        return cls(p.get("id"), p.get("supplierId"), p.get("name"), p.get("brand"),
+                   price_raw / 100 if price_raw else 0, p.get("supplier"))
+
+    def to_row(self) -> list:
+        """Поля записи списком - для сохранения в контрольной точке поиска."""
+        return [getattr(self, f) for f in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row: list) -> "ProductRecord":
+        return cls(*row)
+
+    def __repr__(self):
+        return f"ProductRecord(id={self.id}, supplier_id={self.supplier_id}, price={self.price})"
+
+
+class ProductCollector:
+    """
+    Прием страниц выдачи по мере загрузки: каждый товар сразу проецируется в ProductRecord,
+    дубли и товары из черного списка отбрасываются, остальные группируются по продавцам.
+    Сырые страницы дальше не хранятся.
+    """
+
+    def __init__(self, skip_supplier=None, pipeline=None, ctx=None):
+        self.skip_supplier = skip_supplier  # supplier_id -> True, если продавца пропускаем
+        self.pipeline = pipeline            # Правила по товарам (цена, бренд) - применяются к каждой странице
+        self.ctx = ctx
+        self.sellers = {}                   # supplier_id -> [ProductRecord, ...]
+        self.unique = 0                     # Уникальных товаров после черного списка (до фильтров)
+        self.raw = 0                        # Всего товаров в загруженных страницах
+        self._seen_ids = set()
+
+    def add_page(self, products: list) -> int:
+        """Добавляет страницу сырых товаров, возвращает сколько записей попало в группы."""
+        self.raw += len(products)
+        batch = []
+        for p in products:
+            pid = p.get("id")
+            if pid in self._seen_ids:
+                continue
+            sid = p.get("supplierId")
+            if self.skip_supplier and self.skip_supplier(sid):
+                continue
+            self._seen_ids.add(pid)
+            batch.append(ProductRecord.from_raw(p))
+        self.unique += len(batch)
+
+        if self.pipeline:
+            batch, _ = self.pipeline.filter(batch, STAGE_PRODUCT, self.ctx)
+        added = 0
+        for rec in batch:
+            if rec.supplier_id:
+                self.sellers.setdefault(rec.supplier_id, []).append(rec)
+                added += 1
+        return added
@@ -0,0 +1,153 @@
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+from config import (
+    PROXY_COOLDOWN_BASE, PROXY_COOLDOWN_MAX, PROXY_FAIL_THRESHOLD,
+    PROXY_EWMA_ALPHA, PROXY_BAN_PENALTY_WINDOW
+)
+
+
+def proxy_label(url: str) -> str:
+    """host:port без логина и пароля - для логов, метрик и вывода в Telegram."""
+    if not url:
+        return "direct"
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port}" if parts.port else str(parts.hostname)
+
+
+class ProxyStats:
+    """Статистика одного прокси: успехи, ошибки, баны, EWMA задержки и кулдаун."""
+    __slots__ = ("url", "successes", "failures", "bans", "fail_streak", "ban_streak",
+                 "latency_ewma", "last_ban", "cooldown_until")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.successes = 0
+        self.failures = 0
+        self.bans = 0
+        self.fail_streak = 0
+        self.ban_streak = 0
+        self.latency_ewma = None
+        self.last_ban = 0.0
+        self.cooldown_until = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        # Сглаживание Лапласа: новый прокси получает 50% и шанс показать себя
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def score(self, now: float) -> float:
+        """Вес для выбора: высокий процент успеха и низкая задержка, штраф за недавний бан."""
+        latency = self.latency_ewma if self.latency_ewma is not None else 1.0
+        weight = self.success_rate ** 2 / max(latency, 0.1)
+        if self.last_ban and now - self.last_ban < PROXY_BAN_PENALTY_WINDOW:
+            weight *= 0.25
+        return weight
+
+    @property
+    def label(self) -> str:
+        return proxy_label(self.url)
+
+
+class ProxyPool:
+    """
+    Пул прокси с оценкой здоровья.
+    Выбирает прокси взвешенно по скору, забаненные (429/498) и часто падающие уходят в кулдаун
+    с экспоненциальным ростом и возвращаются в ротацию по его окончании.
+    """
+
+    def __init__(self, proxies: list = None):
+        self.stats = {}
+        self.reload(proxies or [])
+
+    @staticmethod
+    def load_file(path: str) -> list:
+        """Загружает список прокси из файла."""
+        if not os.path.exists(path):
+            return []
+        proxies = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                p = line.strip()
+                if p:
+                    # Корректная обработка протоколов
+                    if "://" not in p:
+                        p = f"http://{p}"
+                    proxies.append(p)
+        return proxies
+
+    @classmethod
+    def from_file(cls, path: str) -> "ProxyPool":
+        return cls(cls.load_file(path))
+
+    def reload(self, proxies: list):
+        """Обновляет список прокси, сохраняя статистику уже известных."""
+        self.stats = {p: self.stats.get(p) or ProxyStats(p) for p in dict.fromkeys(proxies)}
+
+    def reload_file(self, path: str):
+        self.reload(self.load_file(path))
+
+    def __len__(self):
+        return len(self.stats)
+
+    @property
+    def proxies(self) -> list:
+        return list(self.stats)
+
+    def acquire(self) -> str:
+        """Возвращает прокси по взвешенному скору или None, если пул пуст."""
+        if not self.stats:
+            return None
+        now = time.monotonic()
+        available = [s for s in self.stats.values() if s.cooldown_until <= now]
+        if not available:
+            # Все в кулдауне - берем тот, что освободится раньше всех
+            return min(self.stats.values(), key=lambda s: s.cooldown_until).url
+        weights = [s.score(now) for s in available]
+        return random.choices(available, weights=weights, k=1)[0].url
+
+    def report_success(self, proxy: str, latency: float):
+        s = self.stats.get(proxy)
+        if not s:
+            return
+        s.successes += 1
+        s.fail_streak = 0
+        s.ban_streak = 0
+        if s.latency_ewma is None:
+            s.latency_ewma = latency
+        else:
+            s.latency_ewma = PROXY_EWMA_ALPHA * latency + (1 - PROXY_EWMA_ALPHA) * s.latency_ewma
+
+    def report_failure(self, proxy: str, banned: bool = False):
+        s = self.stats.get(proxy)
+        if not s:
+            return
+        now = time.monotonic()
+        s.failures += 1
+        s.fail_streak += 1
+        if banned:
+            s.bans += 1
+            s.ban_streak += 1
+            s.last_ban = now
+            self._cooldown(s, now, s.ban_streak)
+        elif s.fail_streak >= PROXY_FAIL_THRESHOLD:
+            self._cooldown(s, now, s.fail_streak - PROXY_FAIL_THRESHOLD + 1)
+
+    @staticmethod
+    def _cooldown(s: ProxyStats, now: float, streak: int):
+        s.cooldown_until = now + min(PROXY_COOLDOWN_BASE * 2 ** (streak - 1), PROXY_COOLDOWN_MAX)
+
+    def summary(self, top: int = 3) -> str:
+        """Короткая сводка для экрана настроек (Markdown)."""
+        if not self.stats:
+            return "Прокси не загружены"
+        now = time.monotonic()
+        cooling = sum(1 for s in self.stats.values() if s.cooldown_until > now)
+        lines = [f"Прокси: всего {len(self.stats)}, активных {len(self.stats) - cooling}, в кулдауне {cooling}"]
+        used = [s for s in self.stats.values() if s.successes or s.failures]
+        for s in sorted(used, key=lambda s: s.score(now), reverse=True)[:top]:
+            latency = f"{s.latency_ewma:.2f}с" if s.latency_ewma is not None else "-"
+            lines.append(f"`{s.label}` успех {s.success_rate:.0%}, {latency}, банов {s.bans}")
+        return "\n".join(lines)
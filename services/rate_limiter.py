@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import time
+
+from config import (
+    RATE_LIMITS_FILE, RATE_ENDPOINT_INITIAL, RATE_PROXY_INITIAL, RATE_ENDPOINT_MAX,
+    RATE_PROXY_MAX, RATE_MIN, AIMD_INCREASE, AIMD_DECREASE, AIMD_DECREASE_WINDOW, RATE_SAVE_INTERVAL
+)
+from services.proxy_pool import proxy_label
+
+
+class TokenBucket:
+    """Токен-бакет: не более rate запросов в секунду с запасом burst. rate <= 0 - без ограничений."""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # Лок выстраивает ожидающих в очередь, чтобы токены раздавались по порядку
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def set_rate(self, rate: float):
+        """Меняет скорость на лету (накопленные токены пересчитываются по старой скорости)."""
+        self._refill()
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class AIMDLimiter:
+    """
+    Адаптивный лимит запросов (AIMD): отдельный токен-бакет на каждый эндпоинт и каждый прокси.
+    Пока WB отвечает 200, скорость растет аддитивно, на 429/498 - падает мультипликативно, но не чаще
+    раза в AIMD_DECREASE_WINDOW секунд на бакет: пачка одновременных отказов - один сигнал, а не n снижений.
+    429 - лимит эндпоинта, режет только его бакет; 498 (антибот) - еще и бакет прокси.
+    Выученные скорости сохраняются в файл и подхватываются после перезапуска. Бакеты прокси
+    называются proxy_label (host:port) - логин и пароль прокси не попадают ни в файл, ни в вывод.
+    """
+
+    def __init__(self, path: str = RATE_LIMITS_FILE):
+        self.path = path
+        self.endpoints = {}   # endpoint -> TokenBucket
+        self.proxies = {}     # proxy_label(proxy) (или "direct") -> TokenBucket
+        self._decreased = {}  # (kind, key) -> время последнего снижения скорости
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._saved_rates = self._load()
+        if self._dirty:
+            self.save()  # Сразу переписываем старый файл без паролей прокси
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {"endpoints": {}, "proxies": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {"endpoints": {}, "proxies": {}}
+        # Старые файлы хранили полный URL прокси с паролем - переводим в host:port (из дублей - меньшая скорость)
+        proxies = {}
+        for key, rate in data.get("proxies", {}).items():
+            label = proxy_label(key) if "://" in key else key
+            proxies[label] = min(rate, proxies.get(label, rate))
+        self._dirty = any("://" in key for key in data.get("proxies", {}))
+        return {"endpoints": data.get("endpoints", {}), "proxies": proxies}
+
+    def _bucket(self, kind: str, key: str) -> TokenBucket:
+        table = self.endpoints if kind == "endpoints" else self.proxies
+        bucket = table.get(key)
+        if bucket is None:
+            initial = RATE_ENDPOINT_INITIAL if kind == "endpoints" else RATE_PROXY_INITIAL
+            bucket = TokenBucket(self._saved_rates[kind].get(key, initial))
+            table[key] = bucket
+        return bucket
+
+    async def acquire(self, endpoint: str, proxy: str = None):
+        """Ждет токен эндпоинта, затем токен прокси."""
+        await self._bucket("endpoints", endpoint).acquire()
+        await self._bucket("proxies", proxy_label(proxy)).acquire()
+
+    def on_response(self, endpoint: str, proxy: str, status: int):
+        """Подстраивает скорости по статусу ответа."""
+        now = time.monotonic()
+        for kind, key, max_rate in (("endpoints", endpoint, RATE_ENDPOINT_MAX),
+                                    ("proxies", proxy_label(proxy), RATE_PROXY_MAX)):
+            bucket = self._bucket(kind, key)
+            banned = status == 498 or (status == 429 and kind == "endpoints")
+            if status == 200:
+                new_rate = min(max_rate, bucket.rate + AIMD_INCREASE)
+            elif banned:
+                if now - self._decreased.get((kind, key), float("-inf")) < AIMD_DECREASE_WINDOW:
+                    continue  # Этот бакет уже притормозили за текущее окно
+                self._decreased[(kind, key)] = now
+                new_rate = max(RATE_MIN, bucket.rate * AIMD_DECREASE)
+                bucket.tokens = 0  # Сразу притормаживаем, а не после выработки запаса
+            else:
+                continue
+            if new_rate != bucket.rate:
+                bucket.set_rate(new_rate)
+                self._dirty = True
+        if self._dirty and time.monotonic() - self._last_save > RATE_SAVE_INTERVAL:
+            self.save()
+
+    def rates(self) -> dict:
+        return {
+            "endpoints": {k: round(b.rate, 3) for k, b in self.endpoints.items()},
+            "proxies": {k: round(b.rate, 3) for k, b in self.proxies.items()},
+        }
+
+    def save(self):
+        """Сохраняет выученные скорости (вместе с ранее сохраненными, но пока не использованными)."""
+        data = {kind: {**self._saved_rates[kind], **rates} for kind, rates in self.rates().items()}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._last_save = time.monotonic()
@@ -0,0 +1,357 @@
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from html import escape
+
+from config import REPORT_DIR, REPORT_PAGE_SIZE, REPORT_COMPRESS, REPORT_KEEP_SECONDS, SELLER_FILTERS
+from services.filters import describe_criteria
+
+REPORT_CSS = """
+    :root { --main-purp: #7212b3; --accent: #2ecc71; --bg: #f8f9fa; --card-bg: #fff; }
+    body { font-family: 'Segoe UI', Roboto, sans-serif; background: var(--bg); margin: 0; padding: 40px 20px; color: #333; }
+    .container { max-width: 1400px; margin: 0 auto; }
+    h1 { text-align: center; color: var(--main-purp); margin-bottom: 10px; font-weight: 800; }
+    .subtitle { text-align: center; color: #666; margin-bottom: 40px; font-size: 1.1em; }
+
+    .grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); gap: 25px; }
+    .card { background: var(--card-bg); border-radius: 20px; overflow: hidden; box-shadow: 0 4px 20px rgba(0,0,0,0.05); transition: 0.3s; display: flex; flex-direction: column; border: 1px solid #eee; }
+    .card:hover { transform: translateY(-8px); box-shadow: 0 15px 35px rgba(114, 18, 179, 0.12); }
+
+    .img-container { position: relative; width: 100%; height: 380px; background: #f0f0f0; }
+    .card img { width: 100%; height: 100%; object-fit: cover; }
+
+    .badge { position: absolute; top: 15px; left: 15px; padding: 6px 12px; border-radius: 8px; font-size: 0.8em; font-weight: 700; color: #fff; z-index: 10; box-shadow: 0 4px 10px rgba(0,0,0,0.2); }
+    .age-new { background: #2ecc71; }
+    .age-young { background: #3498db; }
+
+    .content { padding: 20px; display: flex; flex-direction: column; flex-grow: 1; }
+    .price { font-size: 1.7em; color: var(--main-purp); font-weight: 800; margin-bottom: 5px; }
+    .name { font-weight: 600; font-size: 1em; margin-bottom: 10px; height: 2.8em; overflow: hidden; display: -webkit-box; -webkit-line-clamp: 2; -webkit-box-orient: vertical; line-height: 1.4; }
+    .brand { font-size: 0.9em; color: #888; margin-bottom: 15px; }
+    .brand span { color: #333; font-weight: 600; }
+
+    .legal-info { background: #fbf8ff; padding: 15px; border-radius: 12px; margin-bottom: 20px; border: 1px dashed #dcb8ff; }
+    .seller-name { font-weight: 700; font-size: 0.9em; margin-bottom: 5px; color: #444; }
+    .meta { display: flex; justify-content: space-between; font-size: 0.75em; color: #777; }
+
+    .links { margin-top: auto; display: flex; flex-direction: column; gap: 8px; }
+    .btn { text-align: center; padding: 12px; border-radius: 12px; text-decoration: none; font-size: 0.9em; font-weight: 700; transition: 0.2s; }
+    .btn { background: #f0f0f5; color: #333; }
+    .btn.seller { background: var(--main-purp); color: #fff; }
+    .btn:hover { opacity: 0.9; transform: scale(1.02); }
+
+    .pager { display: flex; justify-content: center; gap: 15px; margin: 30px 0; font-weight: 700; }
+    .pager a { color: var(--main-purp); text-decoration: none; }
+    .index-list { max-width: 600px; margin: 0 auto; list-style: none; padding: 0; }
+    .index-list li { background: var(--card-bg); border-radius: 12px; margin-bottom: 10px; padding: 15px 20px; border: 1px solid #eee; }
+    .index-list a { color: var(--main-purp); font-weight: 700; text-decoration: none; }
+"""
+
+_PAGE_TAIL = """    </div>
+</body>
+</html>
+"""
+
+
+def format_age(months):
+    """Превращает месяцы в читаемую строку."""
+    if not months: return "Новичок"
+    years = months // 12
+    m = months % 12
+    res = []
+    if years > 0:
+        res.append(f"{years}г.")
+    if m > 0:
+        res.append(f"{m} мес.")
+    return " ".join(res) if res else "Менее месяца"
+
+
+def render_card(p: dict) -> str:
+    """HTML-карточка одного найденного продавца."""
+    nm_id = p['id']
+    vol = nm_id // 100000
+    part = nm_id // 1000
+    basket = (nm_id // 1000000) % 15 + 1
+    basket_str = f"{basket:02d}"
+
+    img_url = f"https://basket-{basket_str}.wbbasket.ru/vol{vol}/part{part}/{nm_id}/images/big/1.webp"
+    seller_url = f"https://www.wildberries.ru/seller/{p['supplierId']}"
+    product_url = f"https://www.wildberries.ru/catalog/{nm_id}/detail.aspx"
+
+    # Получаем данные из словаря
+    legal = p.get('legal_info', {})
+    seller_name = escape(str(p.get('seller_name', 'Имя не определено')))
+    age_val = p.get('age_months')
+    age_type = p.get('age_type', 'unknown')
+
+    # Бейдж возраста и описание
+    if age_val is not None:
+        age_text = format_age(age_val)
+        if age_type == 'exact':
+            age_class = "age-new" if age_val <= 12 else "age-young"
+            badge_html = f'<span class="badge {age_class}">{age_text} на WB</span>'
+            meta_age = f"Стаж: {age_text} (точно)"
+        else:
+            # Для эвристики используем другой стиль
+            badge_html = f'<span class="badge age-young" style="background:#6c757d">~{age_text} на WB</span>'
+            meta_age = f"Стаж: ~{age_text} (оценка по NM/отзывам)"
+    else:
+        badge_html = ""
+        meta_age = "Стаж: <span style='color:red'>Неизвестен</span>"
+
+    inn = escape(str(legal.get('inn', '-')))
+
+    # Рейтинг и остаток - только если карточки были дозагружены
+    stats = []
+    if p.get('rating'):
+        stats.append(f"★ {escape(str(p['rating']))}")
+    if p.get('feedbacks'):
+        stats.append(f"отзывов: {escape(str(p['feedbacks']))}")
+    if p.get('stock') is not None:
+        stats.append(f"в наличии: {escape(str(p['stock']))} шт.")
+    stats_html = f'<div class="brand">{" · ".join(stats)}</div>' if stats else ""
+
+    return f"""
+        <div class="card">
+            <div class="img-container">
+                {badge_html}
+                <img src="{img_url}" onerror="this.src='https://via.placeholder.com/200x300?text=No+Image'" alt="product" loading="lazy">
+            </div>
+            <div class="content">
+                <div class="price">{p['price']:.0f} ₽</div>
+                <div class="name">{escape(str(p['name']))}</div>
+                <div class="brand">Бренд: <span>{escape(str(p['brand']))}</span></div>
+                {stats_html}
+
+                <div class="legal-info">
+                    <div class="seller-name">{seller_name}</div>
+                    <div class="meta">
+                        <span>ИНН: {inn}</span>
+                        <span>{meta_age}</span>
+                    </div>
+                </div>
+
+                <div class="links">
+                    <a href="{product_url}" target="_blank" class="btn">Карточка товара</a>
+                    <a href="{seller_url}" target="_blank" class="btn seller">Профиль продавца</a>
+                </div>
+            </div>
+        </div>
+        """
+
+
+def _page_head(title: str, heading: str, subtitle: str) -> str:
+    return f"""<!DOCTYPE html>
+<html lang="ru">
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <style>{REPORT_CSS}    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>{heading}</h1>
+        <p class="subtitle">{subtitle}</p>
+"""
+
+
+def _slug(text: str) -> str:
+    """Безопасное имя файла из запроса."""
+    return re.sub(r"[^\w-]+", "_", text).strip("_")[:60] or "query"
+
+
+class ReportWriter:
+    """
+    Потоковый HTML-отчет: карточки пишутся на диск по мере поступления результатов,
+    каждые page_size продавцов начинается новая страница, в конце пишется оглавление.
+    Многостраничный отчет упаковывается в zip, чтобы отправить его одним небольшим файлом.
+    """
+
+    def __init__(self, query: str, page_size: int = REPORT_PAGE_SIZE, compress: bool = REPORT_COMPRESS,
+                 out_dir: str = REPORT_DIR, criteria: dict = None):
+        self.query = escape(query)
+        # Подзаголовок страниц - критерии, по которым отобраны продавцы (фильтры чата)
+        self.criteria_text = escape(describe_criteria(criteria if criteria is not None else SELLER_FILTERS).replace("\n", "; "))
+        self.page_size = page_size
+        self.compress = compress
+        self.base = f"results_{_slug(query)}"
+        # Уникальная папка: одинаковые запросы из разных чатов не перетирают друг друга
+        os.makedirs(out_dir, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix=f"{self.base}_{time.strftime('%Y%m%d_%H%M%S')}_", dir=out_dir)
+        self.pages = []         # Пути страниц (последняя может быть еще открыта)
+        self.page_counts = []   # Сколько карточек на каждой странице
+        self.count = 0
+        self._file = None
+
+    @staticmethod
+    def _page_name(number: int) -> str:
+        return f"page_{number:03d}.html"
+
+    def _open_page(self):
+        os.makedirs(self.dir, exist_ok=True)
+        number = len(self.pages) + 1
+        path = os.path.join(self.dir, self._page_name(number))
+        self._file = open(path, "w", encoding="utf-8")
+        self.pages.append(path)
+        self.page_counts.append(0)
+
+        title = f"WB Scraper - Новые продавцы ({self.query})"
+        self._file.write(_page_head(title, f"🔍 Результаты для: {self.query}", f"Фильтр: {self.criteria_text}"))
+        if number > 1:
+            self._file.write(
+                f'        <div class="pager"><a href="{self._page_name(number - 1)}">← Назад</a> '
+                f'<a href="index.html">Оглавление</a></div>\n'
+            )
+        self._file.write('        <div class="grid">\n')
+
+    def _close_page(self, has_next: bool):
+        self._file.write("        </div>\n")
+        if has_next:
+            self._file.write(
+                f'        <div class="pager"><a href="index.html">Оглавление</a> '
+                f'<a href="{self._page_name(len(self.pages) + 1)}">Далее →</a></div>\n'
+            )
+        self._file.write(_PAGE_TAIL)
+        self._file.close()
+        self._file = None
+
+    def add(self, product: dict):
+        """Дописывает карточку в текущую страницу (новая страница - каждые page_size продавцов)."""
+        if self._file is None:
+            self._open_page()
+        elif self.page_counts[-1] >= self.page_size:
+            self._close_page(has_next=True)
+            self._open_page()
+        self._file.write(render_card(product))
+        self.page_counts[-1] += 1
+        self.count += 1
+
+    def _write_index(self) -> str:
+        path = os.path.join(self.dir, "index.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_page_head(f"WB Scraper - Оглавление ({self.query})", f"🔍 Результаты для: {self.query}",
+                               f"Найдено продавцов: {self.count}, страниц: {len(self.pages)}"))
+            f.write('        <ul class="index-list">\n')
+            start = 1
+            for number, cnt in enumerate(self.page_counts, 1):
+                f.write(f'            <li><a href="{self._page_name(number)}">Страница {number}</a> '
+                        f'— продавцы {start}-{start + cnt - 1}</li>\n')
+                start += cnt
+            f.write("        </ul>\n")
+            f.write(_PAGE_TAIL)
+        return path
+
+    def finish(self) -> str:
+        """
+        Закрывает отчет и возвращает путь к файлу для отправки:
+        одна страница - сам html, несколько - zip-архив (или оглавление, если сжатие выключено).
+        """
+        if self._file is not None:
+            self._close_page(has_next=False)
+        if not self.pages:
+            return None
+
+        if len(self.pages) == 1:
+            path = os.path.join(self.dir, f"{self.base}.html")
+            os.replace(self.pages[0], path)
+            self.pages[0] = path
+            return path
+
+        index_path = self._write_index()
+        if not self.compress:
+            return index_path
+
+        zip_path = f"{self.dir}.zip"
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for path in [index_path] + self.pages:
+                zf.write(path, arcname=os.path.basename(path))
+        return zip_path
+
+    def discard(self):
+        """Удаляет недописанный отчет (например, если ничего не нашлось)."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for path in self.pages:
+            if os.path.exists(path):
+                os.remove(path)
+        if os.path.isdir(self.dir) and not os.listdir(self.dir):
+            os.rmdir(self.dir)
+        self.pages.clear()
+        self.page_counts.clear()
+        self.count = 0
+
+
+def remove_report(path: str):
+    """Удаляет отправленный отчет: файл из finish(), папку со страницами и архив."""
+    if not path:
+        return
+    report_dir = path[:-len(".zip")] if path.endswith(".zip") else os.path.dirname(path)
+    if os.path.exists(path):
+        os.remove(path)
+    shutil.rmtree(report_dir, ignore_errors=True)
+
+
+def rotate_reports(out_dir: str = REPORT_DIR, keep_seconds: float = REPORT_KEEP_SECONDS) -> int:
+    """Удаляет из out_dir папки и архивы отчетов старше keep_seconds. Возвращает, сколько удалено."""
+    if not os.path.isdir(out_dir):
+        return 0
+    removed = 0
+    deadline = time.time() - keep_seconds
+    for entry in os.scandir(out_dir):
+        if not entry.name.startswith("results_") or entry.stat().st_mtime >= deadline:
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+        elif os.path.exists(entry.path):
+            os.remove(entry.path)
+        removed += 1
+    return removed
+
+
+# Колонки CSV-выгрузки: поля карточки и ИНН из юр. информации
+CSV_COLUMNS = ("id", "name", "brand", "price", "rating", "feedbacks", "stock",
+               "supplierId", "seller_name", "age_months", "age_type", "inn")
+
+
+class JsonlWriter:
+    """Выгрузка результатов в JSONL (строка на продавца)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+    def add(self, product: dict):
+        self._file.write(json.dumps(product, ensure_ascii=False) + "\n")
+        self._file.flush() # Найденное не пропадет, если длинный прогон упадет
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+class CsvWriter:
+    """Выгрузка результатов в CSV (колонки CSV_COLUMNS)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        # utf-8-sig - чтобы Excel открывал кириллицу без танцев
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CSV_COLUMNS)
+
+    def add(self, product: dict):
+        row = {**product, "inn": (product.get("legal_info") or {}).get("inn")}
+        self._writer.writerow(["" if row.get(c) is None else row[c] for c in CSV_COLUMNS])
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,97 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from config import MAX_CONCURRENT_SEARCHES, QUEUE_POSITION_REFRESH
+
+
+class JobScheduler:
+    """
+    Общая очередь поисковых задач всех чатов.
+    Одновременно выполняется не более max_jobs задач, свободный слот отдается чатам по кругу,
+    поэтому один оператор с пачкой запросов не блокирует остальных.
+    """
+
+    def __init__(self, max_jobs: int = MAX_CONCURRENT_SEARCHES):
+        self.max_jobs = max_jobs
+        self.running = 0
+        self._queues = {}       # chat_id -> deque ожидающих future
+        self._order = deque()   # Очередность чатов для round-robin
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _dispatch(self):
+        while self.running < self.max_jobs and self._order:
+            chat_id = self._order.popleft()
+            queue = self._queues[chat_id]
+            fut = queue.popleft()
+            if queue:
+                self._order.append(chat_id)  # Чат уходит в конец круга
+            else:
+                del self._queues[chat_id]
+            if fut.done():
+                continue  # Ожидающий уже отменен
+            fut.set_result(True)
+            self.running += 1
+
+    def position(self, fut) -> int:
+        """Позиция задачи в очереди с учетом round-robin (1 - следующая)."""
+        queues = {chat_id: list(q) for chat_id, q in self._queues.items()}
+        order = list(self._order)
+        pos = 0
+        while order:
+            chat_id = order.pop(0)
+            item = queues[chat_id].pop(0)
+            pos += 1
+            if item is fut:
+                return pos
+            if queues[chat_id]:
+                order.append(chat_id)
+        return 0
+
+    def _remove(self, chat_id, fut):
+        queue = self._queues.get(chat_id)
+        if queue and fut in queue:
+            queue.remove(fut)
+            if not queue:
+                del self._queues[chat_id]
+                self._order.remove(chat_id)
+
+    @asynccontextmanager
+    async def slot(self, chat_id: int, on_position=None):
+        """
+        Ждет свободный слот для задачи чата. on_position(pos) вызывается при изменении
+        позиции в очереди (не вызывается, если слот свободен сразу).
+        """
+        fut = asyncio.get_running_loop().create_future()
+        if chat_id not in self._queues:
+            self._queues[chat_id] = deque()
+            self._order.append(chat_id)
+        self._queues[chat_id].append(fut)
+        self._dispatch()
+
+        try:
+            last_pos = None
+            while not fut.done():
+                pos = self.position(fut)
+                if on_position and pos != last_pos:
+                    last_pos = pos
+                    await on_position(pos)
+                await asyncio.wait({fut}, timeout=QUEUE_POSITION_REFRESH)
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                # Слот уже выдан, но задача отменена - возвращаем его
+                self.running -= 1
+                self._dispatch()
+            else:
+                fut.cancel()
+                self._remove(chat_id, fut)
+            raise
+
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._dispatch()
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import time
+from array import array
+from contextlib import contextmanager
+
+from config import (
+    SEARCH_PROGRESS_FILE, LEGACY_SEARCH_HISTORY_FILE, SEARCH_PAGES_PER_RUN, SEARCH_MAX_PAGE,
+    EXHAUSTED_RESCAN_INTERVAL, WATERMARK_IDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Watermark:
+    """
+    Что уже видели по запросу: максимальный nmId и множество последних (самых больших) nmId.
+    Товар новый, если он выше максимума или попадает в отслеживаемый диапазон, но не в множество.
+    """
+    __slots__ = ("max_nm", "ids", "floor")
+
+    def __init__(self, ids: array = None):
+        self.ids = set(ids or ())
+        self.max_nm = max(self.ids) if self.ids else 0
+        # Ниже самого старого отслеживаемого id судить нельзя - считаем такие товары известными
+        self.floor = min(self.ids) if len(self.ids) >= WATERMARK_IDS else 0
+
+    def is_new(self, nm_id) -> bool:
+        if not nm_id:
+            return False
+        return nm_id > self.max_nm or (nm_id > self.floor and nm_id not in self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+
+class SearchProgress:
+    """
+    Курсоры страниц по поисковым запросам (SQLite) вместо search_history.json.
+    Каждое изменение - UPSERT одной строки под общим asyncio.Lock, поэтому одновременные поиски
+    не затирают курсоры друг друга; чтение с последующей записью (claim, отметки новинок) идет
+    в транзакции BEGIN IMMEDIATE - атомарно и между процессами (бот и CLI с одной базой).
+    Для запросов хранится статистика: на какой странице выдача кончилась, когда и сколько раз сканировали.
+    """
+
+    def __init__(self, path: str = SEARCH_PROGRESS_FILE, legacy_path: str = LEGACY_SEARCH_HISTORY_FILE):
+        self.path = path
+        self.lock = asyncio.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS queries (
+                query TEXT PRIMARY KEY,
+                next_page INTEGER NOT NULL DEFAULT 1,
+                exhausted_page INTEGER,
+                exhausted_at REAL,
+                last_scan REAL,
+                scans INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS watermarks (
+                query TEXT PRIMARY KEY,
+                ids BLOB NOT NULL,
+                updated REAL
+            )"""
+        )
+        self.conn.commit()
+        self._migrate_legacy(legacy_path)
+
+    @contextmanager
+    def _immediate(self):
+        """Транзакция с блокировкой записи с самого начала: другой процесс не вклинится между чтением и записью."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    @staticmethod
+    def key(query: str) -> str:
+        return query.lower().strip()
+
+    def _migrate_legacy(self, legacy_path: str):
+        """Однократно переносит курсоры из search_history.json."""
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+        except Exception:
+            history = {}
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO queries (query, next_page) VALUES (?, ?)",
+            [(self.key(q), int(page)) for q, page in history.items()]
+        )
+        self.conn.commit()
+        os.replace(legacy_path, legacy_path + ".migrated")
+        logger.info("Перенесено %d курсоров из %s", len(history), legacy_path)
+
+    def get(self, query: str) -> dict:
+        row = self.conn.execute(
+            "SELECT next_page, exhausted_page, exhausted_at, last_scan, scans FROM queries WHERE query = ?",
+            (self.key(query),)
+        ).fetchone()
+        if not row:
+            return {"next_page": 1, "exhausted_page": None, "exhausted_at": None, "last_scan": None, "scans": 0}
+        return dict(zip(("next_page", "exhausted_page", "exhausted_at", "last_scan", "scans"), row))
+
+    async def claim(self, query: str, pages: int = SEARCH_PAGES_PER_RUN) -> tuple:
+        """
+        Выделяет диапазон страниц [start, end) и сразу сдвигает курсор на end, чтобы параллельный
+        поиск по тому же запросу взял следующий диапазон. Возвращает None, если выдача запроса
+        недавно кончилась и сканировать ее снова рано.
+        """
+        key = self.key(query)
+        async with self.lock:
+            with self._immediate():
+                state = self.get(key)
+                if state["exhausted_at"] and time.time() - state["exhausted_at"] < EXHAUSTED_RESCAN_INTERVAL:
+                    return None
+                start = state["next_page"]
+                if start > SEARCH_MAX_PAGE:
+                    start = 1
+                end = start + pages
+                # Дальше известной последней страницы не ходим
+                if state["exhausted_page"]:
+                    end = max(start + 1, min(end, state["exhausted_page"] + 1))
+                self.conn.execute(
+                    """INSERT INTO queries (query, next_page) VALUES (?, ?)
+                       ON CONFLICT(query) DO UPDATE SET next_page = excluded.next_page""",
+                    (key, end)
+                )
+                return start, end
+
+    async def complete(self, query: str, claimed_end: int, next_page: int, last_page: int, exhausted: bool):
+        """Фиксирует результат сканирования диапазона, выделенного claim."""
+        key = self.key(query)
+        now = time.time()
+        # Дальше SEARCH_MAX_PAGE WB не отдает - выдача пройдена целиком, как если бы кончилась
+        if not exhausted and next_page > SEARCH_MAX_PAGE:
+            exhausted = True
+        async with self.lock:
+            if exhausted:
+                self.conn.execute(
+                    """UPDATE queries SET next_page = 1, exhausted_page = ?, exhausted_at = ?,
+                       last_scan = ?, scans = scans + 1 WHERE query = ?""",
+                    (last_page, now, now, key)
+                )
+            else:
+                # Курсор откатываем на непрочитанную страницу, только если его никто не сдвинул дальше.
+                # Полная страница на месте прежней последней - выдача выросла, старая граница больше не верна
+                self.conn.execute(
+                    """UPDATE queries SET next_page = CASE WHEN next_page = ? THEN ? ELSE next_page END,
+                       exhausted_page = CASE WHEN exhausted_page <= ? THEN NULL ELSE exhausted_page END,
+                       exhausted_at = NULL, last_scan = ?, scans = scans + 1 WHERE query = ?""",
+                    (claimed_end, next_page, last_page, now, key)
+                )
+            self.conn.commit()
+
+    async def mark_scanned(self, query: str):
+        """Отмечает проход без выделения страниц (дельта по новинкам): курсор и граница выдачи не меняются."""
+        async with self.lock:
+            self.conn.execute(
+                """INSERT INTO queries (query, last_scan, scans) VALUES (?, ?, 1)
+                   ON CONFLICT(query) DO UPDATE SET last_scan = excluded.last_scan, scans = scans + 1""",
+                (self.key(query), time.time())
+            )
+            self.conn.commit()
+
+    def watermark(self, query: str) -> Watermark:
+        row = self.conn.execute("SELECT ids FROM watermarks WHERE query = ?", (self.key(query),)).fetchone()
+        ids = array("q")
+        if row:
+            ids.frombytes(row[0])
+        return Watermark(ids)
+
+    async def update_watermark(self, query: str, nm_ids):
+        """Добавляет увиденные nmId к отметке запроса, храня только WATERMARK_IDS самых больших."""
+        nm_ids = {i for i in nm_ids if i}
+        if not nm_ids:
+            return
+        key = self.key(query)
+        async with self.lock:
+            with self._immediate():
+                row = self.conn.execute("SELECT ids FROM watermarks WHERE query = ?", (key,)).fetchone()
+                ids = array("q")
+                if row:
+                    ids.frombytes(row[0])
+                merged = array("q", sorted(heapq.nlargest(WATERMARK_IDS, nm_ids.union(ids))))
+                self.conn.execute(
+                    """INSERT INTO watermarks (query, ids, updated) VALUES (?, ?, ?)
+                       ON CONFLICT(query) DO UPDATE SET ids = excluded.ids, updated = excluded.updated""",
+                    (key, merged.tobytes(), time.time())
+                )
+
+    def clear(self):
+        self.conn.execute("DELETE FROM watermarks")
+        self.conn.execute("DELETE FROM queries")
+        self.conn.commit()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
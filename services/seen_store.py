@@ -0,0 +1,146 @@
+import logging
+import os
+import struct
+
+from config import SEEN_STORE_FILE, LEGACY_BLACKLIST_FILE, SEEN_BITMAP_MAX_ID, SEEN_COMPACT_SLACK
+
+logger = logging.getLogger(__name__)
+
+_RECORD = struct.Struct("<qQ")      # (chat_id, supplier_id)
+_CLEAR_MARK = 2 ** 64 - 1           # supplier_id-маркер "список чата очищен"
+
+
+class _Bitmap:
+    """Множество неотрицательных int на битовой карте с O(1) проверкой; большие id - в запасном set."""
+    __slots__ = ("bits", "overflow", "size")
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.overflow = set()
+        self.size = 0
+
+    def add(self, value: int) -> bool:
+        """Добавляет id, возвращает True если его еще не было."""
+        if value < 0 or value >= SEEN_BITMAP_MAX_ID:
+            if value in self.overflow:
+                return False
+            self.overflow.add(value)
+        else:
+            byte, bit = divmod(value, 8)
+            if byte >= len(self.bits):
+                # Растем с запасом, чтобы не копировать массив на каждом новом максимуме
+                self.bits.extend(bytes(max(byte + 1 - len(self.bits), len(self.bits) // 2)))
+            if self.bits[byte] >> bit & 1:
+                return False
+            self.bits[byte] |= 1 << bit
+        self.size += 1
+        return True
+
+    def __contains__(self, value: int) -> bool:
+        if value < 0 or value >= SEEN_BITMAP_MAX_ID:
+            return value in self.overflow
+        byte, bit = divmod(value, 8)
+        return byte < len(self.bits) and bool(self.bits[byte] >> bit & 1)
+
+    def __iter__(self):
+        for byte, mask in enumerate(self.bits):
+            if mask:
+                for bit in range(8):
+                    if mask >> bit & 1:
+                        yield byte * 8 + bit
+        yield from self.overflow
+
+    def __len__(self):
+        return self.size
+
+
+class SeenSellersStore:
+    """
+    Просмотренные продавцы (черный список) по чатам.
+    В памяти живут весь процесс в виде битовых карт supplierId, на диск пишется журнал
+    добавлений, который периодически сжимается. Старый seen_sellers.txt переносится один раз.
+    """
+    GLOBAL = 0  # Общий список, виден всем чатам (сюда переносится seen_sellers.txt)
+
+    def __init__(self, path: str = SEEN_STORE_FILE, legacy_path: str = LEGACY_BLACKLIST_FILE):
+        self.path = path
+        self._maps = {}     # chat_id -> _Bitmap
+        self._records = 0   # Записей в журнале на диске
+        self._load()
+        self._migrate_legacy(legacy_path)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # Обрезанный хвост (падение посреди записи) просто игнорируем
+        usable = len(data) - len(data) % _RECORD.size
+        for chat_id, supplier_id in _RECORD.iter_unpack(data[:usable]):
+            if supplier_id == _CLEAR_MARK:
+                self._maps.pop(chat_id, None)
+            else:
+                self._maps.setdefault(chat_id, _Bitmap()).add(supplier_id)
+        self._records = usable // _RECORD.size
+
+    def _migrate_legacy(self, legacy_path: str):
+        """Однократно переносит seen_sellers.txt в общий список."""
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        with open(legacy_path, "r") as f:
+            ids = [int(line) for line in (l.strip() for l in f) if line.isdigit()]
+        self.add_many(self.GLOBAL, ids)
+        os.replace(legacy_path, legacy_path + ".migrated")
+        logger.info("Перенесено %d продавцов из %s", len(ids), legacy_path)
+
+    def contains(self, chat_id: int, supplier_id) -> bool:
+        """Видел ли чат этого продавца (учитывая общий список)."""
+        try:
+            sid = int(supplier_id)
+        except (TypeError, ValueError):
+            return False
+        chat_map = self._maps.get(chat_id)
+        global_map = self._maps.get(self.GLOBAL)
+        return (chat_map is not None and sid in chat_map) or (global_map is not None and sid in global_map)
+
+    def add_many(self, chat_id: int, supplier_ids):
+        """Добавляет продавцов в список чата и дописывает новые в журнал."""
+        chat_map = self._maps.setdefault(chat_id, _Bitmap())
+        new_ids = [sid for sid in map(int, supplier_ids) if chat_map.add(sid)]
+        if not new_ids:
+            return
+        self._append(b"".join(_RECORD.pack(chat_id, sid) for sid in new_ids))
+        self._records += len(new_ids)
+        self._maybe_compact()
+
+    def clear(self, chat_id: int):
+        """Очищает список чата вместе с общим (как раньше удалялся весь файл)."""
+        for cid in (chat_id, self.GLOBAL):
+            if self._maps.pop(cid, None) is not None:
+                self._append(_RECORD.pack(cid, _CLEAR_MARK))
+                self._records += 1
+        self._maybe_compact()
+
+    def count(self, chat_id: int) -> int:
+        chat_map = self._maps.get(chat_id)
+        return len(chat_map) if chat_map is not None else 0
+
+    def _append(self, payload: bytes):
+        with open(self.path, "ab") as f:
+            f.write(payload)
+
+    def _maybe_compact(self):
+        unique = sum(len(m) for m in self._maps.values())
+        if self._records > 2 * unique + SEEN_COMPACT_SLACK:
+            self.compact()
+
+    def compact(self):
+        """Переписывает журнал без дублей и маркеров очистки (атомарно через временный файл)."""
+        tmp_path = self.path + ".tmp"
+        records = 0
+        with open(tmp_path, "wb") as f:
+            for chat_id, chat_map in self._maps.items():
+                f.write(b"".join(_RECORD.pack(chat_id, sid) for sid in chat_map))
+                records += len(chat_map)
+        os.replace(tmp_path, self.path)
+        self._records = records
@@ -0,0 +1,161 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from config import (
+    SELLER_CACHE_FILE, SELLER_CACHE_TTL_EXACT, SELLER_CACHE_TTL_ESTIMATED,
+    SELLER_CACHE_TTL_LEGAL, SELLER_CACHE_LRU_SIZE
+)
+
+
+class SellerCache:
+    """
+    Постоянный кэш данных о продавцах (стаж, тип оценки, юр. информация) по supplierId.
+    Хранится в SQLite и переживает перезапуски, перед базой - LRU-кэш в памяти.
+    Там же хранятся даты самых старых отзывов по nmId - они не меняются и живут без TTL.
+    """
+
+    def __init__(self, path: str = SELLER_CACHE_FILE, lru_size: int = SELLER_CACHE_LRU_SIZE):
+        self.path = path
+        self.lru_size = lru_size
+        self._lru = OrderedDict()  # supplierId -> строка кэша (dict)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS sellers (
+                supplier_id INTEGER PRIMARY KEY,
+                age INTEGER,
+                age_type TEXT,
+                age_ts REAL,
+                legal TEXT,
+                legal_ts REAL
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS feedback_dates (
+                nm_id INTEGER PRIMARY KEY,
+                oldest TEXT
+            )"""
+        )
+        self.conn.commit()
+
+    def _load(self, supplier_id: int) -> dict:
+        """Достает запись из LRU или из базы."""
+        supplier_id = int(supplier_id)
+        if supplier_id in self._lru:
+            self._lru.move_to_end(supplier_id)
+            return self._lru[supplier_id]
+
+        row = self.conn.execute(
+            "SELECT age, age_type, age_ts, legal, legal_ts FROM sellers WHERE supplier_id = ?",
+            (supplier_id,)
+        ).fetchone()
+        entry = {"age": None, "age_type": None, "age_ts": None, "legal": None, "legal_ts": None}
+        if row:
+            age, age_type, age_ts, legal, legal_ts = row
+            entry.update({
+                "age": age, "age_type": age_type, "age_ts": age_ts,
+                "legal": json.loads(legal) if legal else None, "legal_ts": legal_ts
+            })
+        self._remember(supplier_id, entry)
+        return entry
+
+    def _remember(self, supplier_id: int, entry: dict):
+        self._lru[supplier_id] = entry
+        self._lru.move_to_end(supplier_id)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    @staticmethod
+    def _age_ttl(age_type: str) -> float:
+        """Точный стаж живет дольше, чем оценка по эвристикам."""
+        return SELLER_CACHE_TTL_EXACT if age_type == "exact" else SELLER_CACHE_TTL_ESTIMATED
+
+    def get_age(self, supplier_id: int) -> dict:
+        """Возвращает {'age', 'type'} если запись свежая, иначе None."""
+        entry = self._load(supplier_id)
+        if entry["age_ts"] is None or entry["age"] is None:
+            return None
+        if time.time() - entry["age_ts"] > self._age_ttl(entry["age_type"]):
+            return None
+        return {"age": entry["age"], "type": entry["age_type"]}
+
+    def set_age(self, supplier_id: int, age_data: dict):
+        # Ошибки и пустые ответы не кэшируем
+        if not age_data or age_data.get("age") is None or age_data.get("type") in ("error", "unknown"):
+            return
+        supplier_id = int(supplier_id)
+        now = time.time()
+        self.conn.execute(
+            """INSERT INTO sellers (supplier_id, age, age_type, age_ts) VALUES (?, ?, ?, ?)
+               ON CONFLICT(supplier_id) DO UPDATE SET age = excluded.age,
+                   age_type = excluded.age_type, age_ts = excluded.age_ts""",
+            (supplier_id, age_data["age"], age_data["type"], now)
+        )
+        self.conn.commit()
+        entry = self._load(supplier_id)
+        entry.update({"age": age_data["age"], "age_type": age_data["type"], "age_ts": now})
+
+    def get_legal(self, supplier_id: int) -> dict:
+        """Возвращает юр. информацию если запись свежая, иначе None."""
+        entry = self._load(supplier_id)
+        if entry["legal_ts"] is None or time.time() - entry["legal_ts"] > SELLER_CACHE_TTL_LEGAL:
+            return None
+        return entry["legal"]
+
+    def set_legal(self, supplier_id: int, legal: dict):
+        if not legal:
+            return
+        supplier_id = int(supplier_id)
+        now = time.time()
+        self.conn.execute(
+            """INSERT INTO sellers (supplier_id, legal, legal_ts) VALUES (?, ?, ?)
+               ON CONFLICT(supplier_id) DO UPDATE SET legal = excluded.legal, legal_ts = excluded.legal_ts""",
+            (supplier_id, json.dumps(legal, ensure_ascii=False), now)
+        )
+        self.conn.commit()
+        entry = self._load(supplier_id)
+        entry.update({"legal": legal, "legal_ts": now})
+
+    def get_feedback_date(self, nm_id: int) -> datetime:
+        """Дата самого старого отзыва товара или None, если еще неизвестна."""
+        row = self.conn.execute("SELECT oldest FROM feedback_dates WHERE nm_id = ?", (int(nm_id),)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def set_feedback_date(self, nm_id: int, oldest: datetime):
+        if oldest is None:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO feedback_dates (nm_id, oldest) VALUES (?, ?)",
+            (int(nm_id), oldest.isoformat())
+        )
+        self.conn.commit()
+
+    def exact_ages(self) -> list:
+        """[(supplierId, стаж, когда получен)] для всех точных стажей в базе (без учета TTL)."""
+        return self.conn.execute(
+            "SELECT supplier_id, age, age_ts FROM sellers WHERE age_type = 'exact' AND age IS NOT NULL"
+        ).fetchall()
+
+    def feedback_dates(self) -> list:
+        """[(nmId, дата самого старого отзыва)]."""
+        rows = self.conn.execute("SELECT nm_id, oldest FROM feedback_dates").fetchall()
+        return [(nm_id, datetime.fromisoformat(oldest)) for nm_id, oldest in rows]
+
+    def invalidate(self, supplier_id: int = None):
+        """Сбрасывает запись одного продавца или весь кэш (даты отзывов не трогает - они не устаревают)."""
+        if supplier_id is None:
+            self.conn.execute("DELETE FROM sellers")
+            self._lru.clear()
+        else:
+            self.conn.execute("DELETE FROM sellers WHERE supplier_id = ?", (int(supplier_id),))
+            self._lru.pop(int(supplier_id), None)
+        self.conn.commit()
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM sellers").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
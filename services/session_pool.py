@@ -0,0 +1,85 @@
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp import ClientTimeout
+from aiohttp_socks import ProxyConnector
+
+from config import (
+    SESSION_LIMIT, SESSION_LIMIT_PER_HOST, SESSION_DNS_TTL,
+    SESSION_KEEPALIVE, SESSION_IDLE_TTL
+)
+
+
+class SessionPool:
+    """
+    Долгоживущие сессии aiohttp: одна на каждый прокси (HTTP/SOCKS через aiohttp_socks) и одна прямая.
+    Сессии держат keep-alive соединения и кэш DNS, неиспользуемые закрываются по таймауту простоя.
+    """
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self._sessions = {}    # proxy (или None) -> ClientSession
+        self._last_used = {}   # proxy -> время последнего использования
+        self._in_flight = {}   # proxy -> количество активных запросов
+        self._last_eviction = time.monotonic()
+
+    @staticmethod
+    def _make_connector(proxy: str = None):
+        opts = dict(
+            limit=SESSION_LIMIT,
+            limit_per_host=SESSION_LIMIT_PER_HOST,
+            ttl_dns_cache=SESSION_DNS_TTL,
+            keepalive_timeout=SESSION_KEEPALIVE,
+        )
+        if proxy:
+            return ProxyConnector.from_url(proxy, **opts)
+        return aiohttp.TCPConnector(**opts)
+
+    def _get(self, proxy: str = None) -> aiohttp.ClientSession:
+        session = self._sessions.get(proxy)
+        if session is None or session.closed:
+            # total: общий таймаут на весь запрос
+            # connect: таймаут на установление соединения
+            # sock_read: таймаут на чтение данных из сокета
+            timeout = ClientTimeout(total=60, connect=10, sock_read=30)
+            session = aiohttp.ClientSession(connector=self._make_connector(proxy), timeout=timeout)
+            self._sessions[proxy] = session
+        return session
+
+    @asynccontextmanager
+    async def session(self, proxy: str = None):
+        """Выдает сессию для прокси (None - прямое соединение) на время запроса."""
+        await self._evict_idle()
+        session = self._get(proxy)
+        self._in_flight[proxy] = self._in_flight.get(proxy, 0) + 1
+        try:
+            yield session
+        finally:
+            self._in_flight[proxy] -= 1
+            self._last_used[proxy] = time.monotonic()
+
+    async def _evict_idle(self):
+        """Закрывает сессии, простаивающие дольше idle_ttl (проверка не чаще раза в четверть ttl)."""
+        now = time.monotonic()
+        if now - self._last_eviction < self.idle_ttl / 4:
+            return
+        self._last_eviction = now
+        for proxy in list(self._sessions):
+            if self._in_flight.get(proxy) or now - self._last_used.get(proxy, now) < self.idle_ttl:
+                continue
+            session = self._sessions.pop(proxy)
+            self._last_used.pop(proxy, None)
+            self._in_flight.pop(proxy, None)
+            await session.close()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def close(self):
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+        self._last_used.clear()
+        self._in_flight.clear()
@@ -0,0 +1,52 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых запросов "в полете": одновременные вызовы с одним ключом
+    ждут один общий future вместо отдельного похода в сеть.
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> asyncio.Task
+        self._waiters = {}    # key -> сколько вызовов сейчас ждут задачу
+        self.hits = 0         # Вызовов, присоединившихся к уже идущему запросу
+        self.misses = 0       # Вызовов, запустивших новый запрос
+
+    async def do(self, key, func, *args, **kwargs):
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # shield: отмена одного ожидающего (например, по wait_for) не отменяет запрос для остальных
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Отменили последнего ожидающего - запрос больше никому не нужен, останавливаем его
+            if self._waiters.get(key) == 1 and not task.done():
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            if self._waiters.get(key, 0) > 1:
+                self._waiters[key] -= 1
+            else:
+                self._waiters.pop(key, None)
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+
+from services.filters import STAGE_AGE, STAGE_LEGAL
+
+
+async def check_seller(api, supplier_id: int, products_sample: list, timeout: float = 20.0,
+                       pipeline=None, ctx=None) -> dict:
+    """
+    Получает стаж и юр. информацию одного продавца.
+    С pipeline правила стажа проверяются до запроса юр. информации - отсеянным она не нужна.
+    В seller_data["rejected"] - причина отказа или None.
+    """
+    try:
+        age_res = await asyncio.wait_for(api.get_approx_seller_age(supplier_id, products_sample), timeout=timeout)
+        record = {
+            "supplierId": supplier_id,
+            "age_months": age_res.get("age"),
+            "age_type": age_res.get("type"),
+            "name": products_sample[0].supplier if products_sample else None,
+        }
+        if pipeline:
+            passed, reason = pipeline.check(record, STAGE_AGE, ctx)
+            if not passed:
+                return {"age_data": age_res, "legal": {}, "rejected": reason}
+        l_info = await api.get_seller_legal_info(supplier_id)
+        if pipeline:
+            record["legal"] = l_info
+            passed, reason = pipeline.check(record, STAGE_LEGAL, ctx)
+            if not passed:
+                return {"age_data": age_res, "legal": l_info, "rejected": reason}
+        return {"age_data": age_res, "legal": l_info, "rejected": None}
+    except Exception as e:
+        logging.error(f"Error fetching info for seller {supplier_id}: {e}")
+        return {"age_data": {"age": None, "type": "error"}, "legal": {}, "rejected": "Ошибка проверки"}
+
+
+async def verify_sellers(api, sellers_products: dict, concurrency: int,
+                         on_result=None, on_progress=None, pipeline=None, ctx=None, stop=None, pause=None) -> list:
+    """
+    Проверяет продавцов пулом воркеров с ограничением параллельности.
+    pipeline (FilterPipeline) и общий ctx передаются в check_seller.
+    on_result(supplier_id, products, seller_data) вызывается строго в исходном порядке продавцов,
+    on_progress(done, total) - после каждой завершенной проверки.
+    stop() - проверяется перед каждым продавцом: если истинно, новые проверки не начинаются
+    (непроверенные продавцы в результат не попадают). async pause() ожидается перед каждым продавцом
+    (например, пока идут более важные поиски).
+    Возвращает список (supplier_id, products, seller_data) в исходном порядке.
+    """
+    items = list(sellers_products.items())
+    total = len(items)
+    queue = asyncio.Queue()
+    for idx, item in enumerate(items):
+        queue.put_nowait((idx, item))
+
+    ready = {}      # Индекс -> готовый результат, ждущий своей очереди
+    ordered = []
+    next_idx = 0
+    done = 0
+    emit_lock = asyncio.Lock()
+
+    async def worker():
+        nonlocal next_idx, done
+        while True:
+            if pause:
+                await pause()
+            if stop and stop():
+                return
+            try:
+                idx, (supp_id, p_list) = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            seller_data = await check_seller(api, supp_id, p_list, pipeline=pipeline, ctx=ctx)
+            ready[idx] = (supp_id, p_list, seller_data)
+
+            async with emit_lock:
+                done += 1
+                # Отдаем непрерывный готовый префикс, чтобы сохранить порядок результатов
+                while next_idx in ready:
+                    entry = ready.pop(next_idx)
+                    next_idx += 1
+                    ordered.append(entry)
+                    if on_result:
+                        await on_result(*entry)
+                if on_progress:
+                    await on_progress(done, total)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, total)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for w in workers:
+            w.cancel()
+    return ordered
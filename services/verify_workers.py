@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import sys
+from datetime import datetime
+
+from config import (
+    VERIFY_WORKERS, VERIFY_CONCURRENCY, PROXY_FILE, RATE_LIMITS_FILE, GLOBAL_RPS, GLOBAL_BURST, AGE_INDEX_ENABLED,
+    VERIFY_PARENT_RPS_SHARE, VERIFY_WORKER_MAX_RESTARTS, VERIFY_WORKER_TIMEOUT
+)
+from services import json_backend
+from services.age_index import AgeIndex
+from services.filters import FilterPipeline
+from services.products import ProductRecord
+from services.proxy_pool import ProxyPool
+from services.rate_limiter import AIMDLimiter, TokenBucket
+from services.seller_cache import SellerCache
+from services.verifier import check_seller
+from services.wb_api import WBApi
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE_LIMIT = 1 << 24    # Строка протокола - продавец со всеми товарами, бывает большой
+
+# Ответ за продавца, которого не удалось проверить (воркер упал, молчит или проверка бросила исключение), -
+# как у check_seller при ошибке
+_WORKER_LOST = {"age_data": {"age": None, "type": "error"}, "legal": {}, "rejected": "Ошибка проверки"}
+
+
+class VerifyWorkerPool:
+    """
+    Пул процессов для проверки продавцов (стаж + юр. информация), чтобы разбор ответов и эвристики
+    не занимали цикл событий бота. Продавцы распределяются по воркерам по supplierId % workers,
+    поэтому кэши и объединение запросов в воркере работают для "своих" продавцов.
+    Каждый воркер ходит через свою часть прокси (proxies[i::workers]) со своими лимитами.
+    Протокол - JSON-строки через stdin/stdout процесса.
+    Упавший воркер перезапускается (до VERIFY_WORKER_MAX_RESTARTS раз), его незавершенные проверки
+    отправляются заново один раз; после исчерпания перезапусков его продавцов делят живые воркеры.
+    """
+
+    def __init__(self, workers: int = VERIFY_WORKERS, use_proxy: bool = True):
+        self.workers = workers
+        self.use_proxy = use_proxy
+        self._procs = []
+        self._readers = []
+        self._restarts = [0] * workers
+        self._dead = set()              # Воркеры, которые больше не перезапускаем
+        self._pending = {}              # (token, supplier_id) -> [Future, сообщение, процесс]
+        self._tokens = itertools.count(1)
+        self._requests = {}             # pid воркера -> запросов к WB (нарастающим итогом)
+        self._proxies = None            # Последний список из reload_proxies - для перезапущенных воркеров
+        self._env = None
+        self._closing = False
+
+    async def start(self, parent_api=None):
+        """
+        Запускает воркеры. parent_api - WBApi процесса бота: его общий бюджет уменьшается до
+        VERIFY_PARENT_RPS_SHARE, остальное получают воркеры.
+        """
+        if parent_api is not None:
+            parent_api.rate_limit = TokenBucket(GLOBAL_RPS * VERIFY_PARENT_RPS_SHARE,
+                                                GLOBAL_BURST * VERIFY_PARENT_RPS_SHARE)
+        self._env = dict(os.environ)
+        self._env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, self._env.get("PYTHONPATH")) if p)
+        self._procs = [None] * self.workers
+        self._readers = [None] * self.workers
+        for idx in range(self.workers):
+            await self._spawn(idx)
+        logger.info("Запущено воркеров проверки: %d", self.workers)
+
+    async def _spawn(self, idx: int):
+        cmd = [sys.executable, "-m", "services.verify_workers", "--index", str(idx), "--count", str(self.workers)]
+        if not self.use_proxy:
+            cmd.append("--direct")
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, env=self._env, limit=LINE_LIMIT
+        )
+        self._procs[idx] = proc
+        self._readers[idx] = asyncio.create_task(self._read_results(idx, proc))
+        if self._proxies is not None:
+            self._send(idx, {"op": "proxies", "list": self._proxies})
+
+    @property
+    def requests(self) -> int:
+        """Запросов к WB, сделанных воркерами (включая уже завершившиеся)."""
+        return sum(self._requests.values())
+
+    async def _read_results(self, idx: int, proc):
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            msg = json_backend.loads(line)
+            self._requests[proc.pid] = msg.get("requests", self._requests.get(proc.pid, 0))
+            if msg.get("token") is None:
+                continue
+            entry = self._pending.pop((msg["token"], msg["sid"]), None)
+            if entry and not entry[0].done():
+                entry[0].set_result(msg["data"])
+        await proc.wait()
+        if self._closing:
+            self._fail(proc)
+            return
+        # Воркер упал: перезапускаем его или отдаем его продавцов живым
+        logger.error("Воркер проверки %d завершился (код %s)", idx, proc.returncode)
+        if self._restarts[idx] < VERIFY_WORKER_MAX_RESTARTS:
+            self._restarts[idx] += 1
+            try:
+                await self._spawn(idx)
+            except Exception as e:
+                logger.error("Не удалось перезапустить воркер проверки %d: %s", idx, e)
+                self._dead.add(idx)
+        else:
+            self._dead.add(idx)
+        for key, (fut, msg, sent_to) in list(self._pending.items()):
+            if sent_to is not proc:
+                continue
+            if msg.get("retry"):
+                # Уже отправляли повторно - возможно, этот продавец и роняет воркер
+                self._pending.pop(key)
+                if not fut.done():
+                    fut.set_result(_WORKER_LOST)
+            else:
+                msg["retry"] = True
+                self._dispatch(key)
+
+    def _fail(self, proc):
+        """Проверки, отправленные процессу proc, завершаются ошибкой."""
+        for key, (fut, _, sent_to) in list(self._pending.items()):
+            if sent_to is proc:
+                self._pending.pop(key)
+                if not fut.done():
+                    fut.set_result(_WORKER_LOST)
+
+    def shard(self, supplier_id: int):
+        """Индекс воркера продавца; если его воркер больше не перезапускается - один из живых (None - живых нет)."""
+        idx = supplier_id % self.workers
+        if idx in self._dead:
+            alive = [i for i in range(self.workers) if i not in self._dead]
+            if not alive:
+                return None
+            idx = alive[supplier_id % len(alive)]
+        return idx
+
+    def _dispatch(self, key: tuple):
+        """Отправляет проверку воркеру продавца и запоминает, какому процессу она ушла."""
+        entry = self._pending[key]
+        idx = self.shard(entry[1]["sid"])
+        if idx is None:
+            self._pending.pop(key)
+            if not entry[0].done():
+                entry[0].set_result(_WORKER_LOST)
+            return
+        # Если процесс уже упал, проверку переотправит _read_results после перезапуска
+        entry[2] = self._procs[idx]
+        self._send(idx, entry[1])
+
+    def _send(self, idx: int, msg: dict):
+        proc = self._procs[idx]
+        if proc.returncode is None:
+            proc.stdin.write(json_backend.dumps(msg) + b"\n")
+
+    def set_use_proxy(self, use_proxy: bool):
+        self.use_proxy = use_proxy
+        for idx in range(len(self._procs)):
+            self._send(idx, {"op": "use_proxy", "value": use_proxy})
+
+    def reload_proxies(self, proxies: list):
+        """Раздает воркерам новый список прокси (каждый возьмет свою часть)."""
+        self._proxies = proxies
+        for idx in range(len(self._procs)):
+            self._send(idx, {"op": "proxies", "list": proxies})
+
+    async def verify(self, sellers_products: dict, on_result=None, on_progress=None, pipeline=None, ctx=None) -> list:
+        """
+        То же, что verifier.verify_sellers, но проверка идет в воркерах: on_result вызывается
+        в исходном порядке продавцов, on_progress(done, total) - после каждой проверки.
+        Правила pipeline передаются воркерам критериями и компилируются там.
+        Если воркеры молчат VERIFY_WORKER_TIMEOUT секунд, оставшиеся продавцы получают ошибку проверки.
+        """
+        loop = asyncio.get_running_loop()
+        token = next(self._tokens)
+        criteria = pipeline.criteria if pipeline else None
+        now = (ctx.now if ctx else datetime.now()).timestamp()
+        items = list(sellers_products.items())
+        total = len(items)
+        index = {}                      # Future -> индекс продавца
+        for idx, (sid, products) in enumerate(items):
+            fut = loop.create_future()
+            index[fut] = idx
+            self._pending[(token, sid)] = [fut, {
+                "op": "check", "token": token, "sid": sid,
+                "rows": [p.to_row() for p in products], "criteria": criteria, "now": now
+            }, None]
+            self._dispatch((token, sid))
+        await asyncio.gather(*(proc.stdin.drain() for proc in self._procs if proc.returncode is None),
+                             return_exceptions=True)
+
+        ready = {}
+        ordered = []
+        next_idx = 0
+        done = 0
+        pending = set(index)
+        try:
+            while pending:
+                finished, pending = await asyncio.wait(pending, timeout=VERIFY_WORKER_TIMEOUT,
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                if not finished:
+                    logger.error("Воркеры проверки не отвечают %d с, продавцов без ответа: %d",
+                                 VERIFY_WORKER_TIMEOUT, len(pending))
+                    for fut in pending:
+                        fut.set_result(_WORKER_LOST)
+                    finished, pending = pending, set()
+                for fut in finished:
+                    idx = index[fut]
+                    ready[idx] = (*items[idx], fut.result())
+                    done += 1
+                # Отдаем непрерывный готовый префикс, чтобы сохранить порядок результатов
+                while next_idx in ready:
+                    entry = ready.pop(next_idx)
+                    next_idx += 1
+                    ordered.append(entry)
+                    if on_result:
+                        await on_result(*entry)
+                if on_progress:
+                    await on_progress(done, total)
+        finally:
+            for sid, _ in items:
+                self._pending.pop((token, sid), None)
+        return ordered
+
+    async def close(self):
+        self._closing = True
+        for proc in self._procs:
+            if proc.returncode is None:
+                proc.stdin.close()
+        for proc in self._procs:
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                proc.kill()
+        # Читатели дочитывают итоговые счетчики запросов
+        await asyncio.gather(*self._readers, return_exceptions=True)
+
+
+# --- Процесс воркера ---
+
+async def _worker_loop(index: int, count: int, use_proxy: bool):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    out = sys.stdout.buffer
+
+    proxy_pool = ProxyPool(ProxyPool.load_file(PROXY_FILE)[index::count])
+    # Свои выученные скорости (своя часть прокси) и своя доля общего бюджета запросов
+    # (за вычетом доли процесса бота)
+    root, ext = os.path.splitext(RATE_LIMITS_FILE)
+    # Индекс стажа общий с ботом и другими воркерами (одна база), массивы у каждого свои
+    api = WBApi(use_proxy=use_proxy, cache=SellerCache(), proxy_pool=proxy_pool,
+                limiter=AIMDLimiter(f"{root}.w{index}{ext}"), age_index=AgeIndex() if AGE_INDEX_ENABLED else None)
+    share = (1 - VERIFY_PARENT_RPS_SHARE) / count
+    api.rate_limit = TokenBucket(GLOBAL_RPS * share, GLOBAL_BURST * share)
+
+    semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+    pipelines = {}                      # Критерии (JSON) -> FilterPipeline
+    tasks = set()
+
+    def reply(msg: dict):
+        # Каждая строка несет счетчик запросов воркера - родитель суммирует их для сводок
+        out.write(json_backend.dumps({**msg, "requests": api.metrics.total_requests}) + b"\n")
+        out.flush()
+
+    async def handle(msg: dict):
+        try:
+            async with semaphore:
+                pipeline = ctx = None
+                if msg["criteria"] is not None:
+                    key = json_backend.dumps(msg["criteria"])
+                    pipeline = pipelines.get(key)
+                    if pipeline is None:
+                        pipeline = pipelines[key] = FilterPipeline(msg["criteria"])
+                    ctx = pipeline.context(datetime.fromtimestamp(msg["now"]))
+                products = [ProductRecord.from_row(r) for r in msg["rows"]]
+                data = await check_seller(api, msg["sid"], products, pipeline=pipeline, ctx=ctx)
+        except Exception as e:
+            # Ответ нужен на каждую проверку, иначе родитель ждет его до таймаута
+            logger.exception("Ошибка проверки продавца %s: %s", msg.get("sid"), e)
+            data = _WORKER_LOST
+        reply({"token": msg["token"], "sid": msg["sid"], "data": data})
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                msg = json_backend.loads(line)
+            except ValueError as e:
+                logger.error("Некорректная строка протокола: %s", e)
+                continue
+            if msg["op"] == "check":
+                task = asyncio.create_task(handle(msg))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            elif msg["op"] == "proxies":
+                proxy_pool.reload(msg["list"][index::count])
+            elif msg["op"] == "use_proxy":
+                api.use_proxy = msg["value"]
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        reply({"token": None})
+        await api.close()
+        api.cache.close()
+        if api.age_index:
+            api.age_index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воркер проверки продавцов (запускается VerifyWorkerPool)")
+    parser.add_argument("--index", type=int, required=True)
+    parser.add_argument("--count", type=int, required=True)
+    parser.add_argument("--direct", action="store_true", help="Без прокси")
+    args = parser.parse_args()
+    # stdout занят протоколом - логи только в stderr
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format=f"[worker {args.index}] %(levelname)s:%(name)s:%(message)s")
+    asyncio.run(_worker_loop(args.index, args.count, not args.direct))
+
+
+if __name__ == "__main__":
+    main()
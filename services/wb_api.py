@@ -1,130 +1,251 @@
-import aiohttp
-from aiohttp_socks import ProxyConnector
-import random
+import re
 import asyncio
 import os
+import time
 import logging
+from contextlib import nullcontext
 from datetime import datetime
+from fnmatch import fnmatch
+from urllib.parse import urlsplit
 from aiohttp import ClientTimeout
 from fake_useragent import UserAgent
 
-from config import HEADERS, DEFAULT_PARAMS, SELLER_INFO_URL, PRODUCT_DETAIL_URL, SEARCH_URL, DELAY_MIN, DELAY_MAX, PROXY_FILE
+from services.proxy_pool import ProxyPool, proxy_label
+from services.metrics import Metrics
+from services.session_pool import SessionPool
+from services.singleflight import SingleFlight
+from services.rate_limiter import TokenBucket, AIMDLimiter
+from services.cassette import Cassette
+from services.age_index import SERIES_SUPPLIER, SERIES_NM
+from services.json_backend import loads as json_loads, preview, BACKEND as JSON_BACKEND
+from config import HEADERS, DEFAULT_PARAMS, SELLER_INFO_URL, PRODUCT_DETAIL_URL, SEARCH_URL, PROXY_FILE, HOST_CONCURRENCY, GLOBAL_RPS, GLOBAL_BURST, ERROR_BODY_LIMIT, WB_MOCK_URL, CASSETTE_MODE, CASSETTE_FILE, FEEDBACK_HEDGE_DELAY, PRODUCT_DETAIL_BATCH, AGE_INDEX_MAX_ERROR_DAYS
+
+logger = logging.getLogger(__name__)
+
+def endpoint_key(url: str) -> str:
+    """Ключ эндпоинта для лимитов: хост без номеров зеркал и путь без числовых id."""
+    parts = urlsplit(url)
+    host = re.sub(r"\d+", "*", parts.hostname or "")
+    path = "/".join(seg for seg in parts.path.split("/") if seg and not seg.isdigit())
+    return f"{host}/{path}"
+
+async def first_result(coros, stagger: float = 0.0):
+    """
+    Возвращает первый результат не None из корутин, остальные отменяет.
+    Корутины запускаются с шагом stagger секунд (0 - все сразу); следующая стартует без ожидания,
+    если все запущенные уже закончились без результата.
+    """
+    coros = list(coros)
+    running = set()
+    try:
+        while coros or running:
+            if coros:
+                running.add(asyncio.ensure_future(coros.pop(0)))
+                if stagger <= 0 and coros:
+                    continue
+            done, running = await asyncio.wait(running, timeout=stagger if coros else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result() is not None:
+                    return task.result()
+        return None
+    finally:
+        for task in running:
+            task.cancel()
+        for coro in coros:
+            coro.close()
+
+def detail_summary(p: dict) -> dict:
+    """Цена (руб.), рейтинг, число отзывов и остаток на складах из карточки cards/v1/detail."""
+    price_raw = p.get("salePriceU") or p.get("priceU") or (p.get("sizes") or [{}])[0].get("price", {}).get("total")
+    return {
+        "price": price_raw / 100 if price_raw else None,
+        "rating": p.get("reviewRating") or p.get("rating"),
+        "feedbacks": p.get("feedbacks"),
+        "stock": sum(s.get("qty", 0) for size in p.get("sizes") or [] for s in size.get("stocks") or []),
+    }
 
 class WBApi:
-    def __init__(self, use_proxy=True, max_retries=5):
+    def __init__(self, use_proxy=True, max_retries=5, cache=None, proxy_pool=None, metrics=None,
+                 limiter=None, mock_url=WB_MOCK_URL, cassette=None, age_index=None):
         self.use_proxy = use_proxy
+        self.mock_url = mock_url # Локальная заглушка WB вместо настоящих хостов (бенчмарки)
+        self.cache = cache # SellerCache, общий для всех поисков (опционально)
+        self.age_index = age_index # AgeIndex: выученные даты регистрации по supplierId/nmId (опционально)
         self.max_retries = max_retries
-        self.proxies = self._load_proxies()
+        self.proxy_pool = proxy_pool if proxy_pool is not None else ProxyPool.from_file(PROXY_FILE)
         self.ua = UserAgent()
-        self.session = None # Initialize session to None
-        print(f"[API] Инициализация. Режим прокси: {use_proxy}. Загружено {len(self.proxies)} прокси.")
+        self.sessions = SessionPool() # Долгоживущие сессии: по одной на прокси
+        self._host_semaphores = {} # Шаблон хоста -> семафор одновременных запросов
+        self.flight = SingleFlight() # Объединение одинаковых одновременных запросов
+        self.rate_limit = TokenBucket(GLOBAL_RPS, GLOBAL_BURST) # Общий бюджет запросов в секунду
+        self.limiter = limiter if limiter is not None else AIMDLimiter() # Адаптивные лимиты на эндпоинт и прокси
+        self.metrics = metrics if metrics is not None else Metrics() # Задержки, коды, ретраи, объемы
+        if cassette is None and CASSETTE_MODE:
+            cassette = Cassette(CASSETTE_FILE, CASSETTE_MODE)
+        self.cassette = cassette # Запись/воспроизведение запросов (JSONL), None - обычная работа
+        logger.info("Инициализация. Режим прокси: %s. Загружено %d прокси. JSON: %s",
+                    use_proxy, len(self.proxy_pool), JSON_BACKEND)
 
     async def __aenter__(self):
-        await self._get_session() # Ensure session is created when entering context
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.close() # Close session when exiting context
-
-    async def _get_session(self):
-        if self.session is None or self.session.closed:
-            # Создаем сессию с увеличенными таймаутами по умолчанию
-            # total: общий таймаут на весь запрос
-            # connect: таймаут на установление соединения
-            # sock_read: таймаут на чтение данных из сокета
-            timeout = ClientTimeout(total=60, connect=10, sock_read=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
-        return self.session
-
-    def _load_proxies(self):
-        """Загружает список прокси из файла."""
-        if not os.path.exists(PROXY_FILE):
-            return []
-        with open(PROXY_FILE, "r", encoding="utf-8") as f:
-            proxies = []
-            for line in f:
-                p = line.strip()
-                if p:
-                    # Корректная обработка протоколов
-                    if "://" not in p:
-                        p = f"http://{p}"
-                    proxies.append(p)
-        return proxies
-
-    def _get_random_proxy(self):
-        """Возвращает случайный прокси или None."""
-        if not self.proxies:
-            return None
-        return random.choice(self.proxies)
+        await self.close() # Close sessions when exiting context
+
+    def _get_host_limit(self, url):
+        """Возвращает семафор для хоста из HOST_CONCURRENCY (или пустой контекст без лимита)."""
+        host = urlsplit(url).hostname or ""
+        for pattern, limit in HOST_CONCURRENCY.items():
+            if fnmatch(host, pattern):
+                if pattern not in self._host_semaphores:
+                    self._host_semaphores[pattern] = asyncio.Semaphore(limit)
+                return self._host_semaphores[pattern]
+        return nullcontext()
 
-    async def _request(self, method, url, params=None, headers=None, timeout_sec=15, retries=None, **kwargs):
-        """Универсальный метод запроса с ротацией прокси и обработкой ошибок."""
+    def _rewrite_url(self, url):
+        """https://host/path -> {mock_url}/host/path, если задана заглушка WB."""
+        if not self.mock_url:
+            return url
+        parts = urlsplit(url)
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{self.mock_url.rstrip('/')}/{parts.hostname}{parts.path}{query}"
+
+    def _get_proxy(self):
+        """Возвращает прокси из пула (по скору здоровья) или None."""
+        return self.proxy_pool.acquire()
+
+    async def _request(self, method, url, params=None, headers=None, timeout_sec=15, retries=None,
+                       expected_statuses=(), **kwargs):
+        """
+        Универсальный метод запроса с ротацией прокси и обработкой ошибок.
+        expected_statuses - штатные для эндпоинта коды ошибок: ответ (resp, None) сразу, без ретраев,
+        без снижения лимитов и без бана прокси.
+        """
         last_exception = None
         
         # Используем переданные заголовки или стандартные
         current_headers = headers if headers else HEADERS.copy()
         
         max_attempts = retries if retries is not None else self.max_retries
+        endpoint = endpoint_key(url)
+        if self.cassette is not None and self.cassette.replaying:
+            return self._replay(method, url, params, endpoint, max_attempts, expected_statuses)
+
+        host_limit = self._get_host_limit(url)
+        target = self._rewrite_url(url)
         for attempt in range(max_attempts):
-            proxy = self._get_random_proxy() if self.use_proxy else None
-            connector = ProxyConnector.from_url(proxy) if proxy else None
+            if attempt:
+                self.metrics.observe_retry(endpoint)
+            await self.rate_limit.acquire()
+            proxy = self._get_proxy() if self.use_proxy else None
+            proxy_name = proxy_label(proxy)
+            await self.limiter.acquire(endpoint, proxy)
             
             # Генерируем новый User-Agent для каждой попытки
             current_headers["User-Agent"] = self.ua.random
             
-            print(f"[API] Attempt {attempt+1}/{self.max_retries} | URL: {url} | Proxy: {'Internal' if not proxy else proxy} | UA: {current_headers['User-Agent'][:30]}...")
+            logger.debug("Attempt %d/%d | URL: %s | Proxy: %s", attempt + 1, max_attempts, target, proxy_name)
             
+            started = time.monotonic()
             try:
                 # Настраиваем таймаут правильно
                 timeout = ClientTimeout(total=timeout_sec)
-                # Используем общую сессию
-                session = await self._get_session()
-                
-                # Прокси требует отдельного коннектора в aiohttp, если мы хотим менять его на лету
-                # Но мы можем просто передать proxy в request, если сессия это позволяет (зависит от версии)
-                # В современных версиях aiohttp проще использовать одну сессию без жесткого коннектора
-                # Либо создавать сессию на пачку запросов.
                 
-                async with session.request(method, url, params=params, timeout=timeout, proxy=proxy, **kwargs) as resp:
-                        resp_text = await resp.text()
-                        
-                        if resp.status == 200:
-                            # Пробуем распарсить JSON в любом случае, так как WB иногда шлет text/plain вместо application/json
-                            try:
-                                data = await resp.json()
-                                return resp, data
-                            except Exception:
-                                # Если через resp.json() не вышло (например, заголовок мешает), пробуем вручную через json.loads
-                                try:
-                                    import json
-                                    data = json.loads(resp_text)
-                                    return resp, data
-                                except Exception:
-                                    print(f"[API] JSON Parse Error. Content-Type: {resp.headers.get('Content-Type')}")
-                                    print(f"[BODY FULL (TRUNCATED TO 10000)]: {resp_text[:10000]}")
-                                    return resp, None
-                        
-                        elif resp.status == 429:
-                            print(f"[🚩 BAN] Proxy {proxy} got 429. Body: {resp_text[:200]}")
-                        else:
-                            print(f"[⚠️ ERROR] Status: {resp.status} | Body: {resp_text[:250]}")
-                            
-                        continue # Ретрай при любой ошибке (не 200)
+                # Прокси зашит в коннектор сессии из пула (HTTP и SOCKS), поэтому keep-alive
+                # и TLS-соединения переиспользуются между запросами через один и тот же прокси
+                async with host_limit:
+                    started = time.monotonic()
+                    async with self.sessions.session(proxy) as session, \
+                            session.request(method, target, params=params, timeout=timeout, **kwargs) as resp:
+                        if resp.status != 200:
+                            # Для ошибок тело целиком не нужно - читаем только начало для лога
+                            body = await resp.content.read(ERROR_BODY_LIMIT)
+                            if self.cassette is not None:
+                                self.cassette.record(method, url, params, resp.status, resp.content_type, body)
+                            self.metrics.observe_response(endpoint, proxy_name, resp.status, time.monotonic() - started, len(body))
+                            if resp.status in expected_statuses:
+                                return resp, None
+                            self.limiter.on_response(endpoint, proxy, resp.status)
+                            if resp.status in (429, 498):
+                                logger.warning("[BAN] Proxy %s got %d on %s. Body: %s",
+                                               proxy_name, resp.status, endpoint, preview(body, ERROR_BODY_LIMIT))
+                                if proxy:
+                                    self.proxy_pool.report_failure(proxy, banned=True)
+                            else:
+                                logger.warning("[ERROR] Status %d on %s. Body: %s",
+                                               resp.status, endpoint, preview(body, ERROR_BODY_LIMIT))
+                                if proxy:
+                                    self.proxy_pool.report_failure(proxy)
+                            continue # Ретрай при любой ошибке (не 200)
+
+                        # Тело читается один раз байтами и разбирается один раз,
+                        # независимо от Content-Type (WB иногда шлет text/plain вместо application/json)
+                        body = await resp.read()
+                        latency = time.monotonic() - started
+                        if self.cassette is not None:
+                            self.cassette.record(method, url, params, resp.status, resp.content_type, body)
+                        self.metrics.observe_response(endpoint, proxy_name, resp.status, latency, len(body))
+                        self.limiter.on_response(endpoint, proxy, resp.status)
+                        if proxy:
+                            self.proxy_pool.report_success(proxy, latency)
+                        return resp, self._decode(endpoint, resp, body)
                         
             except Exception as e:
                 last_exception = e
-                print(f"[❌ FAIL] Proxy {proxy} | {type(e).__name__}: {e}")
+                if self.cassette is not None:
+                    self.cassette.record(method, url, params, "error", body=str(e).encode())
+                self.metrics.observe_response(endpoint, proxy_name, "error", time.monotonic() - started)
+                logger.info("[FAIL] Proxy %s | %s: %s", proxy_name, type(e).__name__, e)
+                if proxy:
+                    self.proxy_pool.report_failure(proxy)
                 await asyncio.sleep(0.5)
                 
-        print(f"[💀 DEAD] Failed {url} after {self.max_retries} retries. Last: {last_exception}")
+        logger.error("[DEAD] Failed %s after %d attempts. Last: %s", url, max_attempts, last_exception)
+        return None, None
+
+    def _decode(self, endpoint, resp, body):
+        """Разбирает тело ответа один раз; None, если это не JSON."""
+        parse_started = time.perf_counter()
+        try:
+            data = json_loads(body)
+        except ValueError:
+            logger.warning("JSON Parse Error on %s. Content-Type: %s. Body: %s", endpoint,
+                           resp.headers.get('Content-Type'), preview(body, ERROR_BODY_LIMIT))
+            data = None
+        self.metrics.observe_decode(endpoint, time.perf_counter() - parse_started)
+        return data
+
+    def _replay(self, method, url, params, endpoint, max_attempts, expected_statuses=()):
+        """Отдает записанные попытки из кассеты без сети, лимитов и прокси (тот же цикл ретраев)."""
+        for attempt in range(max_attempts):
+            if attempt:
+                self.metrics.observe_retry(endpoint)
+            entry = self.cassette.next(method, url, params)
+            if entry is None:
+                logger.warning("[REPLAY] Нет записи для %s %s", method, url)
+                break
+            self.metrics.observe_response(endpoint, "replay", entry.status, 0.0, len(entry.body))
+            if entry.status == 200:
+                resp = entry.response
+                return resp, self._decode(endpoint, resp, entry.body)
+            if entry.status in expected_statuses:
+                return entry.response, None
         return None, None
 
     async def close(self):
-        if self.session and not self.session.closed:
-            await self.session.close()
+        self.limiter.save()
+        stats = self.flight.stats()
+        logger.info("Объединено запросов: %d (новых: %d)", stats['hits'], stats['misses'])
+        await self.sessions.close()
+        if self.cassette is not None:
+            self.cassette.close()
 
     async def search_products(self, query: str, limit: int = 100, page: int = 1, sort: str = 'popular') -> list:
-        """Поиск товаров по ключевому слову с поддержкой страниц и сортировки."""
+        """
+        Поиск товаров по ключевому слову с поддержкой страниц и сортировки.
+        Возвращает None, если запрос не удался (в отличие от пустой выдачи).
+        """
         params = DEFAULT_PARAMS.copy()
         params['query'] = query
         params['page'] = str(page)
@@ -132,12 +253,13 @@ class WBApi:
         
         resp, data = await self._request("GET", SEARCH_URL, params=params, timeout_sec=10)
         
-        if resp and resp.status == 200 and data:
+        if resp and resp.status == 200 and data is not None:
+            # Пустой список товаров - выдача закончилась
             products = data.get('data', {}).get('products', []) or data.get('products', [])
             return products[:limit]
         
-        print(f"[API] Search failed. Status: {resp.status if resp else 'No response'}")
-        return []
+        logger.warning("Search failed. Status: %s", resp.status if resp else 'No response')
+        return None
 
     async def get_product_details(self, nm_id: int) -> dict:
         """Получение деталей товара (имитация просмотра)."""
@@ -151,17 +273,62 @@ class WBApi:
         resp, data = await self._request("GET", PRODUCT_DETAIL_URL, params=params, timeout_sec=10)
         return data if data else {}
 
+    async def get_products_details(self, nm_ids, chunk_size: int = PRODUCT_DETAIL_BATCH) -> dict:
+        """
+        Детали нескольких товаров пачками: cards/v1/detail принимает до chunk_size id через ';'.
+        Возвращает {nm_id: карточка}; товары, которых нет в ответе (или чья пачка не загрузилась), пропускаются.
+        """
+        ids = list(dict.fromkeys(int(i) for i in nm_ids if i))
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        details = {}
+        for products in await asyncio.gather(*(self._fetch_details_chunk(chunk) for chunk in chunks)):
+            for p in products:
+                if p.get("id"):
+                    details[p["id"]] = p
+        return details
+
+    async def _fetch_details_chunk(self, nm_ids: list) -> list:
+        params = {
+            "appType": "1",
+            "curr": "rub",
+            "dest": "-1257786",
+            "nm": ";".join(map(str, nm_ids))
+        }
+        resp, data = await self._request("GET", PRODUCT_DETAIL_URL, params=params, timeout_sec=10)
+        if not isinstance(data, dict):
+            return []
+        return data.get("data", {}).get("products", []) or data.get("products", [])
+
     async def get_seller_info(self, supplier_id: int) -> dict:
         """Получение общей информации о продавце (включая стаж/age)."""
+        return await self.flight.do(("seller_info", supplier_id), self._fetch_seller_info, supplier_id)
+
+    async def _fetch_seller_info(self, supplier_id: int) -> dict:
         url = f"https://catalog.wb.ru/sellers/info?supplierId={supplier_id}"
         headers = HEADERS.copy()
         headers["Referer"] = "https://www.wildberries.ru/"
         
-        resp, data = await self._request("GET", url, headers=headers, timeout_sec=5, retries=2)
+        # 498 здесь - продавец скрыл стаж (штатный случай для эвристики), а не бан прокси
+        resp, data = await self._request("GET", url, headers=headers, timeout_sec=5, retries=2,
+                                         expected_statuses=(498,))
         return data if data else {}
 
     async def get_seller_legal_info(self, supplier_id: int) -> dict:
-        """Получение юридической информации (ИНН) через Web-API."""
+        """Получение юридической информации (ИНН) через Web-API (с чтением через кэш)."""
+        if self.cache:
+            cached = self.cache.get_legal(supplier_id)
+            if cached is not None:
+                return cached
+
+        return await self.flight.do(("legal", supplier_id), self._load_seller_legal_info, supplier_id)
+
+    async def _load_seller_legal_info(self, supplier_id: int) -> dict:
+        legal = await self._fetch_seller_legal_info(supplier_id)
+        if self.cache:
+            self.cache.set_legal(supplier_id, legal)
+        return legal
+
+    async def _fetch_seller_legal_info(self, supplier_id: int) -> dict:
         url = f"https://www.wildberries.ru/webapi/seller/info/legal?supplierId={supplier_id}"
         custom_headers = HEADERS.copy()
         custom_headers.update({
@@ -173,34 +340,86 @@ class WBApi:
         return data if data else {}
 
     async def get_earliest_feedback_date(self, nm_id: int) -> datetime:
-        """Получение даты самого старого отзыва для товара (Эвристика возраста)."""
-        # Пробуем несколько серверов отзывов
-        for i in range(1, 3):
-            url = f"https://feedbacks{i}.wb.ru/feedbacks/v1/{nm_id}"
-            try:
-                resp, data = await self._request("GET", url, timeout_sec=5, retries=1)
-                if data and "feedbacks" in data:
-                    feedbacks = data["feedbacks"]
-                    if feedbacks:
-                        dates = [f.get("createdDate") for f in feedbacks if f.get("createdDate")]
-                        if dates:
-                            parsed_dates = [datetime.fromisoformat(d.replace("Z", "+00:00")) for d in dates]
-                            return min(parsed_dates)
-            except Exception:
-                continue
-        return None
+        """Получение даты самого старого отзыва для товара (Эвристика возраста, с чтением через кэш)."""
+        if self.cache:
+            cached = self.cache.get_feedback_date(nm_id)
+            if cached:
+                return cached
+
+        return await self.flight.do(("feedback_date", nm_id), self._load_earliest_feedback_date, nm_id)
+
+    async def _load_earliest_feedback_date(self, nm_id: int) -> datetime:
+        oldest = await self._fetch_earliest_feedback_date(nm_id)
+        if oldest and self.cache:
+            # Самый старый отзыв уже не изменится - запоминаем навсегда
+            self.cache.set_feedback_date(nm_id, oldest)
+        if oldest and self.age_index:
+            self.age_index.add_feedback_date(nm_id, oldest)
+        return oldest
+
+    async def _fetch_earliest_feedback_date(self, nm_id: int) -> datetime:
+        # Оба сервера отзывов опрашиваются наперегонки (второй - если первый молчит дольше
+        # FEEDBACK_HEDGE_DELAY или ответил пусто), берется первый полезный ответ
+        return await first_result(
+            (self._fetch_oldest_feedback(f"https://feedbacks{i}.wb.ru/feedbacks/v1/{nm_id}") for i in range(1, 3)),
+            stagger=FEEDBACK_HEDGE_DELAY
+        )
+
+    async def _fetch_oldest_feedback(self, url: str) -> datetime:
+        try:
+            resp, data = await self._request("GET", url, timeout_sec=5, retries=1)
+            feedbacks = data.get("feedbacks") if data else None
+            if not feedbacks:
+                return None
+            # Даты в одном ISO-формате сравниваются как строки - разбираем только самую раннюю
+            oldest = min((f["createdDate"] for f in feedbacks if f.get("createdDate")), default=None)
+            return datetime.fromisoformat(oldest.replace("Z", "+00:00")) if oldest else None
+        except Exception:
+            return None
 
     async def get_approx_seller_age(self, supplier_id: int, products_sample: list) -> dict:
         """
-        Рассчитывает примерный стаж на основе supplierId, nmId и отзывов.
+        Рассчитывает примерный стаж на основе supplierId, nmId и отзывов (с чтением через кэш).
+        products_sample - товары продавца (ProductRecord).
         Возвращает {'age': months, 'type': 'exact'|'estimated'|'unknown'}
         """
-        # 1. Пытаемся получить точный возраст через API
+        if self.cache:
+            cached = self.cache.get_age(supplier_id)
+            if cached:
+                return cached
+
+        age_data = await self._calc_seller_age(supplier_id, products_sample)
+        if self.cache:
+            self.cache.set_age(supplier_id, age_data)
+        return age_data
+
+    def _index_age(self, supplier_id: int, min_nmid: int, max_error_days=AGE_INDEX_MAX_ERROR_DAYS) -> dict:
+        """Стаж по выученному индексу (сначала по supplierId, затем по самому старому nmId) или None."""
+        if not self.age_index:
+            return None
+        age = self.age_index.age_months(SERIES_SUPPLIER, supplier_id, max_error_days)
+        if age is None and min_nmid:
+            age = self.age_index.age_months(SERIES_NM, min_nmid, max_error_days)
+        return {"age": age, "type": "estimated_index"} if age is not None else None
+
+    async def _calc_seller_age(self, supplier_id: int, products_sample: list) -> dict:
+        nm_ids = [p.id for p in products_sample or [] if p.id]
+        min_nmid = min(nm_ids) if nm_ids else 0
+
+        # 1. Пытаемся получить точный возраст через API (он же - новые точки индекса)
         s_info = await self.get_seller_info(supplier_id)
         if s_info and "age" in s_info:
+            if self.age_index:
+                self.age_index.add_exact_age(supplier_id, s_info["age"])
             return {"age": s_info["age"], "type": "exact"}
 
-        # 2. Если API заблокировано (498/429), используем эвристику
+        # 2. Стаж скрыт: уверенная оценка по индексу id -> дата регистрации - без запросов к отзывам
+        indexed = self._index_age(supplier_id, min_nmid)
+        if indexed:
+            self.age_index.hits += 1
+            return indexed
+
+        # 3. Если API заблокировано (498/429), используем эвристику
         # Пороги supplierId (на основе динамики роста WB):
         # < 1,000,000 - Продавцы со стажем 3+ года
         # 1,000,000 - 1,800,000 - Продавцы зашедшие в 2022-2023
@@ -209,34 +428,29 @@ class WBApi:
         is_new_by_id = supplier_id > 1800000
         
         if not products_sample:
-            # Если товаров нет, судим только по ID
-            return {"age": 12 if is_new_by_id else 36, "type": "estimated_sid"}
-        
-        nm_ids = [p.get("id") for p in products_sample if p.get("id")]
-        min_nmid = min(nm_ids) if nm_ids else 0
+            # Если товаров нет, судим только по ID (индекс - даже с большой погрешностью, он точнее порогов)
+            return self._index_age(supplier_id, 0, None) or {"age": 12 if is_new_by_id else 36, "type": "estimated_sid"}
         
         # Пороги nmId:
         # Артикулы до 180-200 млн создавались более 2 лет назад (до фев 2024)
         is_new_by_nm = min_nmid > 200000000
         
-        # 3. Уточняем по самому старому отзыву (самый надежный fallback)
-        for nm_id in nm_ids[:3]: # Проверяем чуть больше товаров для надежности
-            oldest_date = await self.get_earliest_feedback_date(nm_id)
-            if oldest_date:
-                diff = datetime.now() - oldest_date.replace(tzinfo=None)
-                months = diff.days // 30
-                return {"age": months, "type": "estimated_feedback"}
-
-        # 4. Если отзывов нет (новый товар), используем комбинацию ID
+        # 4. Уточняем по самому старому отзыву (самый надежный fallback)
+        # Товары выборки опрашиваются наперегонки, ответ дает первый товар с отзывами
+        oldest_date = await first_result((self.get_earliest_feedback_date(nm_id) for nm_id in nm_ids[:3]),
+                                         stagger=FEEDBACK_HEDGE_DELAY)
+        if oldest_date:
+            diff = datetime.now() - oldest_date.replace(tzinfo=None)
+            months = diff.days // 30
+            return {"age": months, "type": "estimated_feedback"}
+
+        # 5. Если отзывов нет (новый товар) - индекс с любой погрешностью, без него - комбинация порогов ID
+        indexed = self._index_age(supplier_id, min_nmid, None)
+        if indexed:
+            return indexed
         if is_new_by_id and is_new_by_nm:
             return {"age": 6, "type": "estimated_combined"} # Очень вероятно новый
         elif not is_new_by_id or not is_new_by_nm:
             return {"age": 30, "type": "estimated_combined"} # Скорее всего старый
             
         return {"age": 12 if is_new_by_id else 30, "type": "estimated_sid"}
-
-    async def random_sleep(self):
-        """Задержка между действиями."""
-        delay = random.uniform(DELAY_MIN, DELAY_MAX)
-        print(f"[Delay] Sleeping {delay:.1f}s...")
-        await asyncio.sleep(delay)
@@ -0,0 +1,89 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from services.age_index import AgeIndex, _Series, SERIES_SUPPLIER, SERIES_NM, MONTH
+
+DAY = 24 * 3600
+
+
+def make_index(tmp_path, min_points=3):
+    return AgeIndex(str(tmp_path / "age_index.db"), min_points=min_points, rebuild_interval=0)
+
+
+def test_pav_merges_non_monotonic_points():
+    series = _Series([(1, 100, 100), (2, 300, 300), (3, 200, 200), (4, 400, 400)])
+    # Точки 2 и 3 нарушают монотонность и сливаются в один блок со средней датой
+    assert list(series.first) == [1, 2, 4]
+    assert list(series.last) == [1, 3, 4]
+    assert list(series.mean) == [100, 250, 400]
+    assert (series.lo[1], series.hi[1]) == (200, 300)
+    assert series.points == 4
+
+
+def test_estimate_inside_block_and_between_blocks():
+    series = _Series([(10, 1000, 1000), (20, 2000, 2000), (30, 1500, 1500)])
+    # Внутри блока [20, 30]: средняя дата, погрешность - разброс сырых дат блока
+    assert series.estimate(25) == (1750, 250)
+    # Между блоками - интерполяция, границы - сырые даты соседних блоков
+    ts, error = series.estimate(15)
+    assert ts == pytest.approx(1000 + 750 * 0.5)
+    assert error == pytest.approx(max(ts - 1000, 2000 - ts))
+    # Вне выученного диапазона индекс не отвечает
+    assert series.estimate(5) is None
+    assert series.estimate(31) is None
+
+
+def test_index_needs_min_points(tmp_path):
+    index = make_index(tmp_path, min_points=3)
+    now = time.time()
+    index.add_exact_age(100, 10, observed=now)
+    index.add_exact_age(300, 2, observed=now)
+    assert index.estimate(SERIES_SUPPLIER, 200) is None
+
+    index.add_exact_age(200, 5, observed=now)
+    assert index.estimate(SERIES_SUPPLIER, 200) is not None
+    assert index.count(SERIES_SUPPLIER) == 3
+
+
+def test_age_months_respects_error_bound(tmp_path):
+    index = make_index(tmp_path)
+    now = time.time()
+    for sid, age in ((100, 20), (200, 15), (300, 10), (400, 5)):
+        index.add_exact_age(sid, age, observed=now)
+
+    # Точная точка: регистрация в пределах месяца
+    assert index.age_months(SERIES_SUPPLIER, 300, max_error_days=31) == 10
+    # Между далекими точками погрешность велика: оценка только без ограничения погрешности
+    assert index.age_months(SERIES_SUPPLIER, 250, max_error_days=31) is None
+    assert index.age_months(SERIES_SUPPLIER, 250, max_error_days=None) in (10, 11, 12, 13, 14, 15)
+
+
+def test_outlier_widens_error(tmp_path):
+    index = make_index(tmp_path)
+    base = datetime(2024, 1, 1).timestamp()
+    for nm in range(1, 11):
+        index.add_feedback_date(nm * 10, datetime.fromtimestamp(base + nm * DAY))
+    assert index.age_months(SERIES_NM, 50, max_error_days=1) is not None
+
+    # Поздний отзыв у раннего товара сливает блок - погрешность растет, уверенной оценки нет
+    index.add_feedback_date(55, datetime.fromtimestamp(base + 400 * DAY))
+    ts, error = index.estimate(SERIES_NM, 55)
+    assert error > 100 * DAY
+    assert index.age_months(SERIES_NM, 55) is None
+
+
+def test_seed_from_seller_cache(tmp_path):
+    class Cache:
+        def exact_ages(self):
+            return [(sid, 12, time.time()) for sid in (1, 2, 3)]
+
+        def feedback_dates(self):
+            return [(77, datetime(2023, 5, 1))]
+
+    index = AgeIndex(str(tmp_path / "age_index.db"), seed_cache=Cache(), min_points=3)
+    assert index.count(SERIES_SUPPLIER) == 3
+    assert index.count(SERIES_NM) == 1
+    ts, error = index.estimate(SERIES_SUPPLIER, 2)
+    assert error <= MONTH
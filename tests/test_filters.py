@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import SELLER_FILTERS
+from services.filters import (
+    FilterPipeline, STAGE_PRODUCT, STAGE_AGE, STAGE_LEGAL, parse_criteria, describe_criteria, is_valid_seller
+)
+from services.products import ProductRecord
+
+
+def product(id: int, price: float, brand: str = "Brand") -> ProductRecord:
+    return ProductRecord(id, id, "Товар", brand, price, "Продавец")
+
+
+def test_product_stage_filters_batch_in_cost_order():
+    pipeline = FilterPipeline({"price_min": 100, "price_max": 1000, "exclude_brands": ["Noname"]})
+    records = [product(1, 50), product(2, 500), product(3, 5000), product(4, 500, "noname")]
+    passed, rejected = pipeline.filter(records, STAGE_PRODUCT)
+    assert [r.id for r in passed] == [2]
+    assert [(r.id, reason) for r, reason in rejected] == [
+        (1, "Пропуск: Цена ниже 100 ₽"),
+        (3, "Пропуск: Цена выше 1000 ₽"),
+        (4, "Пропуск: Исключенный бренд (noname)"),
+    ]
+
+
+def test_stages_are_checked_separately():
+    pipeline = FilterPipeline({"age_max_months": 12, "legal_forms": ["ИП"]})
+    assert pipeline.has_stage(STAGE_AGE) and pipeline.has_stage(STAGE_LEGAL)
+    assert not pipeline.has_stage(STAGE_PRODUCT)
+
+    record = {"age_months": 3, "legal": {"supplierFullName": "ООО Ромашка"}}
+    assert pipeline.check(record, STAGE_AGE) == (True, None)
+    assert pipeline.check(record, STAGE_LEGAL) == (False, "Пропуск: Не ИП (ООО Ромашка)")
+
+    record["legal"] = {"supplierFullName": "Индивидуальный предприниматель Иванов"}
+    assert pipeline.check(record) == (True, None)
+
+
+@pytest.mark.parametrize("age, ok, reason", [
+    (0, True, None),
+    (12, True, None),
+    (13, False, "Пропуск: Стаж больше 12 мес."),
+    (None, False, "Пропуск: Стаж неизвестен"),
+])
+def test_age_max_treats_zero_as_newcomer(age, ok, reason):
+    pipeline = FilterPipeline({"age_max_months": 12})
+    assert pipeline.check({"age_months": age}, STAGE_AGE) == (ok, reason)
+
+
+def test_age_min_rejects_unknown_age():
+    pipeline = FilterPipeline({"age_min_months": 6})
+    assert pipeline.check({"age_months": 6}, STAGE_AGE) == (True, None)
+    assert pipeline.check({"age_months": 0}, STAGE_AGE) == (False, "Пропуск: Стаж меньше 6 мес.")
+    assert pipeline.check({"age_months": None}, STAGE_AGE) == (False, "Пропуск: Стаж неизвестен")
+
+
+def test_reg_max_days_uses_context_threshold():
+    pipeline = FilterPipeline({"reg_max_days": 30})
+    ctx = pipeline.context(datetime(2024, 6, 30))
+    assert pipeline.check({"registrationDate": "2024-06-10T00:00:00"}, STAGE_AGE, ctx) == (True, None)
+    assert pipeline.check({"registrationDate": "2024-01-01T00:00:00"}, STAGE_AGE, ctx)[0] is False
+    assert pipeline.check({}, STAGE_AGE, ctx) == (False, "Пропуск: Нет даты регистрации")
+    # Строка "мусора" больше любой даты - без проверки формата она прошла бы порог
+    assert pipeline.check({"registrationDate": "неизвестно"}, STAGE_AGE, ctx) == (
+        False, "Ошибка проверки даты: неизвестно")
+    assert pipeline.check({"registrationDate": "2024-13-01"}, STAGE_AGE, ctx)[0] is False
+
+
+def test_parse_criteria():
+    assert parse_criteria("age_max=12 legal=ИП,ООО inn=да price_max=5000") == {
+        "age_max_months": 12,
+        "legal_forms": ["ИП", "ООО"],
+        "require_inn": True,
+        "price_max": 5000.0,
+    }
+    assert parse_criteria("age_max=-") == {"age_max_months": SELLER_FILTERS["age_max_months"]}
+
+
+@pytest.mark.parametrize("text, message", [
+    ("age_max", "Ожидается ключ=значение"),
+    ("color=red", "Неизвестный фильтр: color"),
+    ("age_max=много", "Неверное значение для age_max"),
+])
+def test_parse_criteria_errors(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_criteria(text)
+
+
+def test_describe_criteria():
+    assert describe_criteria({}) == "Без ограничений"
+    assert describe_criteria({"age_max_months": 12, "legal_forms": ["ИП"]}) == "Стаж: 0-12 мес.\nФорма: ИП"
+
+
+def recent_date() -> str:
+    return (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@pytest.mark.parametrize("name, ok", [
+    ("ИП Иванов", True),
+    ("ип петров", True),
+    ("ИПАТОВ ТРЕЙД", True),         # Как и раньше - проверяется только начало имени
+    ("ООО Ромашка", False),
+    ("Индивидуальный предприниматель Иванов", False),
+])
+def test_is_valid_seller_legal_form_prefix(name, ok):
+    passed, message = is_valid_seller({"name": name, "registrationDate": recent_date()})
+    assert passed is ok
+    if not ok:
+        assert message == f"Пропуск: Не ИП ({name})"
+
+
+def test_is_valid_seller_dates():
+    assert is_valid_seller({}) == (False, "Не удалось получить данные продавца")
+    assert is_valid_seller({"name": "ИП Иванов"}) == (False, "Пропуск: Нет даты регистрации")
+    assert is_valid_seller({"name": "ИП Иванов", "registrationDate": "2001-01-01T00:00:00Z"}) == (
+        False, "Пропуск: Старый аккаунт (рег: 2001-01-01)")
+    passed, message = is_valid_seller({"name": "ИП Иванов", "registrationDate": "вчера"})
+    assert passed is False and message.startswith("Ошибка проверки даты:")
+    # Юр. информация на решение не влияет - только имя из sellers/info
+    passed, _ = is_valid_seller({"name": "ИП Иванов", "registrationDate": recent_date(),
+                                 "legal": {"supplierFullName": "ООО Ромашка"}})
+    assert passed is True
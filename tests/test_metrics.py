@@ -0,0 +1,25 @@
+import asyncio
+
+from services.metrics import Metrics, counting_requests
+
+
+def test_request_counter_sees_only_its_own_tasks():
+    metrics = Metrics()
+
+    async def requests(n):
+        for _ in range(n):
+            metrics.observe_response("search", None, 200, 0.01)
+            await asyncio.sleep(0)
+
+    async def background():
+        counter = counting_requests()
+        # Подзадачи наследуют счетчик
+        await asyncio.gather(requests(3), asyncio.create_task(requests(2)))
+        return counter.count
+
+    async def run():
+        return await asyncio.gather(background(), requests(10))
+
+    own, _ = asyncio.run(run())
+    assert own == 5
+    assert metrics.total_requests == 15
@@ -0,0 +1,123 @@
+import asyncio
+
+from services.paginator import fetch_pages, fetch_new_pages, scan_query
+from services.search_progress import SearchProgress
+
+
+def catalog(sizes: dict, failing=()):
+    """fetch_page для выдачи: sizes - товаров на странице, failing - страницы с сетевой ошибкой."""
+    calls = []
+
+    async def fetch_page(page):
+        calls.append(page)
+        if page in failing:
+            return None
+        return [{"id": page * 1000 + i} for i in range(sizes.get(page, 0))]
+
+    return fetch_page, calls
+
+
+def test_fetch_pages_stops_on_short_page():
+    fetch_page, _ = catalog({1: 100, 2: 100, 3: 7})
+    products, last_page, next_page, exhausted = asyncio.run(fetch_pages(fetch_page, 1, 11, window=2))
+    assert len(products) == 207
+    assert (last_page, next_page, exhausted) == (3, 1, True)
+
+
+def test_fetch_pages_resumes_from_failed_page():
+    fetch_page, _ = catalog({p: 100 for p in range(1, 11)}, failing={4})
+    products, last_page, next_page, exhausted = asyncio.run(fetch_pages(fetch_page, 1, 11, window=3))
+    assert len(products) == 300
+    assert (last_page, next_page, exhausted) == (3, 4, False)
+
+
+def test_fetch_pages_streams_to_on_page_in_order():
+    fetch_page, _ = catalog({p: 100 for p in range(1, 11)})
+    seen = []
+    products, last_page, next_page, exhausted = asyncio.run(
+        fetch_pages(fetch_page, 1, 6, window=4, on_page=lambda res: seen.append(res[0]["id"] // 1000))
+    )
+    assert products == []
+    assert seen == [1, 2, 3, 4, 5]
+    assert (last_page, next_page, exhausted) == (5, 6, False)
+
+
+def test_fetch_new_pages_stops_at_first_known_item():
+    fetch_page, calls = catalog({p: 100 for p in range(1, 11)})
+    known_from = 2050   # Со страницы 2 начинаются уже просмотренные товары
+    new = []
+    pages, new_count, caught_up = asyncio.run(
+        fetch_new_pages(fetch_page, lambda nm: nm < known_from, 10, on_page=new.extend)
+    )
+    assert calls == [1, 2]
+    assert (pages, new_count, caught_up) == (2, 150, True)
+    assert all(p["id"] < known_from for p in new)
+
+
+def test_fetch_new_pages_limits_and_errors():
+    fetch_page, calls = catalog({p: 100 for p in range(1, 11)})
+    assert asyncio.run(fetch_new_pages(fetch_page, lambda nm: True, 3)) == (3, 300, False)
+    assert calls == [1, 2, 3]
+
+    fetch_page, _ = catalog({1: 100, 2: 100}, failing={2})
+    assert asyncio.run(fetch_new_pages(fetch_page, lambda nm: True, 10)) == (1, 100, False)
+
+    fetch_page, calls = catalog({1: 5})
+    assert asyncio.run(fetch_new_pages(fetch_page, lambda nm: True, 10)) == (1, 5, True)
+    assert calls == [1]
+
+
+class FakeApi:
+    """search_products по каталогу: sort=newly - новинки (nmId по убыванию), иначе страницы по возрастанию."""
+
+    def __init__(self, newest: int, pages: int = 10):
+        self.newest = newest
+        self.pages = pages
+        self.calls = []
+
+    async def search_products(self, query, limit=100, page=1, sort=None):
+        self.calls.append((page, sort))
+        if page > self.pages:
+            return []
+        if sort == "newly":
+            top = self.newest - (page - 1) * limit
+            return [{"id": nm} for nm in range(top, top - limit, -1)]
+        return [{"id": page * 1000 + i} for i in range(limit)]
+
+
+def test_scan_query_reads_only_new_items_for_known_query(tmp_path):
+    progress = SearchProgress(str(tmp_path / "progress.db"), None)
+    api = FakeApi(newest=100_150)
+    found = []
+
+    async def run():
+        await progress.update_watermark("q", range(99_000, 100_001))
+        return await scan_query(api, progress, "q", found.extend)
+
+    assert asyncio.run(run()) == ("delta", 2, 150)
+    assert api.calls == [(1, "newly"), (2, "newly")]
+    assert len(found) == 150
+    # Курсор страниц не тронут, проход отмечен
+    state = progress.get("q")
+    assert (state["next_page"], state["scans"]) == (1, 1)
+    assert state["last_scan"]
+
+
+def test_scan_query_falls_back_to_cursor_when_delta_finds_no_boundary(tmp_path):
+    progress = SearchProgress(str(tmp_path / "progress.db"), None)
+    api = FakeApi(newest=10_000_000)
+
+    async def run():
+        await progress.update_watermark("q", [1, 2, 3])
+        return await scan_query(api, progress, "q", lambda products: None, pages=3, sort="popular")
+
+    assert asyncio.run(run()) == ("pages", 1, 3)
+    assert [c for c in api.calls if c[1] == "newly"] == [(1, "newly"), (2, "newly"), (3, "newly")]
+    assert progress.get("q")["next_page"] == 4
+
+
+def test_scan_query_without_watermark_uses_cursor(tmp_path):
+    progress = SearchProgress(str(tmp_path / "progress.db"), None)
+    api = FakeApi(newest=0)
+    assert asyncio.run(scan_query(api, progress, "q", lambda products: None, pages=2, sort="popular")) == ("pages", 1, 2)
+    assert all(sort == "popular" for _, sort in api.calls)
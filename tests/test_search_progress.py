@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+from config import SEARCH_MAX_PAGE, EXHAUSTED_RESCAN_INTERVAL, WATERMARK_IDS
+from services.search_progress import SearchProgress, Watermark
+
+
+def make_progress(tmp_path):
+    return SearchProgress(str(tmp_path / "progress.db"), None)
+
+
+def test_claim_moves_cursor_for_parallel_searches(tmp_path):
+    progress = make_progress(tmp_path)
+
+    async def run():
+        return await asyncio.gather(progress.claim("Платье", 10), progress.claim("платье ", 10))
+
+    first, second = asyncio.run(run())
+    assert first == (1, 11)
+    assert second == (11, 21)
+    assert progress.get("ПЛАТЬЕ")["next_page"] == 21
+
+
+def test_complete_rolls_back_only_untouched_cursor(tmp_path):
+    progress = make_progress(tmp_path)
+
+    async def run():
+        await progress.claim("q", 10)
+        # Ошибка на странице 5: курсор возвращается на нее
+        await progress.complete("q", 11, 5, 4, False)
+        assert progress.get("q")["next_page"] == 5
+
+        start, end = await progress.claim("q", 10)
+        await progress.claim("q", 10)
+        # Параллельный поиск уже сдвинул курсор дальше - откат не затирает его
+        await progress.complete("q", end, start + 2, start + 1, False)
+        assert progress.get("q")["next_page"] == end + 10
+
+    asyncio.run(run())
+    assert progress.get("q")["scans"] == 2
+
+
+def test_exhausted_query_is_not_rescanned_until_interval(tmp_path):
+    progress = make_progress(tmp_path)
+
+    async def run():
+        await progress.claim("q", 10)
+        await progress.complete("q", 11, 1, 3, True)
+        state = progress.get("q")
+        assert (state["next_page"], state["exhausted_page"]) == (1, 3)
+        assert await progress.claim("q", 10) is None
+
+        # Интервал прошел: сканируем снова, но не дальше известной последней страницы
+        progress.conn.execute("UPDATE queries SET exhausted_at = ?", (time.time() - EXHAUSTED_RESCAN_INTERVAL - 1,))
+        progress.conn.commit()
+        assert await progress.claim("q", 10) == (1, 4)
+
+    asyncio.run(run())
+
+
+def test_complete_past_max_page_marks_exhausted(tmp_path):
+    progress = make_progress(tmp_path)
+
+    async def run():
+        start, end = await progress.claim("q", SEARCH_MAX_PAGE)
+        await progress.complete("q", end, end, end - 1, False)
+
+    asyncio.run(run())
+    state = progress.get("q")
+    assert state["next_page"] == 1
+    assert state["exhausted_page"] == SEARCH_MAX_PAGE
+
+
+def test_watermark_keeps_largest_ids(tmp_path):
+    progress = make_progress(tmp_path)
+    ids = range(1, WATERMARK_IDS + 101)
+    asyncio.run(progress.update_watermark("q", ids))
+
+    mark = progress.watermark("q")
+    assert mark.max_nm == WATERMARK_IDS + 100
+    assert mark.floor == 101
+    assert not mark.is_new(50)                  # Ниже отслеживаемого диапазона - считаем известным
+    assert not mark.is_new(WATERMARK_IDS)
+    assert mark.is_new(WATERMARK_IDS + 101)
+    assert not progress.watermark("other")
+
+
+def test_watermark_detects_gaps():
+    mark = Watermark([10, 20, 30])
+    assert mark.floor == 0
+    assert mark.is_new(15)
+    assert not mark.is_new(20)
+    assert not mark.is_new(None)
+
+
+def test_claim_is_atomic_across_connections(tmp_path):
+    # Два процесса (бот и CLI) с одной базой: у каждого свое соединение и свой asyncio.Lock
+    path = str(tmp_path / "progress.db")
+    stores = [SearchProgress(path, None) for _ in range(2)]
+    claims = []
+
+    def claim_many(progress):
+        async def run():
+            for _ in range(40):
+                claims.append(await progress.claim("q", 1))
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=claim_many, args=(p,)) for p in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Ни одна страница не выдана дважды
+    assert sorted(start for start, _ in claims) == list(range(1, 81))
+    assert stores[0].get("q")["next_page"] == 81
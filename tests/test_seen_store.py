@@ -0,0 +1,65 @@
+from config import SEEN_BITMAP_MAX_ID
+from services.seen_store import SeenSellersStore
+
+
+def make_store(tmp_path, legacy_path=None):
+    return SeenSellersStore(str(tmp_path / "seen.bin"), legacy_path)
+
+
+def test_chat_lists_and_global_list(tmp_path):
+    store = make_store(tmp_path)
+    store.add_many(1, [10, 20, "30"])
+    store.add_many(SeenSellersStore.GLOBAL, [99])
+
+    assert store.contains(1, 20) and store.contains(1, "30")
+    assert not store.contains(2, 20)
+    assert store.contains(2, 99)
+    assert not store.contains(1, "не id")
+    assert store.count(1) == 3
+
+
+def test_journal_survives_restart_and_truncated_tail(tmp_path):
+    store = make_store(tmp_path)
+    big = SEEN_BITMAP_MAX_ID + 5     # Выше битовой карты - в запасном set
+    store.add_many(1, [10, big])
+    store.add_many(1, [10])          # Дубль в журнал не пишется
+    with open(store.path, "ab") as f:
+        f.write(b"\x01\x02\x03")     # Обрыв посреди записи
+
+    reloaded = make_store(tmp_path)
+    assert reloaded.contains(1, 10) and reloaded.contains(1, big)
+    assert reloaded.count(1) == 2
+
+
+def test_clear_drops_chat_and_global_lists(tmp_path):
+    store = make_store(tmp_path)
+    store.add_many(1, [10])
+    store.add_many(2, [20])
+    store.add_many(SeenSellersStore.GLOBAL, [99])
+    store.clear(1)
+
+    reloaded = make_store(tmp_path)
+    assert not reloaded.contains(1, 10) and not reloaded.contains(1, 99)
+    assert reloaded.contains(2, 20)
+
+
+def test_compact_rewrites_journal(tmp_path):
+    store = make_store(tmp_path)
+    store.add_many(1, range(100))
+    store.clear(1)
+    store.add_many(1, [5])
+    store.compact()
+
+    reloaded = make_store(tmp_path)
+    assert reloaded._records == 1
+    assert reloaded.contains(1, 5) and not reloaded.contains(1, 6)
+
+
+def test_legacy_blacklist_is_migrated_once(tmp_path):
+    legacy = tmp_path / "seen_sellers.txt"
+    legacy.write_text("123\n\nabc\n456\n")
+    store = make_store(tmp_path, str(legacy))
+
+    assert store.contains(7, 123) and store.contains(7, 456)
+    assert not legacy.exists()
+    assert (tmp_path / "seen_sellers.txt.migrated").exists()